@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+"""路由層級的准入控制：限制同時處理的請求數，超出時進入有上限的等待佇列，無法及時處理者快速回 503。
+
+一般路由以 FastAPI 相依注入使用（`dependencies=[Depends(controller)]`），串流路由以 acquire_slot() 持有名額到送完；
+處理完畢即釋放名額並直接交給佇列中的下一個請求。
+預估等待時間（佇列位置 × 平均處理時間 ÷ 並行數）已超過等待上限時不排隊，直接回 503 與 Retry-After，
+讓用戶端稍後重試，而不是在事件迴圈中堆積到逾時。
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Iterator
+
+from fastapi import HTTPException, status
+from starlette.concurrency import iterate_in_threadpool
+
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS
+
+LOGGER = logging.getLogger(__name__)
+
+# 平均處理時間的指數移動平均權重
+SERVICE_TIME_SMOOTHING = 0.2
+INITIAL_SERVICE_SECONDS = 0.05
+
+
+class AdmissionSlot:
+    """已取得的處理名額；release() 可重複呼叫，只會釋放一次。"""
+
+    def __init__(self, controller: AdmissionController | None) -> None:
+        self._controller = controller
+        self._started = time.perf_counter()
+
+    def release(self) -> None:
+        controller, self._controller = self._controller, None
+        if controller is not None:
+            controller._finished(time.perf_counter() - self._started)
+
+    async def hold(self, chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+        """於工作執行緒逐段產生串流內容，送完或中斷時釋放名額。"""
+
+        try:
+            async for chunk in iterate_in_threadpool(chunks):
+                yield chunk
+        finally:
+            self.release()
+
+
+class AdmissionController:
+    """一組路由共用的並行上限與 FIFO 等待佇列。
+
+    - max_concurrent：同時處理的請求數上限。
+    - max_queue：等待中的請求數上限，佇列已滿時立即拒絕。
+    - max_wait_seconds：等待上限；預估等待超過此值時立即拒絕，實際等待超過時亦拒絕。
+    - enabled=False 時不做任何限制。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_wait_seconds: float,
+        enabled: bool = True,
+    ) -> None:
+        self.name = name
+        self._max_concurrent = max(1, max_concurrent)
+        self._max_queue = max(0, max_queue)
+        self._max_wait_seconds = max_wait_seconds
+        self._enabled = enabled
+        self._active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._service_seconds = INITIAL_SERVICE_SECONDS
+        self.admitted = 0
+        self.rejected = 0
+
+    async def __call__(self) -> AsyncIterator[None]:
+        """FastAPI 相依：取得名額後執行路由，結束時釋放並更新平均處理時間。
+
+        相依的結束程式在串流回應送出內容之前就會執行，串流路由請改用 acquire_slot()。
+        """
+
+        slot = await self.acquire_slot()
+        try:
+            yield
+        finally:
+            slot.release()
+
+    async def acquire_slot(self) -> AdmissionSlot:
+        """取得名額並回傳 AdmissionSlot，由呼叫端於處理結束（例如串流送完）時釋放。"""
+
+        if not self._enabled:
+            return AdmissionSlot(None)
+        await self.acquire()
+        return AdmissionSlot(self)
+
+    def _finished(self, elapsed: float) -> None:
+        self._service_seconds += SERVICE_TIME_SMOOTHING * (elapsed - self._service_seconds)
+        self.release()
+
+    def estimated_wait(self, position: int) -> float:
+        """排在第 position 位（由 1 起算）的請求預估需等待的秒數。"""
+
+        return math.ceil(position / self._max_concurrent) * self._service_seconds
+
+    async def acquire(self) -> None:
+        """取得處理名額；無法在等待上限內取得時拋出 503。"""
+
+        if self._active < self._max_concurrent and not self._waiters:
+            self._active += 1
+            self._admit(0.0)
+            return
+
+        position = len(self._waiters) + 1
+        if position > self._max_queue:
+            self._reject("queue_full", self.estimated_wait(position))
+        estimated = self.estimated_wait(position)
+        if estimated > self._max_wait_seconds:
+            self._reject("deadline", estimated)
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._publish()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait({future}, timeout=self._max_wait_seconds)
+        except asyncio.CancelledError:
+            # 用戶端中斷連線；若名額已交給此請求則歸還
+            self._abandon(future)
+            raise
+        if not future.done():
+            self._abandon(future)
+            self._reject("timeout", self.estimated_wait(len(self._waiters) + 1))
+        self._admit(time.perf_counter() - started)
+
+    def release(self) -> None:
+        """釋放名額；佇列中有等待者時直接轉交，不讓新進請求插隊。"""
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self._active -= 1
+        self._publish()
+
+    def _abandon(self, future: asyncio.Future[None]) -> None:
+        if future.done() and not future.cancelled():
+            self.release()
+            return
+        future.cancel()
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+        self._publish()
+
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        ADMISSION_WAIT_SECONDS.observe(waited, group=self.name)
+        self._publish()
+
+    def _reject(self, reason: str, retry_after: float) -> None:
+        self.rejected += 1
+        ADMISSION_REJECTIONS.inc(group=self.name, reason=reason)
+        LOGGER.warning(
+            "Admission %s rejected request (%s): %s active, %s queued", self.name, reason, self._active, len(self._waiters)
+        )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def _publish(self) -> None:
+        ADMISSION_IN_FLIGHT.set(self._active, group=self.name)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters), group=self.name)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrent": self._max_concurrent,
+            "max_queue": self._max_queue,
+            "service_ms": round(self._service_seconds * 1000, 1),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
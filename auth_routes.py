@@ -8,12 +8,14 @@ from typing import Any, Dict, Optional
 from urllib.parse import urlencode
 
 import httpx
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse, RedirectResponse
 
 from config import get_settings
+from graph_service import get_graph_client
+from session_store import load_session, rotate_session
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], dependencies=[Depends(load_session)])
 
 
 # ---------------------------------------------------------------------------
@@ -77,6 +79,7 @@ async def auth_callback(
     state: Optional[str] = None,
     error: Optional[str] = None,
     error_description: Optional[str] = None,
+    client: httpx.AsyncClient = Depends(get_graph_client),
 ) -> RedirectResponse | JSONResponse:
     """
     處理 Azure AD 回呼：驗證 state、交換授權碼取得 token，並將資訊存入 Session。
@@ -111,32 +114,33 @@ async def auth_callback(
         "redirect_uri": settings.AZURE_REDIRECT_URI,
     }
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        token_resp = await client.post(endpoints["token"], data=data)
-        if token_resp.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f"Failed to obtain token from Azure AD: {token_resp.text}",
-            )
-
-        token_data = token_resp.json()
-        access_token = token_data.get("access_token")
-        id_token = token_data.get("id_token")
-        refresh_token = token_data.get("refresh_token")
-
-        if not access_token:
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="No access_token returned from Azure AD.")
-
-        user_info: Dict[str, Any] | None = None
-        try:
-            graph_me_url = "https://graph.microsoft.com/v1.0/me"
-            headers = {"Authorization": f"Bearer {access_token}"}
-            me_resp = await client.get(graph_me_url, headers=headers)
-            if me_resp.status_code == 200:
-                user_info = me_resp.json()
-        except Exception:
-            user_info = None
+    token_resp = await client.post(endpoints["token"], data=data, timeout=10.0)
+    if token_resp.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to obtain token from Azure AD: {token_resp.text}",
+        )
 
+    token_data = token_resp.json()
+    access_token = token_data.get("access_token")
+    id_token = token_data.get("id_token")
+    refresh_token = token_data.get("refresh_token")
+
+    if not access_token:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="No access_token returned from Azure AD.")
+
+    user_info: Dict[str, Any] | None = None
+    try:
+        graph_me_url = "https://graph.microsoft.com/v1.0/me"
+        headers = {"Authorization": f"Bearer {access_token}"}
+        me_resp = await client.get(graph_me_url, headers=headers, timeout=10.0)
+        if me_resp.status_code == 200:
+            user_info = me_resp.json()
+    except Exception:
+        user_info = None
+
+    # 登入成功後更換 Session ID，避免登入前取得的 ID 被沿用
+    rotate_session(request)
     request.session["auth"] = {
         "access_token": access_token,
         "refresh_token": refresh_token,
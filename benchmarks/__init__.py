@@ -0,0 +1 @@
+"""效能量測腳本，於專案根目錄以 `python -m benchmarks.<name>` 執行。"""
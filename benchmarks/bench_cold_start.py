@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+"""量測冷啟動到第一個 /contacts/tree 回應的時間：有磁碟快照（Graph 中斷）vs 無快照（需完整同步）。
+
+每個情境在獨立子行程中執行，時間包含匯入模組。
+用法：python -m benchmarks.bench_cold_start [--users 20000] [--latency 0.05] [--output result.json]
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks.common import emit, use_fake_azure_env
+
+PROCESS_STARTED = time.perf_counter()
+
+
+async def _child(scenario: str, users_count: int, store_path: str, latency: float) -> dict[str, Any]:
+    use_fake_azure_env(SNAPSHOT_STORE_PATH=store_path if scenario == "disk" else "")
+    import httpx
+
+    import main
+    from benchmarks.fake_graph import FakeGraph
+    from benchmarks.synthetic import make_graph_users
+
+    fake = FakeGraph(make_graph_users(users_count), latency=latency)
+    fake.outage = scenario == "disk"
+    imported = time.perf_counter()
+
+    main.app.state.graph_transport = fake.transport()
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            response = await client.get("/contacts/tree")
+            first_response = time.perf_counter()
+            health = main.DIRECTORY_CACHE.stats()
+
+    return {
+        "scenario": scenario,
+        "users": users_count,
+        "status_code": response.status_code,
+        "bytes": len(response.content),
+        "import_ms": round((imported - PROCESS_STARTED) * 1000, 1),
+        "first_tree_response_ms": round((first_response - imported) * 1000, 1),
+        "total_ms": round((first_response - PROCESS_STARTED) * 1000, 1),
+        "snapshot_source": health["snapshot_source"],
+        "snapshot_stale": health["snapshot_stale"],
+    }
+
+
+def _prepare_store(users_count: int, store_path: str) -> None:
+    from benchmarks.synthetic import make_graph_users
+    from models import employees_from_graph_users
+    from snapshot_store import SnapshotStore
+
+    SnapshotStore(store_path).save(1, "graph", employees_from_graph_users(make_graph_users(users_count)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.05, help="模擬每個 Graph 請求的往返秒數")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    parser.add_argument("--child", choices=["disk", "graph"], help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args.child, args.users, args.store, args.latency))))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = str(Path(directory) / "snapshot.sqlite3")
+        _prepare_store(args.users, store_path)
+        for scenario in ("disk", "graph"):
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_cold_start", "--child", scenario,
+                 "--users", str(args.users), "--store", store_path, "--latency", str(args.latency)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    emit("cold_start", results, args.output, {"users": args.users, "latency": args.latency})
+
+
+if __name__ == "__main__":
+    main()
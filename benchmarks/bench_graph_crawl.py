@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+"""量測 /users 完整抓取在不同分區數與並行數下的耗時（以 FakeGraph 模擬每頁延遲）。
+
+用法：python -m benchmarks.bench_graph_crawl [--users 50000] [--latency 0.2] [--concurrency 1 2 4 8]
+"""
+
+import argparse
+import asyncio
+from typing import Any
+
+from benchmarks.common import emit, use_fake_azure_env
+
+
+async def _crawl(users: list[dict[str, Any]], partitions: int, concurrency: int, args: argparse.Namespace) -> dict[str, Any]:
+    import graph_service
+    from benchmarks.fake_graph import FakeGraph
+
+    fake = FakeGraph(users, page_size=args.page_size, latency=args.latency, throttle_every=args.throttle_every, retry_after=0.1)
+    client = graph_service.create_graph_client(fake.transport())
+    try:
+        crawled = await graph_service.crawl_graph_users(client, partitions=partitions, concurrency=concurrency)
+    finally:
+        await client.aclose()
+    stats = graph_service.last_crawl_stats() or {}
+    return {**stats, "unique_users": len(crawled), "complete": len(crawled) == len(users)}
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    use_fake_azure_env()
+    import graph_service
+    from benchmarks.fake_graph import FakeGraph
+    from benchmarks.synthetic import make_graph_users
+
+    users = make_graph_users(args.users)
+    # Token 由共用連線池取得，先以 FakeGraph 啟動以免量測包含 Token 請求
+    await graph_service.open_graph_client(FakeGraph([]).transport())
+    await graph_service.get_graph_access_token()
+
+    results = [await _crawl(users, 1, 1, args)]
+    for concurrency in args.concurrency:
+        results.append(await _crawl(users, args.partitions, concurrency, args))
+    await graph_service.close_graph_client()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=999)
+    parser.add_argument("--latency", type=float, default=0.2, help="模擬每個 Graph 請求的往返秒數")
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--throttle-every", type=int, default=0, help="每 N 個請求回一次 429")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    args = parser.parse_args()
+
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    emit("graph_crawl", asyncio.run(run(args)), args.output, parameters)
+
+
+if __name__ == "__main__":
+    main()
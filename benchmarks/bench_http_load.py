@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+"""端對端負載量測：以 FakeGraph 提供模擬租戶，並行請求各 API 並統計延遲分位數與吞吐量。
+
+預設於同一行程以 ASGI transport 呼叫應用程式（不含網路與 uvicorn 成本）；
+指定 --base-url 時改對已啟動的服務發送 HTTP 請求。
+
+用法：python -m benchmarks.bench_http_load [--users 10000] [--requests 200] [--concurrency 16] [--output result.json]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any
+
+import httpx
+
+from benchmarks.common import emit, latency_summary, use_fake_azure_env
+
+ACCEPT_ENCODING = "br, gzip"
+
+
+def _scenarios(sample_dept_key: str | None) -> list[tuple[str, str, dict[str, str]]]:
+    scenarios = [
+        ("tree_full", "/contacts/tree", {}),
+        ("tree_depth_1", "/contacts/tree", {"depth": "1"}),
+        ("health", "/health", {}),
+        ("search", "/contacts/search", {"q": "陳"}),
+    ]
+    if sample_dept_key:
+        scenarios.insert(2, ("subtree_dept", f"/contacts/tree/{sample_dept_key}", {}))
+    return scenarios
+
+
+async def _load(
+    client: httpx.AsyncClient,
+    path: str,
+    params: dict[str, str],
+    requests: int,
+    concurrency: int,
+) -> dict[str, Any]:
+    samples: list[float] = []
+    errors = 0
+    wire_bytes = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors, wire_bytes
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path, params=params, headers={"Accept-Encoding": ACCEPT_ENCODING})
+            samples.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            wire_bytes = response.num_bytes_downloaded
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / wall, 1) if wall else None,
+        "wire_bytes": wire_bytes,
+        **latency_summary(samples),
+    }
+
+
+async def _first_dept_key(client: httpx.AsyncClient) -> str | None:
+    response = await client.get("/contacts/tree", params={"depth": "2"})
+    stack = list(response.json())
+    while stack:
+        node = stack.pop(0)
+        if node.get("node_type") == "dept":
+            return node["key"]
+        stack.extend(node.get("children") or [])
+    return None
+
+
+async def _run_against(client: httpx.AsyncClient, args: argparse.Namespace) -> list[dict[str, Any]]:
+    # 第一個請求等待快照載入，不計入量測
+    started = time.perf_counter()
+    await client.get("/contacts/tree", params={"depth": "0"})
+    warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    results: list[dict[str, Any]] = [{"scenario": "first_request", "latency_ms": warmup_ms}]
+    for name, path, params in _scenarios(await _first_dept_key(client)):
+        await client.get(path, params=params, headers={"Accept-Encoding": ACCEPT_ENCODING})
+        results.append({"scenario": name, "path": path, **await _load(client, path, params, args.requests, args.concurrency)})
+    return results
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0) as client:
+            return await _run_against(client, args)
+
+    use_fake_azure_env(SNAPSHOT_STORE_PATH="", SLOW_REQUEST_THRESHOLD_MS="0")
+    import main
+    from benchmarks.fake_graph import FakeGraph
+    from benchmarks.synthetic import make_graph_users
+
+    # 量測用客戶端的逐筆請求日誌會干擾輸出與計時
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    fake = FakeGraph(make_graph_users(args.users), latency=args.graph_latency)
+    main.app.state.graph_transport = fake.transport()
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            results = await _run_against(client, args)
+    results.append({"scenario": "graph_usage", "token_calls": fake.token_calls, "page_calls": fake.page_calls})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000, help="模擬租戶人數（1k～200k）")
+    parser.add_argument("--requests", type=int, default=200, help="每個情境的請求數")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時進行的請求數")
+    parser.add_argument("--graph-latency", type=float, default=0.05, help="模擬每個 Graph 請求的往返秒數")
+    parser.add_argument("--base-url", help="改對已啟動的服務量測，例如 http://127.0.0.1:18080")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    args = parser.parse_args()
+
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    emit("http_load", asyncio.run(run(args)), args.output, parameters)
+
+
+if __name__ == "__main__":
+    main()
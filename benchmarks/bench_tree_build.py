@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+"""比較「逐筆 pydantic 驗證」與「信任建構」兩種對應＋組樹路徑的耗時。
+
+用法：python -m benchmarks.bench_tree_build [--sizes 1000,10000,100000] [--output result.json]
+"""
+
+import argparse
+from typing import Any
+
+from benchmarks.common import emit, median_ms
+from benchmarks.synthetic import make_graph_users
+from config import get_settings
+from models import EmployeePublic, TreeNode, build_tree_from_employees, employees_from_graph_users
+
+
+def validated_employee(user: dict[str, Any]) -> EmployeePublic:
+    """原本的對應方式：每筆員工皆經 pydantic 驗證。"""
+
+    company_id = get_settings().COMPANY_ID or "KH"
+    employee_id = user.get("id") or user.get("userPrincipalName") or ""
+    email = user.get("mail") or user.get("userPrincipalName")
+    business_phones = user.get("businessPhones") or []
+    return EmployeePublic(
+        company_id=company_id,
+        employee_id=employee_id,
+        name=user.get("displayName") or email or employee_id,
+        email=email,
+        campus=user.get("companyName") or user.get("officeLocation"),
+        dept_id=user.get("department"),
+        dept_name=user.get("department"),
+        title=user.get("jobTitle"),
+        job=user.get("jobTitle"),
+        phone_no=business_phones[0] if business_phones else None,
+        mobile_phone=user.get("mobilePhone"),
+        status="在職",
+    )
+
+
+def validated_tree(employees: list[EmployeePublic]) -> list[TreeNode]:
+    """原本的組樹方式：每個節點皆經 pydantic 驗證。"""
+
+    settings = get_settings()
+    company = TreeNode(
+        key=f"company:{settings.COMPANY_ID or 'company'}",
+        label=settings.COMPANY_NAME or "公司",
+        node_type="company",
+    )
+    campuses: dict[str, TreeNode] = {}
+    depts: dict[tuple[str, str], TreeNode] = {}
+    for employee in employees:
+        campus_value = (employee.campus or "Unknown").strip() or "Unknown"
+        campus_key = f"campus:{campus_value}"
+        if campus_key not in campuses:
+            campuses[campus_key] = TreeNode(key=campus_key, label=campus_value, node_type="campus")
+            company.children.append(campuses[campus_key])
+        dept_value = employee.dept_id or employee.dept_name or "Unknown"
+        if (campus_key, dept_value) not in depts:
+            depts[(campus_key, dept_value)] = TreeNode(
+                key=f"dept:{campus_value}:{dept_value}",
+                label=employee.dept_name or dept_value,
+                node_type="dept",
+            )
+            campuses[campus_key].children.append(depts[(campus_key, dept_value)])
+        depts[(campus_key, dept_value)].children.append(
+            TreeNode(
+                key=f"emp:{employee.employee_id}",
+                label=employee.name or employee.email or employee.employee_id,
+                node_type="employee",
+                data=employee,
+            )
+        )
+    return [company]
+
+
+def run(sizes: list[int], repeat: int) -> list[dict[str, Any]]:
+    results: list[dict[str, Any]] = []
+    for size in sizes:
+        users = make_graph_users(size)
+        active = [user for user in users if user.get("accountEnabled", True)]
+        validated_ms, validated = median_ms(lambda: validated_tree([validated_employee(u) for u in active]), repeat)
+        trusted_ms, trusted = median_ms(lambda: build_tree_from_employees(employees_from_graph_users(users)), repeat)
+        identical = validated[0].model_dump_json() == trusted[0].model_dump_json()
+        results.append(
+            {
+                "users": size,
+                "validated_ms": round(validated_ms, 2),
+                "trusted_ms": round(trusted_ms, 2),
+                "speedup": round(validated_ms / trusted_ms, 2) if trusted_ms else None,
+                "identical_output": identical,
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="以逗號分隔的使用者數量")
+    parser.add_argument("--repeat", type=int, default=3, help="每組重複次數，取中位數")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    emit("tree_build", run(sizes, args.repeat), args.output, {"sizes": sizes, "repeat": args.repeat})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+"""微量測：build_tree_from_employees、build_tree_index，以及 find_node_by_key 與 TreeIndex.get 的查找耗時。
+
+用法：python -m benchmarks.bench_tree_lookup [--sizes 1000,10000,100000] [--lookups 200] [--output result.json]
+"""
+
+import argparse
+import random
+import time
+from typing import Any
+
+from benchmarks.common import emit, median_ms
+from benchmarks.synthetic import make_graph_users
+from models import TreeNode, build_tree_from_employees, build_tree_index, employees_from_graph_users, find_node_by_key
+
+
+def _sample_keys(tree: list[TreeNode], lookups: int, seed: int) -> dict[str, list[str]]:
+    """依節點類型抽樣查找 key，並加入不存在的 key 量測最差情況。"""
+
+    by_type: dict[str, list[str]] = {"campus": [], "dept": [], "employee": []}
+    stack = list(tree)
+    while stack:
+        node = stack.pop()
+        if node.node_type in by_type:
+            by_type[node.node_type].append(node.key)
+        stack.extend(node.children)
+    rng = random.Random(seed)
+    samples = {node_type: rng.choices(keys, k=lookups) for node_type, keys in by_type.items() if keys}
+    samples["missing"] = [f"emp:missing-{number}" for number in range(lookups)]
+    return samples
+
+
+def _per_lookup_us(lookup: Any, keys: list[str]) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        lookup(key)
+    return round((time.perf_counter() - started) * 1_000_000 / len(keys), 3)
+
+
+def run(sizes: list[int], repeat: int, lookups: int) -> list[dict[str, Any]]:
+    results: list[dict[str, Any]] = []
+    for size in sizes:
+        employees = employees_from_graph_users(make_graph_users(size))
+        build_ms, tree = median_ms(lambda: build_tree_from_employees(employees), repeat)
+        index_ms, index = median_ms(lambda: build_tree_index(tree), repeat)
+        samples = _sample_keys(tree, lookups, seed=size)
+        lookups_result = {
+            node_type: {
+                "find_node_by_key_us": _per_lookup_us(lambda key: find_node_by_key(tree, key), keys),
+                "tree_index_get_us": _per_lookup_us(index.get, keys),
+            }
+            for node_type, keys in samples.items()
+        }
+        results.append(
+            {
+                "users": size,
+                "employees": len(employees),
+                "build_tree_ms": round(build_ms, 2),
+                "build_tree_index_ms": round(index_ms, 2),
+                "lookups": lookups_result,
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="以逗號分隔的使用者數量")
+    parser.add_argument("--repeat", type=int, default=3, help="組樹重複次數，取中位數")
+    parser.add_argument("--lookups", type=int, default=200, help="每種節點類型的查找次數")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    parameters = {"sizes": sizes, "repeat": args.repeat, "lookups": args.lookups}
+    emit("tree_lookup", run(sizes, args.repeat, args.lookups), args.output, parameters)
+
+
+if __name__ == "__main__":
+    main()
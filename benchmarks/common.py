@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+"""量測腳本共用工具：假 Azure 設定、執行環境資訊與 JSON 結果輸出。"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+FAKE_AZURE_ENV = {"AZURE_CLIENT_ID": "bench", "AZURE_CLIENT_SECRET": "bench", "AZURE_TENANT_ID": "bench"}
+
+
+def use_fake_azure_env(**overrides: str) -> None:
+    """於匯入 config 之前設定假的 Azure 憑證（FakeGraph 不驗證），並套用其他設定覆寫。"""
+
+    os.environ.update(FAKE_AZURE_ENV)
+    os.environ.update(overrides)
+
+
+def environment() -> dict[str, Any]:
+    """記錄量測時的版本與環境，方便跨版本比較。"""
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def median_ms(func: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    """重複執行 repeat 次，回傳 (中位數毫秒, 最後一次結果)。"""
+
+    timings: list[float] = []
+    result: Any = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def latency_summary(samples_ms: list[float]) -> dict[str, float | None]:
+    """延遲樣本的 p50 / p95 / p99 / 最大值（毫秒）。"""
+
+    if not samples_ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples_ms)
+
+    def percentile(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+    return {
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def emit(benchmark: str, results: Any, output: str | None = None, parameters: dict[str, Any] | None = None) -> dict[str, Any]:
+    """輸出 {"benchmark", "environment", "parameters", "results"} JSON 至標準輸出與指定檔案。"""
+
+    document = {
+        "benchmark": benchmark,
+        "environment": environment(),
+        "parameters": parameters or {},
+        "results": results,
+    }
+    text = json.dumps(document, ensure_ascii=False, indent=2)
+    if output:
+        Path(output).write_text(text, encoding="utf-8")
+    sys.stdout.write(text + "\n")
+    return document
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+"""比較兩份 run_all 結果（基準 vs 候選），列出各耗時、吞吐量指標的變化比例。
+
+用法：python -m benchmarks.compare baseline.json candidate.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Iterator
+
+# 用來辨識同一筆結果的欄位，依序組成比較用的名稱
+IDENTITY_FIELDS = ("scenario", "users", "partitions", "concurrency")
+# 數值越小越好的欄位後綴；其餘（如 throughput_rps、speedup）越大越好
+LOWER_IS_BETTER = ("_ms", "_us", "_bytes")
+HIGHER_IS_BETTER = ("_rps", "speedup")
+
+
+def _metrics(value: Any, prefix: str) -> Iterator[tuple[str, float]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _metrics(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        if prefix.endswith(LOWER_IS_BETTER + HIGHER_IS_BETTER):
+            yield prefix, float(value)
+
+
+def flatten(document: dict[str, Any]) -> dict[str, float]:
+    """將 run_all 結果攤平成 {"suite[識別].欄位": 數值}。"""
+
+    flat: dict[str, float] = {}
+    for suite in document.get("suites", [document]):
+        for result in suite.get("results", []):
+            identity = ",".join(f"{field}={result[field]}" for field in IDENTITY_FIELDS if field in result)
+            for name, value in _metrics(result, ""):
+                flat[f"{suite['benchmark']}[{identity}].{name}"] = value
+    return flat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="變化超過此比例才標示")
+    args = parser.parse_args()
+
+    baseline = flatten(json.loads(Path(args.baseline).read_text(encoding="utf-8")))
+    candidate = flatten(json.loads(Path(args.candidate).read_text(encoding="utf-8")))
+    for name in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[name], candidate[name]
+        if not before:
+            continue
+        change = (after - before) / before
+        better = change < 0 if name.endswith(LOWER_IS_BETTER) else change > 0
+        marker = ""
+        if abs(change) >= args.threshold:
+            marker = "  improved" if better else "  REGRESSED"
+        print(f"{name}: {before:g} -> {after:g} ({change:+.1%}){marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+"""以 httpx.MockTransport 模擬 Entra Token 端點與 Microsoft Graph，供效能量測使用。"""
+
+import asyncio
+import re
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import httpx
+
+GRAPH_ROOT = "https://graph.microsoft.com/v1.0"
+RANGE_CLAUSE = re.compile(r"userPrincipalName (ge|le) '([^']*)'")
+PHOTO_PATH = re.compile(r"/users/([^/]+)/photo(/\$value)?$")
+
+
+def _matches_filter(user: dict[str, Any], expression: str | None) -> bool:
+    """僅支援 crawl_graph_users 使用的 userPrincipalName ge/le 範圍條件。"""
+
+    if not expression:
+        return True
+    upn = (user.get("userPrincipalName") or "").casefold()
+    for operator, value in RANGE_CLAUSE.findall(expression):
+        value = value.casefold()
+        if (operator == "ge" and upn < value) or (operator == "le" and upn > value):
+            return False
+    return True
+
+
+class FakeGraph:
+    """支援 Token、/users 分頁（@odata.nextLink）、/users/delta、/organization 與使用者大頭貼。
+
+    - latency：每個請求額外延遲秒數，模擬網路往返。
+    - outage：設為 True 時所有 Graph 請求回 503，模擬服務中斷。
+    - throttle_every：每 N 個 Graph 請求回一次 429（Retry-After: retry_after 秒），0 為不節流。
+    - queue_change()：排入下一輪 delta 要回報的變更。
+    - expire_delta_tokens()：之後以舊 deltaLink 發出的 delta 請求回 410 Gone，模擬 token 失效。
+    - photos：使用者 id → 影像內容；set_photo() 更新時 mediaEtag 隨之改變。
+    """
+
+    def __init__(
+        self,
+        users: list[dict[str, Any]],
+        page_size: int = 999,
+        latency: float = 0.0,
+        throttle_every: int = 0,
+        retry_after: float = 1.0,
+    ) -> None:
+        self.users: dict[str, dict[str, Any]] = {user["id"]: user for user in users}
+        self.page_size = page_size
+        self.latency = latency
+        self.outage = False
+        self.token_calls = 0
+        self.page_calls = 0
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.throttled = 0
+        self._requests = 0
+        self._pending: list[dict[str, Any]] = []
+        self._delta_round = 0
+        self._expired_round = 0
+        self._views: dict[str | None, list[dict[str, Any]]] = {}
+        self.photos: dict[str, bytes] = {}
+        self.photo_calls = 0
+        self.photo_metadata_calls = 0
+        self._photo_versions: dict[str, int] = {}
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle)
+
+    def queue_change(self, item: dict[str, Any]) -> None:
+        self._pending.append(item)
+
+    def expire_delta_tokens(self) -> None:
+        self._expired_round = self._delta_round
+
+    def set_photo(self, user_id: str, image: bytes | None) -> None:
+        if image is None:
+            self.photos.pop(user_id, None)
+        else:
+            self.photos[user_id] = image
+        self._photo_versions[user_id] = self._photo_versions.get(user_id, 0) + 1
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.method == "POST" and request.url.path.endswith("/oauth2/v2.0/token"):
+            self.token_calls += 1
+            return httpx.Response(200, json={"access_token": f"fake-token-{self.token_calls}", "expires_in": 3599})
+        if self.outage:
+            return httpx.Response(503, json={"error": {"code": "serviceNotAvailable"}})
+
+        self._requests += 1
+        if self.throttle_every and self._requests % self.throttle_every == 0:
+            self.throttled += 1
+            return httpx.Response(
+                429,
+                headers={"Retry-After": str(self.retry_after)},
+                json={"error": {"code": "TooManyRequests"}},
+            )
+
+        self.page_calls += 1
+        query = {key: values[0] for key, values in parse_qs(urlparse(str(request.url)).query).items()}
+        path = request.url.path
+        if path.endswith("/organization"):
+            return httpx.Response(200, json={"value": [{"id": "org"}]})
+        if path.endswith("/users/delta"):
+            return self._delta(query)
+        if path.endswith("/users"):
+            return self._page("users", query)
+        photo = PHOTO_PATH.search(path)
+        if photo:
+            return self._photo(photo.group(1), binary=bool(photo.group(2)))
+        return httpx.Response(404, json={"error": {"code": "Request_ResourceNotFound"}})
+
+    def _photo(self, user_id: str, binary: bool) -> httpx.Response:
+        image = self.photos.get(user_id)
+        if image is None:
+            return httpx.Response(404, json={"error": {"code": "ImageNotFound"}})
+        etag = f'"{user_id}-{self._photo_versions.get(user_id, 0)}"'
+        if binary:
+            self.photo_calls += 1
+            return httpx.Response(200, content=image, headers={"Content-Type": "image/jpeg", "ETag": etag})
+        self.photo_metadata_calls += 1
+        return httpx.Response(200, json={"@odata.mediaEtag": etag, "height": 648, "width": 648})
+
+    def _page(self, resource: str, query: dict[str, str]) -> httpx.Response:
+        expression = query.get("$filter")
+        users = self._views.get(expression)
+        if users is None:
+            # 同一篩選條件的後續分頁沿用結果，避免模擬端本身的篩選成本影響量測
+            users = self._views[expression] = [user for user in self.users.values() if _matches_filter(user, expression)]
+        skip = int(query.get("$skiptoken", "0"))
+        body: dict[str, Any] = {"value": users[skip : skip + self.page_size]}
+        if skip + self.page_size < len(users):
+            next_query: dict[str, Any] = {"$skiptoken": skip + self.page_size}
+            if expression:
+                next_query["$filter"] = expression
+            body["@odata.nextLink"] = f"{GRAPH_ROOT}/{resource}?{urlencode(next_query)}"
+        return httpx.Response(200, json=body)
+
+    def _drain_pending(self) -> list[dict[str, Any]]:
+        items, self._pending = self._pending, []
+        if items:
+            self._views.clear()
+        for item in items:
+            if "@removed" in item:
+                self.users.pop(item["id"], None)
+            else:
+                self.users.setdefault(item["id"], {}).update(item)
+        return items
+
+    def _delta(self, query: dict[str, str]) -> httpx.Response:
+        if "$deltatoken" in query:
+            token = query["$deltatoken"]
+            if token != "latest" and int(token) <= self._expired_round:
+                return httpx.Response(410, json={"error": {"code": "syncStateNotFound"}})
+            items = self._drain_pending()
+            if query["$deltatoken"] == "latest":
+                # 只取得代表目前狀態的 deltaLink，不回傳任何資料
+                items = []
+            self._delta_round += 1
+            delta_link = f"{GRAPH_ROOT}/users/delta?{urlencode({'$deltatoken': self._delta_round})}"
+            return httpx.Response(200, json={"value": items, "@odata.deltaLink": delta_link})
+
+        response = self._page("users/delta", query)
+        body = response.json()
+        if "@odata.nextLink" not in body:
+            self._drain_pending()
+            body["@odata.deltaLink"] = f"{GRAPH_ROOT}/users/delta?{urlencode({'$deltatoken': self._delta_round})}"
+        return httpx.Response(200, json=body)
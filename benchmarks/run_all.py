@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+"""依預設組合執行所有量測，合併成單一 JSON 以便跨版本比較。
+
+每個量測在獨立子行程執行，避免模組狀態與設定互相影響。
+用法：python -m benchmarks.run_all [--preset quick|full] [--output results/bench.json]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import ROOT, environment
+
+PRESETS: dict[str, list[tuple[str, list[str]]]] = {
+    "quick": [
+        ("bench_tree_build", ["--sizes", "1000,10000"]),
+        ("bench_tree_lookup", ["--sizes", "1000,10000"]),
+        ("bench_graph_crawl", ["--users", "10000", "--latency", "0.05", "--concurrency", "1", "4"]),
+        ("bench_http_load", ["--users", "10000", "--requests", "100"]),
+        ("bench_cold_start", ["--users", "10000"]),
+    ],
+    "full": [
+        ("bench_tree_build", ["--sizes", "1000,10000,100000,200000"]),
+        ("bench_tree_lookup", ["--sizes", "1000,10000,100000"]),
+        ("bench_graph_crawl", ["--users", "200000", "--latency", "0.2"]),
+        ("bench_http_load", ["--users", "100000", "--requests", "300", "--concurrency", "32"]),
+        ("bench_cold_start", ["--users", "100000"]),
+    ],
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--output", help="將合併結果寫入 JSON 檔")
+    args = parser.parse_args()
+
+    suites = []
+    with tempfile.TemporaryDirectory() as directory:
+        for module, module_args in PRESETS[args.preset]:
+            output = Path(directory) / f"{module}.json"
+            print(f"running {module} {' '.join(module_args)}", file=sys.stderr)
+            subprocess.run(
+                [sys.executable, "-m", f"benchmarks.{module}", *module_args, "--output", str(output)],
+                cwd=ROOT,
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            document = json.loads(output.read_text(encoding="utf-8"))
+            document.pop("environment", None)
+            suites.append(document)
+
+    text = json.dumps(
+        {"preset": args.preset, "environment": environment(), "suites": suites},
+        ensure_ascii=False,
+        indent=2,
+    )
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+"""產生模擬租戶的 Graph 使用者資料：校區／部門人數偏斜、中文姓名。"""
+
+import random
+from typing import Any
+
+SURNAMES = "陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周徐蘇葉莊呂江何蕭羅高"
+# 對應 SURNAMES 的常見拼音，用於 UPN，使首字母分布接近實際租戶（c、h、l 開頭偏多）
+SURNAME_ROMANIZATIONS = (
+    "chen lin huang chang lee wang wu liu tsai yang hsu cheng hsieh kuo hung "
+    "tseng chiu liao lai chou hsu su yeh chuang lu chiang ho hsiao lo kao"
+).split()
+GIVEN_CHARS = "家志明俊建文雅婷怡君淑芬美玲宗翰冠宇承恩子豪信宏欣怡佳穎詩涵"
+LATIN_GIVEN = ["Amy", "Ben", "Cindy", "David", "Eric", "Fiona", "Grace", "Henry", "Ivy", "Jason", "Kevin", "Linda"]
+CAMPUSES = ["總公司", "青山校區", "秀岡校區", "新竹校區", "高雄校區", "林口校區", "台中校區", "台南校區"]
+DEPARTMENTS = [
+    "教務處", "學務處", "總務處", "輔導室", "資訊中心", "人事室", "會計室", "圖書館",
+    "國語組", "數學組", "自然組", "社會組", "英語組", "藝文組", "體育組", "註冊組",
+]
+TITLES = ["教師", "組長", "主任", "專員", "行政助理", "工程師", "經理", "副理"]
+
+
+def make_graph_users(
+    count: int,
+    seed: int = 42,
+    disabled_ratio: float = 0.02,
+    managers: bool = False,
+) -> list[dict[str, Any]]:
+    """產生 count 筆 Graph /users 形式的資料。
+
+    校區與部門以遞減權重抽樣，模擬總公司人多、分校人少的實際分布。
+    managers 為 True 時附上 $expand=manager 形式的主管（隨機遞迴樹，第一筆為最高主管）。
+    """
+
+    rng = random.Random(seed)
+    campus_weights = [1.0 / (rank + 1) for rank in range(len(CAMPUSES))]
+    dept_weights = [1.0 / (rank + 1) ** 0.7 for rank in range(len(DEPARTMENTS))]
+    users: list[dict[str, Any]] = []
+    for number in range(count):
+        name = rng.choice(SURNAMES) + rng.choice(GIVEN_CHARS) + rng.choice(GIVEN_CHARS)
+        upn = f"{SURNAME_ROMANIZATIONS[SURNAMES.index(name[0])]}.{number:06d}@example.com"
+        users.append(
+            {
+                "id": f"00000000-0000-0000-0000-{number:012d}",
+                "displayName": name if rng.random() > 0.1 else f"{rng.choice(LATIN_GIVEN)} {name}",
+                "mail": upn if rng.random() > 0.05 else None,
+                "userPrincipalName": upn,
+                "department": rng.choices(DEPARTMENTS, dept_weights)[0],
+                "jobTitle": rng.choice(TITLES),
+                "officeLocation": None,
+                "companyName": rng.choices(CAMPUSES, campus_weights)[0],
+                "accountEnabled": rng.random() >= disabled_ratio,
+                "mobilePhone": f"09{rng.randrange(10**8):08d}" if rng.random() > 0.3 else None,
+                "businessPhones": [f"02-{rng.randrange(10**8):08d}"] if rng.random() > 0.2 else [],
+            }
+        )
+    if managers:
+        # 使用獨立亂數來源，其他欄位與不含主管時相同
+        manager_rng = random.Random(seed + 1)
+        for number, user in enumerate(users):
+            user["manager"] = {"id": users[manager_rng.randrange(number)]["id"]} if number else None
+    return users
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+"""快照版本間的節點變更紀錄，供前端以增量方式同步樹狀結構。"""
+
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from models import EmployeeChange, TreeChange, TreeChangeSet, describe_tree_changes
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    """由 base_version 更新到 version 的變更。"""
+
+    base_version: int
+    version: int
+    changes: list[TreeChange]
+
+
+class ChangeLog:
+    """保留最近數個版本的變更；總筆數有上限，超過時淘汰最舊的版本。
+
+    單次變更筆數超過上限（例如資料來源重新整理）時不保留明細，較舊的用戶端改為重新取得整棵樹。
+    """
+
+    def __init__(self, max_versions: int, max_changes: int) -> None:
+        self._max_versions = max_versions
+        self._max_changes = max_changes
+        self._entries: deque[_Entry] = deque()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def record(self, base_version: int, version: int, changes: list[EmployeeChange]) -> None:
+        """記錄由 base_version 到 version 的員工變更。"""
+
+        if len(changes) > self._max_changes:
+            LOGGER.info("Change log reset at v%s: %s changes exceed limit", version, len(changes))
+            with self._lock:
+                self._entries.clear()
+                self._total = 0
+                # 以空紀錄標記新的起點，之後的版本仍可增量同步
+                self._entries.append(_Entry(version, version, []))
+            return
+
+        entry = _Entry(base_version, version, describe_tree_changes(changes))
+        with self._lock:
+            if self._entries and self._entries[-1].version != base_version:
+                # 版本不連續（例如由共用快照跳過中間版本），舊紀錄無法銜接
+                self._entries.clear()
+                self._total = 0
+            self._entries.append(entry)
+            self._total += len(entry.changes)
+            while len(self._entries) > self._max_versions or (
+                self._total > self._max_changes and len(self._entries) > 1
+            ):
+                self._total -= len(self._entries.popleft().changes)
+
+    def since(self, since: int, version: int) -> TreeChangeSet:
+        """取得 since 之後到 version 的變更；無法由紀錄銜接時回傳 full_reload。"""
+
+        if since == version:
+            return TreeChangeSet(since=since, version=version)
+        with self._lock:
+            entries = list(self._entries)
+        start = next((position for position, entry in enumerate(entries) if entry.base_version == since), None)
+        if start is None or entries[-1].version != version:
+            # 版本過舊、來自其他行程或尚無紀錄
+            return TreeChangeSet(since=since, version=version, full_reload=True)
+        changes = [change for entry in entries[start:] for change in entry.changes]
+        return TreeChangeSet(since=since, version=version, changes=changes)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "oldest_version": self._entries[0].base_version if self._entries else None,
+                "versions": len(self._entries),
+                "changes": self._total,
+            }
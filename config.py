@@ -3,6 +3,7 @@ from __future__ import annotations
 """集中管理應用程式設定，所有敏感資訊皆由環境變數提供。"""
 
 from functools import lru_cache
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic import Field
@@ -21,6 +22,13 @@ class Settings(BaseSettings):
     APP_HOST: str = Field(default="127.0.0.1", description="應用程式監聽位址")
     APP_PORT: int = Field(default=18080, description="應用程式監聽埠號")
     SECRET_KEY: str = Field(default="dev-secret-key-change-me", description="Session 加密密鑰")
+    SESSION_BACKEND: Literal["sqlite", "memory", "cookie"] = Field(
+        default="sqlite",
+        description="Session 儲存方式：sqlite（本機檔，多 worker 共用）、memory（行程內）或 cookie（簽章 Cookie）",
+    )
+    SESSION_STORE_PATH: str = Field(default="data/sessions.sqlite3", description="SQLite Session 檔路徑")
+    SESSION_MEMORY_MAX_ENTRIES: int = Field(default=10000, description="記憶體 Session 保留的數量上限（LRU）")
+    SESSION_MAX_AGE_SECONDS: int = Field(default=14 * 24 * 60 * 60, description="Session 有效秒數")
 
     # 公司資訊
     COMPANY_ID: str = Field(default="KH", description="公司代碼，用於樹狀節點 key")
@@ -31,13 +39,75 @@ class Settings(BaseSettings):
     AZURE_CLIENT_SECRET: str = Field(default="", description="Azure AD 應用程式 Client Secret")
     AZURE_TENANT_ID: str = Field(default="", description="Azure AD 租戶 ID")
     AZURE_AUTHORITY: str = Field(default="", description="自訂 Azure OAuth Authority，預設依租戶組合")
-
-    # SQL Server 設定（目前主資料來源為 Graph，可視需要保留）
+    GRAPH_TOKEN_RENEW_MARGIN_SECONDS: float = Field(default=300.0, description="Graph Token 到期前多少秒開始背景續期")
+    GRAPH_CRAWL_PARTITIONS: int = Field(default=8, description="完整抓取 /users 時依 UPN 切分的分區數，1 為不分區")
+    GRAPH_CRAWL_CONCURRENCY: int = Field(default=4, description="完整抓取時同時進行的 Graph 請求數上限")
+    GRAPH_MAX_RETRIES: int = Field(default=4, description="遇到 429/503/504 時的最大重試次數")
+    GRAPH_RETRY_MAX_SECONDS: float = Field(default=60.0, description="單次重試等待秒數上限（含 Retry-After）")
+
+    # Graph / Entra 共用 HTTP 連線池
+    GRAPH_HTTP2: bool = Field(default=True, description="是否啟用 HTTP/2（需安裝 h2）")
+    GRAPH_HTTP_TIMEOUT_SECONDS: float = Field(default=20.0, description="Graph 請求預設逾時秒數")
+    GRAPH_HTTP_MAX_CONNECTIONS: int = Field(default=20, description="連線池最大連線數")
+    GRAPH_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=10, description="連線池保留的閒置連線數")
+    GRAPH_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = Field(default=60.0, description="閒置連線保留秒數")
+
+    # 通訊錄快取
+    DIRECTORY_CACHE_TTL_SECONDS: float = Field(default=300.0, description="通訊錄快照有效秒數，逾時後於背景更新")
+    SNAPSHOT_STORE_PATH: str = Field(
+        default="data/directory_snapshot.sqlite3",
+        description="本機快照檔路徑，供暖機與 Graph 中斷時備援；留空則停用",
+    )
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=256, description="每個快照版本保留的預先序列化回應數量上限")
+    RESPONSE_CACHE_MAX_VARIANTS: int = Field(
+        default=32, description="每個快照版本保留的 fields= / format= 變體回應數量上限，與一般回應分開計算"
+    )
+    CHANGE_LOG_MAX_VERSIONS: int = Field(default=100, description="保留增量變更紀錄的快照版本數")
+    CHANGE_LOG_MAX_CHANGES: int = Field(default=2000, description="保留的變更總筆數上限，超過時較舊版本需重新載入整棵樹")
+    ORG_CHART_ENABLED: bool = Field(default=False, description="是否依 Graph 主管關係建立組織圖（/contacts/orgchart）")
+    GRAPH_DELTA_SYNC_ENABLED: bool = Field(default=True, description="是否以 users/delta 增量同步通訊錄")
+
+    # 健康檢查
+    HEALTH_PROBE_INTERVAL_SECONDS: float = Field(default=30.0, description="背景檢查資料來源連線狀態的間隔秒數")
+    SLOW_REQUEST_THRESHOLD_MS: float = Field(default=1000.0, description="超過此毫秒數的請求記錄各階段耗時，0 為停用")
+    SHARED_SNAPSHOT_DIR: str = Field(
+        default="",
+        description="多 worker 共用快照的目錄（需為同一台主機的本機路徑）；留空則每個 worker 各自同步",
+    )
+    SHARED_SNAPSHOT_POLL_SECONDS: float = Field(default=1.0, description="follower worker 檢查共用快照版本的間隔秒數")
+
+    # 准入控制（各路由群組的並行上限與等待佇列）
+    ADMISSION_ENABLED: bool = Field(default=True, description="是否啟用准入控制，超出容量的請求快速回 503")
+    ADMISSION_MAX_WAIT_SECONDS: float = Field(default=2.0, description="請求等待處理名額的秒數上限，預估超過時立即回 503")
+    ADMISSION_TREE_CONCURRENCY: int = Field(default=8, description="樹狀結構、組織圖與匯出同時處理的請求數上限")
+    ADMISSION_TREE_QUEUE: int = Field(default=64, description="樹狀結構、組織圖與匯出的等待佇列上限")
+    ADMISSION_LOOKUP_CONCURRENCY: int = Field(default=32, description="搜尋、解析與成員查詢同時處理的請求數上限")
+    ADMISSION_LOOKUP_QUEUE: int = Field(default=256, description="搜尋、解析與成員查詢的等待佇列上限")
+    ADMISSION_PHOTO_CONCURRENCY: int = Field(default=16, description="員工照片同時處理的請求數上限")
+    ADMISSION_PHOTO_QUEUE: int = Field(default=256, description="員工照片的等待佇列上限")
+
+    # 員工照片代理
+    PHOTO_CACHE_PATH: str = Field(default="data/photos.sqlite3", description="員工照片縮圖的 SQLite 快取檔路徑；留空則只快取於記憶體")
+    PHOTO_MEMORY_CACHE_BYTES: int = Field(default=32 * 1024 * 1024, description="記憶體中保留的縮圖總位元組上限（LRU）")
+    PHOTO_DISK_CACHE_BYTES: int = Field(default=512 * 1024 * 1024, description="磁碟快取的縮圖總位元組上限，超過時淘汰最久未使用者")
+    PHOTO_REVALIDATE_SECONDS: float = Field(default=24 * 60 * 60, description="照片超過此秒數後於背景以 ETag 向 Graph 重新驗證")
+    PHOTO_NEGATIVE_TTL_SECONDS: float = Field(default=6 * 60 * 60, description="「沒有照片」結果的快取秒數")
+    PHOTO_FETCH_CONCURRENCY: int = Field(default=4, description="同時向 Graph 取得照片的請求數上限")
+    PHOTO_BROWSER_MAX_AGE_SECONDS: int = Field(default=24 * 60 * 60, description="瀏覽器快取照片的秒數（Cache-Control max-age）")
+
+    # 通訊錄資料來源
+    DIRECTORY_SOURCE: Literal["graph", "sql"] = Field(default="graph", description="通訊錄資料來源：graph 或 sql")
+
+    # SQL Server 設定（DIRECTORY_SOURCE=sql 時使用）
+    DB_URL: str = Field(default="", description="完整 SQLAlchemy 連線字串，填寫時優先於下列 DB_* 欄位（例如本機 sqlite:///）")
     DB_SERVER: str = Field(default="", description="SQL Server 主機名稱")
     DB_NAME: str = Field(default="", description="資料庫名稱")
     DB_USERNAME: str = Field(default="", description="資料庫使用者名稱")
     DB_PASSWORD: str = Field(default="", description="資料庫使用者密碼")
     DB_ACTIVE_STATUS: str = Field(default="在職", description="過濾在職員工的狀態值")
+    DB_POOL_SIZE: int = Field(default=5, description="資料庫連線池常駐連線數")
+    DB_POOL_MAX_OVERFLOW: int = Field(default=5, description="連線池尖峰時可額外建立的連線數")
+    DB_POOL_RECYCLE_SECONDS: int = Field(default=1800, description="連線重複使用的最長秒數，避免被伺服器端斷線")
 
     @property
     def resolved_azure_authority(self) -> str:
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+"""通訊錄快照快取：TTL、過期仍回舊資料（stale-while-revalidate）與單一飛行中更新。"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+from change_log import ChangeLog
+from metrics import CACHE_EVENTS, stage
+from models import (
+    EmployeeChange,
+    EmployeePublic,
+    OrgChart,
+    TreeIndex,
+    TreeNode,
+    build_org_chart,
+    build_tree_from_employees,
+    build_tree_index,
+    diff_employees,
+)
+from resolve_index import ResolveIndex
+from search_index import SearchIndex
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class DirectoryLoad:
+    """資料來源單次載入的結果；來源已自行組好樹（例如增量修補）時一併提供。
+
+    changes 為相對於上一份快照的員工變更，有值時索引可增量更新而不必重建。
+    version 由來源指定時（例如跨 worker 共用快照）沿用該版本號，否則遞增。
+    """
+
+    employees: list[EmployeePublic]
+    tree: list[TreeNode] | None = None
+    changes: list[EmployeeChange] | None = None
+    source: str = "graph"
+    version: int | None = None
+
+
+@dataclass(frozen=True)
+class _PreparedSnapshot:
+    """_prepare 建立的新物件；search / resolver 為 None 表示沿用上一份快照的索引增量更新。"""
+
+    tree: list[TreeNode]
+    index: TreeIndex
+    search: SearchIndex | None
+    resolver: ResolveIndex | None
+    changes: list[EmployeeChange] | None
+    org_chart: OrgChart | None
+
+
+DirectoryLoader = Callable[[], Awaitable[DirectoryLoad]]
+SnapshotListener = Callable[["DirectorySnapshot"], Awaitable[None]]
+
+# 由備援來源（磁碟）載入的快照一律視為過期，持續服務直到主來源同步成功
+FALLBACK_SOURCES = frozenset({"disk"})
+# 背景更新失敗後，至少間隔此秒數才再次嘗試，避免資料來源中斷時每個請求都去重試
+REFRESH_RETRY_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class DirectorySnapshot:
+    """某一時間點的員工清單與對應樹狀結構，建立後不再修改。"""
+
+    version: int
+    employees: list[EmployeePublic]
+    tree: list[TreeNode]
+    index: TreeIndex
+    search: SearchIndex
+    resolver: ResolveIndex
+    source: str = "graph"
+    org_chart: OrgChart | None = None
+    loaded_at: float = field(default_factory=time.monotonic)
+    loaded_at_utc: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @property
+    def age_seconds(self) -> float:
+        """快照建立至今經過的秒數。"""
+
+        return time.monotonic() - self.loaded_at
+
+
+class DirectoryCache:
+    """行程內共用的通訊錄快照。
+
+    - 尚無快照時，所有同時進來的請求共用同一個載入工作，避免同時打爆 Graph。
+    - 快照超過 TTL 後仍先回傳舊資料，並在背景僅啟動一個更新工作。
+    """
+
+    def __init__(
+        self,
+        loader: DirectoryLoader,
+        ttl_seconds: float,
+        change_log: ChangeLog | None = None,
+        org_chart_enabled: bool = False,
+    ) -> None:
+        self._loader = loader
+        self._ttl_seconds = ttl_seconds
+        self._change_log = change_log
+        self._org_chart_enabled = org_chart_enabled
+        self._snapshot: DirectorySnapshot | None = None
+        self._inflight: asyncio.Task[DirectorySnapshot] | None = None
+        self._version = 0
+        self._last_error: str | None = None
+        self._retry_at = 0.0
+        # 增量載入安裝失敗後，來源的增量游標已前進而不會重送該批變更；下次載入改為重建索引並重新比對
+        self._changes_lost = False
+        self._listeners: list[SnapshotListener] = []
+        self._listener_tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def snapshot(self) -> DirectorySnapshot | None:
+        """目前的快照，可能為 None 或已過期。"""
+
+        return self._snapshot
+
+    def add_listener(self, listener: SnapshotListener) -> None:
+        """註冊於每次成功自資料來源載入新快照後呼叫的回呼（例如寫入磁碟）。"""
+
+        self._listeners.append(listener)
+
+    def seed(self, employees: list[EmployeePublic], version: int, source: str = "disk") -> DirectorySnapshot | None:
+        """以備援資料預先放入快照，版本號由此延續；已有快照時不覆蓋。"""
+
+        if self._snapshot is not None:
+            return None
+        self._version = max(self._version, version - 1)
+        return self._install(DirectoryLoad(employees=employees, source=source))
+
+    def is_stale(self, snapshot: DirectorySnapshot) -> bool:
+        """快照是否已超過 TTL，或來自備援來源。"""
+
+        return snapshot.source in FALLBACK_SOURCES or snapshot.age_seconds >= self._ttl_seconds
+
+    async def get_snapshot(self) -> DirectorySnapshot:
+        """取得可用快照；冷啟動時等待載入，過期時回舊資料並於背景更新。"""
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            CACHE_EVENTS.inc(cache="snapshot", result="miss")
+            # 載入工作可能由其他請求或啟動流程發起，此處僅記錄等待時間
+            with stage("snapshot_wait"):
+                return await asyncio.shield(self._ensure_refresh())
+        if self.is_stale(snapshot):
+            CACHE_EVENTS.inc(cache="snapshot", result="stale")
+            if time.monotonic() >= self._retry_at:
+                self._ensure_refresh()
+        else:
+            CACHE_EVENTS.inc(cache="snapshot", result="hit")
+        return snapshot
+
+    def warm_up(self) -> None:
+        """於背景開始載入快照而不等待；前次更新失敗後的退避期間內不重試。"""
+
+        if time.monotonic() >= self._retry_at:
+            self._ensure_refresh()
+
+    async def refresh(self) -> DirectorySnapshot:
+        """強制更新快照；若已有更新工作在進行中則共用之。"""
+
+        return await asyncio.shield(self._ensure_refresh())
+
+    def _ensure_refresh(self) -> asyncio.Task[DirectorySnapshot]:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._load())
+            self._inflight.add_done_callback(self._on_refresh_done)
+        return self._inflight
+
+    async def _load(self) -> DirectorySnapshot:
+        started = time.perf_counter()
+        load = await self._loader()
+        try:
+            # 建樹與建立索引屬 CPU 密集工作，移至工作執行緒以免阻塞事件迴圈
+            with stage("snapshot_build"):
+                prepared = await asyncio.to_thread(self._prepare, load, self._snapshot)
+            snapshot = self._install(load, prepared)
+        except BaseException:
+            if load.changes is not None:
+                self._changes_lost = True
+            raise
+        LOGGER.info(
+            "Directory snapshot v%s loaded from %s: %s employees in %.0f ms",
+            snapshot.version,
+            snapshot.source,
+            len(snapshot.employees),
+            (time.perf_counter() - started) * 1000,
+        )
+        for listener in self._listeners:
+            task = asyncio.create_task(listener(snapshot))
+            self._listener_tasks.add(task)
+            task.add_done_callback(self._on_listener_done)
+        return snapshot
+
+    def _prepare(self, load: DirectoryLoad, previous: DirectorySnapshot | None) -> _PreparedSnapshot:
+        """建立樹、索引、組織圖與變更清單等新物件；不修改現有快照，可於工作執行緒執行。"""
+
+        employees = load.employees
+        tree = load.tree if load.tree is not None else build_tree_from_employees(employees)
+        # 有變更清單時搜尋與解析索引沿用上一份並增量更新，於 _install 中套用；
+        # 先前有增量變更未能套用時，變更清單不再能銜接上一份快照，改為完整重建與比對
+        changes = None if self._changes_lost else load.changes
+        incremental = previous is not None and changes is not None
+        if changes is None and self._change_log is not None and previous is not None:
+            with stage("diff"):
+                changes = diff_employees(previous.employees, employees)
+        return _PreparedSnapshot(
+            tree=tree,
+            index=build_tree_index(tree),
+            search=None if incremental else SearchIndex.build(employees),
+            resolver=None if incremental else ResolveIndex.build(employees),
+            changes=changes,
+            org_chart=build_org_chart(employees) if self._org_chart_enabled else None,
+        )
+
+    def _install(self, load: DirectoryLoad, prepared: _PreparedSnapshot | None = None) -> DirectorySnapshot:
+        previous = self._snapshot
+        if prepared is None:
+            prepared = self._prepare(load, previous)
+        if prepared.search is not None and prepared.resolver is not None:
+            search, resolver = prepared.search, prepared.resolver
+        else:
+            # 搜尋與解析索引只需反映最新資料，直接沿用上一份快照的索引並套用變更；
+            # 這些索引可能正被其他請求讀取，因此只在事件迴圈中修改
+            previous.search.apply(prepared.changes)
+            previous.resolver.apply(prepared.changes)
+            search, resolver = previous.search, previous.resolver
+        self._version = load.version if load.version is not None else self._version + 1
+        if self._change_log is not None and previous is not None and prepared.changes is not None:
+            self._change_log.record(previous.version, self._version, prepared.changes)
+        snapshot = DirectorySnapshot(
+            version=self._version,
+            employees=load.employees,
+            tree=prepared.tree,
+            index=prepared.index,
+            search=search,
+            resolver=resolver,
+            source=load.source,
+            org_chart=prepared.org_chart,
+        )
+        self._snapshot = snapshot
+        self._changes_lost = False
+        return snapshot
+
+    def _on_listener_done(self, task: asyncio.Task[None]) -> None:
+        self._listener_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.error("Directory snapshot listener failed: %s", task.exception())
+
+    def _on_refresh_done(self, task: asyncio.Task[DirectorySnapshot]) -> None:
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is None:
+            self._last_error = None
+            return
+        # 背景更新失敗時保留舊快照繼續服務，僅記錄錯誤
+        self._last_error = str(getattr(exc, "detail", exc))
+        self._retry_at = time.monotonic() + min(REFRESH_RETRY_SECONDS, self._ttl_seconds)
+        LOGGER.error("Directory snapshot refresh failed: %s", self._last_error)
+
+    def stats(self) -> dict[str, Any]:
+        """提供 /health 使用的快照新鮮度資訊。"""
+
+        snapshot = self._snapshot
+        return {
+            "snapshot_version": snapshot.version if snapshot else None,
+            "snapshot_source": snapshot.source if snapshot else None,
+            "snapshot_age_seconds": round(snapshot.age_seconds, 1) if snapshot else None,
+            "snapshot_loaded_at": snapshot.loaded_at_utc.isoformat() if snapshot else None,
+            "snapshot_stale": self.is_stale(snapshot) if snapshot else None,
+            "snapshot_refreshing": self._inflight is not None and not self._inflight.done(),
+            "snapshot_last_error": self._last_error,
+        }
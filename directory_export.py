@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+"""以串流方式匯出通訊錄樹（NDJSON / CSV），依深度優先順序逐節點輸出。"""
+
+import csv
+import io
+import json
+from typing import Iterator, Literal
+
+from models import PUBLIC_EMPLOYEE_FIELDS, TreeNode
+
+ExportFormat = Literal["ndjson", "csv"]
+EMPLOYEE_FIELDS = list(PUBLIC_EMPLOYEE_FIELDS)
+CSV_COLUMNS = ["key", "parent_key", "depth", "node_type", "label", *EMPLOYEE_FIELDS]
+# 每累積約此大小才送出一個 chunk，避免逐行 send 的額外負擔
+CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def iter_nodes(tree: list[TreeNode]) -> Iterator[tuple[TreeNode, str | None, int]]:
+    """以明確堆疊深度優先走訪，逐一產生 (節點, 父節點 key, 深度)，不額外複製整棵樹。"""
+
+    stack: list[tuple[TreeNode, str | None, int]] = [(node, None, 0) for node in reversed(tree)]
+    while stack:
+        node, parent_key, depth = stack.pop()
+        yield node, parent_key, depth
+        for child in reversed(node.children):
+            stack.append((child, node.key, depth + 1))
+
+
+def _ndjson_lines(tree: list[TreeNode]) -> Iterator[str]:
+    for node, parent_key, depth in iter_nodes(tree):
+        record = {
+            "key": node.key,
+            "parent_key": parent_key,
+            "depth": depth,
+            "node_type": node.node_type,
+            "label": node.label,
+            "data": node.data.model_dump() if node.data is not None else None,
+        }
+        yield json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _csv_lines(tree: list[TreeNode]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    # 加上 BOM 讓 Excel 正確辨識 UTF-8 中文
+    writer.writerow(CSV_COLUMNS)
+    yield "\ufeff" + flush()
+    for node, parent_key, depth in iter_nodes(tree):
+        data = node.data
+        values = [getattr(data, field) if data is not None else None for field in EMPLOYEE_FIELDS]
+        writer.writerow([node.key, parent_key, depth, node.node_type, node.label, *values])
+        yield flush()
+
+
+def stream_tree(tree: list[TreeNode], export_format: ExportFormat) -> Iterator[bytes]:
+    """將樹轉為分段的 bytes 串流；呼叫端需傳入同一份快照的樹以確保內容一致。"""
+
+    lines = _ndjson_lines(tree) if export_format == "ndjson" else _csv_lines(tree)
+    chunk: list[str] = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(chunk).encode("utf-8")
+            chunk.clear()
+            size = 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
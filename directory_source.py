@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+"""通訊錄資料來源介面，依 DIRECTORY_SOURCE 設定選用 Microsoft Graph 或 SQL。"""
+
+import asyncio
+from typing import Protocol
+
+from config import Settings
+from directory_cache import DirectoryLoad
+from directory_sync import GraphDeltaSync
+from graph_service import check_graph_health, fetch_employees_from_graph
+from models import employees_from_graph_users
+from sql_directory import SqlDirectorySource
+
+
+class DirectorySource(Protocol):
+    """提供完整員工清單（必要時連同樹或增量變更）的資料來源。"""
+
+    name: str
+
+    async def load(self) -> DirectoryLoad: ...
+
+    async def check_health(self) -> dict[str, str]: ...
+
+    async def close(self) -> None: ...
+
+
+class GraphDirectorySource:
+    """以 Microsoft Graph 為資料來源：預設以 users/delta 增量同步，關閉時改為每次完整抓取。"""
+
+    name = "graph"
+
+    def __init__(self, delta_sync_enabled: bool = True) -> None:
+        self._delta_sync = GraphDeltaSync() if delta_sync_enabled else None
+
+    async def load(self) -> DirectoryLoad:
+        if self._delta_sync is not None:
+            return await self._delta_sync.sync()
+        raw_users = await fetch_employees_from_graph()
+        employees = await asyncio.to_thread(employees_from_graph_users, raw_users)
+        return DirectoryLoad(employees=employees, source=self.name)
+
+    async def check_health(self) -> dict[str, str]:
+        return await check_graph_health()
+
+    async def close(self) -> None:
+        # 共用的 Graph 連線池由應用程式 lifespan 管理
+        return None
+
+
+def create_directory_source(settings: Settings) -> DirectorySource:
+    """依設定建立資料來源。"""
+
+    if settings.DIRECTORY_SOURCE == "sql":
+        return SqlDirectorySource.from_settings(settings)
+    return GraphDirectorySource(delta_sync_enabled=settings.GRAPH_DELTA_SYNC_ENABLED)
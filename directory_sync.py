@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+"""以 Microsoft Graph users/delta 進行增量通訊錄同步。"""
+
+import asyncio
+import logging
+from typing import Any
+
+from directory_cache import DirectoryLoad
+from graph_service import GraphResyncRequired, crawl_graph_users, fetch_latest_delta_link, fetch_user_delta
+from models import (
+    EmployeeChange,
+    EmployeePublic,
+    TreeNode,
+    build_tree_from_employees,
+    employee_from_graph_user,
+    employees_from_graph_users,
+    patch_tree,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _build_directory(raw_users: dict[str, dict[str, Any]]) -> tuple[dict[str, EmployeePublic], list[TreeNode]]:
+    employees = {employee.employee_id: employee for employee in employees_from_graph_users(raw_users.values())}
+    return employees, build_tree_from_employees(list(employees.values()))
+
+
+class GraphDeltaSync:
+    """保存 deltaLink 與目前在職員工集合，每輪只套用 Graph 回報的變更。
+
+    - 初次同步或 delta token 失效時才完整重抓（分區並行抓取 /users）。
+    - `@removed` 與 `accountEnabled=false` 皆視為離開在職集合。
+    - 樹狀結構以 `patch_tree` 修補，只重建受影響的校區／部門分支。
+    """
+
+    def __init__(self) -> None:
+        self._raw_users: dict[str, dict[str, Any]] = {}
+        self._employees: dict[str, EmployeePublic] = {}
+        self._tree: list[TreeNode] | None = None
+        self._delta_link: str | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def delta_link(self) -> str | None:
+        return self._delta_link
+
+    async def sync(self) -> DirectoryLoad:
+        """執行一輪同步並回傳最新員工清單與樹。"""
+
+        async with self._lock:
+            if self._delta_link is None:
+                await self._full_sync()
+                return DirectoryLoad(employees=list(self._employees.values()), tree=self._tree)
+            try:
+                changes = await self._incremental_sync()
+            except GraphResyncRequired:
+                LOGGER.warning("Delta token expired, falling back to full directory resync")
+                await self._full_sync()
+                return DirectoryLoad(employees=list(self._employees.values()), tree=self._tree)
+            return DirectoryLoad(employees=list(self._employees.values()), tree=self._tree, changes=changes)
+
+    async def _full_sync(self) -> None:
+        # 先取得代表目前狀態的 deltaLink 再並行抓取全部使用者；
+        # 抓取期間發生的變更會在下一輪 delta 重播，套用結果相同
+        delta_link = await fetch_latest_delta_link()
+        items = await crawl_graph_users()
+        raw_users: dict[str, dict[str, Any]] = {}
+        for item in items:
+            user_id = item.get("id")
+            if user_id:
+                raw_users[user_id] = item
+        # 轉換與建樹屬 CPU 密集工作，且只產生新物件，移至工作執行緒以免阻塞事件迴圈
+        employees, tree = await asyncio.to_thread(_build_directory, raw_users)
+
+        self._raw_users = raw_users
+        self._employees = employees
+        self._tree = tree
+        self._delta_link = delta_link
+        LOGGER.info("Full directory sync finished: %s active of %s users", len(employees), len(raw_users))
+
+    async def _incremental_sync(self) -> list[EmployeeChange]:
+        items, delta_link = await fetch_user_delta(self._delta_link)
+        changes = self._apply(items)
+        if changes:
+            self._tree = patch_tree(self._tree or [], changes)
+        self._delta_link = delta_link
+        LOGGER.info("Incremental directory sync: %s delta items, %s employee changes", len(items), len(changes))
+        return changes
+
+    def _apply(self, items: list[dict[str, Any]]) -> list[EmployeeChange]:
+        changes: list[EmployeeChange] = []
+        for item in items:
+            user_id = item.get("id")
+            if not user_id:
+                continue
+            old = self._employees.get(user_id)
+
+            if "@removed" in item:
+                self._raw_users.pop(user_id, None)
+                new = None
+            else:
+                # delta 回應可能僅含變更欄位，需與既有資料合併
+                merged = {**self._raw_users.get(user_id, {}), **item}
+                self._raw_users[user_id] = merged
+                new = employee_from_graph_user(merged) if merged.get("accountEnabled", True) else None
+
+            if new is None:
+                if old is not None:
+                    del self._employees[user_id]
+                    changes.append((old, None))
+            elif new != old:
+                self._employees[user_id] = new
+                changes.append((old, new))
+        return changes
@@ -2,17 +2,23 @@ from __future__ import annotations
 
 """與 Microsoft Graph 互動的服務模組。"""
 
+import asyncio
 import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Any
-from urllib.parse import urlencode
+from urllib.parse import quote, urlencode
 
 import httpx
 from fastapi import HTTPException, status
 
 from config import get_settings
+from metrics import GRAPH_CRAWL_PAGES, GRAPH_REQUESTS, stage
 
 LOGGER = logging.getLogger(__name__)
 GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+DEFAULT_TOKEN_LIFETIME_SECONDS = 3599.0
 SELECT_FIELDS = ",".join(
     [
         "id",
@@ -28,10 +34,118 @@ SELECT_FIELDS = ",".join(
         "businessPhones",
     ]
 )
+# 組織圖需要的主管關係：完整抓取以 $expand 取得，users/delta 則以 $select=manager 取得 manager@delta
+MANAGER_EXPAND = "manager($select=id)"
+_POOL_PROBE_EXTENSION = "contacts.pool_probe"
+# 節流或暫時無法服務時，Graph 會附上 Retry-After
+RETRYABLE_STATUS_CODES = {
+    status.HTTP_429_TOO_MANY_REQUESTS,
+    status.HTTP_503_SERVICE_UNAVAILABLE,
+    status.HTTP_504_GATEWAY_TIMEOUT,
+}
+UPN_PARTITION_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
 
 
-async def get_graph_access_token() -> str:
-    """使用 Client Credentials Flow 取得 Graph Access Token。"""
+class GraphResyncRequired(Exception):
+    """Delta token 已失效（Graph 回傳 410 Gone），需重新完整同步。"""
+
+
+class ConnectionPoolStats:
+    """透過 httpcore trace 事件統計每個請求是新建連線或沿用既有連線。"""
+
+    def __init__(self) -> None:
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    async def on_request(self, request: httpx.Request) -> None:
+        probe = {"connected": False}
+
+        async def trace(event_name: str, info: dict[str, Any]) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                probe["connected"] = True
+
+        request.extensions["trace"] = trace
+        request.extensions[_POOL_PROBE_EXTENSION] = probe
+
+    async def on_response(self, response: httpx.Response) -> None:
+        probe = response.request.extensions.get(_POOL_PROBE_EXTENSION)
+        if probe is None:
+            return
+        if probe["connected"]:
+            self.new_connections += 1
+        else:
+            self.reused_connections += 1
+        LOGGER.debug(
+            "Graph %s %s on %s connection",
+            response.request.method,
+            response.request.url.host,
+            "new" if probe["connected"] else "reused",
+        )
+
+    def snapshot(self) -> dict[str, int]:
+        return {"new": self.new_connections, "reused": self.reused_connections}
+
+
+POOL_STATS = ConnectionPoolStats()
+_HTTP_CLIENT: httpx.AsyncClient | None = None
+
+
+def create_graph_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    """依設定建立長駐的 HTTP 連線池，供 Graph 與 Entra 呼叫共用。"""
+
+    settings = get_settings()
+    http2 = settings.GRAPH_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            LOGGER.warning("GRAPH_HTTP2 enabled but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.GRAPH_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GRAPH_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.GRAPH_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(
+        timeout=settings.GRAPH_HTTP_TIMEOUT_SECONDS,
+        limits=limits,
+        http2=http2,
+        transport=transport,
+        event_hooks={"request": [POOL_STATS.on_request], "response": [POOL_STATS.on_response]},
+    )
+
+
+async def open_graph_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    """於應用程式啟動時建立共用連線池。"""
+
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None and not _HTTP_CLIENT.is_closed:
+        await _HTTP_CLIENT.aclose()
+    _HTTP_CLIENT = create_graph_client(transport)
+    return _HTTP_CLIENT
+
+
+async def close_graph_client() -> None:
+    """於應用程式關閉時釋放共用連線池。"""
+
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+
+
+def get_graph_client() -> httpx.AsyncClient:
+    """取得共用連線池；未經 lifespan 啟動時（例如腳本）會延遲建立。"""
+
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = create_graph_client()
+    return _HTTP_CLIENT
+
+
+async def _request_graph_token() -> tuple[str, float]:
+    """使用 Client Credentials Flow 向 Entra 取得 Token，回傳 (token, 有效秒數)。"""
 
     settings = get_settings()
     if not (settings.AZURE_CLIENT_ID and settings.AZURE_CLIENT_SECRET and settings.AZURE_TENANT_ID):
@@ -45,79 +159,439 @@ async def get_graph_access_token() -> str:
         "scope": "https://graph.microsoft.com/.default",
     }
 
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            response = await client.post(token_url, data=payload)
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:  # pragma: no cover - 主要依賴日誌除錯
-            LOGGER.error("Graph token API failed: %s - %s", exc.response.status_code, exc.response.text)
-            detail = "Graph authentication failed"
-            if exc.response.status_code in {status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN}:
-                detail = "Unauthorized to access Microsoft Graph"
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail) from exc
-        except httpx.HTTPError as exc:  # pragma: no cover
-            LOGGER.error("Graph token request error: %s", exc)
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Graph token request error") from exc
-
-    token = response.json().get("access_token")
+    client = get_graph_client()
+    try:
+        response = await client.post(token_url, data=payload, timeout=15.0)
+        GRAPH_REQUESTS.inc(endpoint="token", status=response.status_code)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:  # pragma: no cover - 主要依賴日誌除錯
+        LOGGER.error("Graph token API failed: %s - %s", exc.response.status_code, exc.response.text)
+        detail = "Graph authentication failed"
+        if exc.response.status_code in {status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN}:
+            detail = "Unauthorized to access Microsoft Graph"
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail) from exc
+    except httpx.HTTPError as exc:  # pragma: no cover
+        GRAPH_REQUESTS.inc(endpoint="token", status="error")
+        LOGGER.error("Graph token request error: %s", exc)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Graph token request error") from exc
+
+    body = response.json()
+    token = body.get("access_token")
     if not token:
         LOGGER.error("Graph token response missing access_token")
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Graph token not available")
 
-    return token
+    try:
+        expires_in = float(body.get("expires_in") or DEFAULT_TOKEN_LIFETIME_SECONDS)
+    except (TypeError, ValueError):
+        expires_in = DEFAULT_TOKEN_LIFETIME_SECONDS
+    return token, expires_in
+
+
+class GraphTokenCache:
+    """快取 App Token，依 expires_in 於到期前在背景續期，並確保同時只有一個續期請求。"""
+
+    def __init__(self) -> None:
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._renew_task: asyncio.Task[str] | None = None
+
+    def _renew_margin(self) -> float:
+        return get_settings().GRAPH_TOKEN_RENEW_MARGIN_SECONDS
+
+    def _is_fresh(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at - self._renew_margin()
+
+    async def get_token(self) -> str:
+        """取得可用 Token；接近到期時先回舊 Token 並於背景續期，已過期則等待續期。"""
+
+        now = time.monotonic()
+        if self._is_fresh(now):
+            return self._token  # type: ignore[return-value]
+        if self._token is not None and now < self._expires_at:
+            self._schedule_renewal()
+            return self._token
+        return await self._renew()
+
+    def invalidate(self, token: str | None = None) -> None:
+        """作廢快取 Token；若指定 token 則僅在仍為同一組時作廢，避免覆蓋他人剛續期的結果。"""
+
+        if token is None or token == self._token:
+            self._token = None
+            self._expires_at = 0.0
+
+    def _schedule_renewal(self) -> None:
+        if self._renew_task is not None and not self._renew_task.done():
+            return
+        self._renew_task = asyncio.create_task(self._renew())
+        self._renew_task.add_done_callback(self._on_renewal_done)
+
+    @staticmethod
+    def _on_renewal_done(task: asyncio.Task[str]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.warning("Background Graph token renewal failed: %s", task.exception())
+
+    async def _renew(self) -> str:
+        async with self._lock:
+            # 等待鎖期間可能已由其他請求完成續期
+            if self._is_fresh(time.monotonic()):
+                return self._token  # type: ignore[return-value]
+            token, expires_in = await _request_graph_token()
+            self._token = token
+            self._expires_at = time.monotonic() + expires_in
+            LOGGER.info("Graph token renewed, expires in %.0f s", expires_in)
+            return token
+
 
+_TOKEN_CACHE = GraphTokenCache()
 
-async def _get_graph_page(client: httpx.AsyncClient, url: str, headers: dict[str, str]) -> dict[str, Any]:
-    """呼叫 Graph API 取得單頁結果，並處理常見錯誤。"""
 
+async def get_graph_access_token() -> str:
+    """取得快取的 Graph Access Token，必要時才向 Entra 重新申請。"""
+
+    with stage("token"):
+        return await _TOKEN_CACHE.get_token()
+
+
+class GraphThrottle:
+    """Graph 回 429/503/504 時依 Retry-After 暫停所有後續請求，避免並行分區持續撞上節流。"""
+
+    def __init__(self) -> None:
+        self._resume_at = 0.0
+        self.throttled = 0
+
+    async def wait(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def defer(self, seconds: float) -> None:
+        self.throttled += 1
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+_THROTTLE = GraphThrottle()
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """優先使用 Retry-After（秒數），缺少時以指數退避，並以 GRAPH_RETRY_MAX_SECONDS 為上限。"""
+
+    settings = get_settings()
     try:
-        response = await client.get(url, headers=headers)
-        if response.status_code in {status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN}:
-            LOGGER.warning("Graph access denied (%s) when calling %s", response.status_code, url)
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Graph authentication rejected")
-        if response.status_code >= 500:
-            LOGGER.error("Graph service error (%s) for %s", response.status_code, url)
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Graph upstream error")
-        response.raise_for_status()
-        return response.json()
+        delay = float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        delay = float(2**attempt)
+    return min(max(delay, 0.0), settings.GRAPH_RETRY_MAX_SECONDS)
+
+
+def _endpoint_label(url: str) -> str:
+    """以 Graph 資源路徑（例如 users/delta）作為指標標籤，避免查詢參數與使用者 id 造成標籤爆量。"""
+
+    path = httpx.URL(url).path.removeprefix("/v1.0/") or "/"
+    parts = path.split("/")
+    if len(parts) > 2 and parts[0] == "users":
+        # users/{id}/photo 等單一使用者資源
+        parts[1] = "{id}"
+    return "/".join(parts)
+
+
+async def _send_graph_request(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict[str, str],
+    *,
+    timeout: Any = httpx.USE_CLIENT_DEFAULT,
+    retry_on_unauthorized: bool = True,
+    max_retries: int | None = None,
+) -> httpx.Response:
+    """送出 Graph GET 請求並處理節流與 Token 失效，回傳最終回應，其餘狀態碼由呼叫端判斷。
+
+    收到 401 時會作廢快取 Token 並以新 Token 重試一次，headers 會就地更新供後續分頁沿用。
+    收到 429/503/504 時依 Retry-After 等待後重試，最多 max_retries 次（預設 GRAPH_MAX_RETRIES）。
+    """
+
+    if max_retries is None:
+        max_retries = get_settings().GRAPH_MAX_RETRIES
+    try:
+        for attempt in range(max_retries + 1):
+            await _THROTTLE.wait()
+            with stage("graph_page"):
+                response = await client.get(url, headers=headers, timeout=timeout)
+            GRAPH_REQUESTS.inc(endpoint=_endpoint_label(url), status=response.status_code)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                break
+            delay = _retry_delay(response, attempt)
+            LOGGER.warning("Graph throttled (%s) for %s, retrying in %.1f s", response.status_code, url, delay)
+            if "Retry-After" in response.headers:
+                # 上游明確要求暫停時，所有並行請求一起等待
+                _THROTTLE.defer(delay)
+            else:
+                await asyncio.sleep(delay)
     except httpx.HTTPError as exc:  # pragma: no cover
+        GRAPH_REQUESTS.inc(endpoint=_endpoint_label(url), status="error")
         LOGGER.error("Graph request error for %s: %s", url, exc)
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Graph request failed") from exc
+    if response.status_code == status.HTTP_401_UNAUTHORIZED and retry_on_unauthorized:
+        LOGGER.info("Graph rejected cached token for %s, renewing and retrying once", url)
+        _TOKEN_CACHE.invalidate(headers.get("Authorization", "").removeprefix("Bearer "))
+        headers["Authorization"] = f"Bearer {await get_graph_access_token()}"
+        return await _send_graph_request(
+            client, url, headers, timeout=timeout, retry_on_unauthorized=False, max_retries=max_retries
+        )
+    return response
+
+
+def _raise_for_graph_error(response: httpx.Response, url: str) -> None:
+    if response.status_code in {status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN}:
+        LOGGER.warning("Graph access denied (%s) when calling %s", response.status_code, url)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Graph authentication rejected")
+    if response.status_code >= 500:
+        LOGGER.error("Graph service error (%s) for %s", response.status_code, url)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Graph upstream error")
+    if response.is_error:
+        LOGGER.error("Graph request failed (%s) for %s", response.status_code, url)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Graph request failed")
+
+
+async def _get_graph_page(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict[str, str],
+    *,
+    timeout: Any = httpx.USE_CLIENT_DEFAULT,
+    retry_on_unauthorized: bool = True,
+    max_retries: int | None = None,
+) -> dict[str, Any]:
+    """呼叫 Graph API 取得單頁 JSON 結果，並處理常見錯誤（重試規則見 _send_graph_request）。"""
+
+    response = await _send_graph_request(
+        client,
+        url,
+        headers,
+        timeout=timeout,
+        retry_on_unauthorized=retry_on_unauthorized,
+        max_retries=max_retries,
+    )
+    if response.status_code == status.HTTP_410_GONE:
+        LOGGER.warning("Graph delta token expired for %s", url)
+        raise GraphResyncRequired(url)
+    _raise_for_graph_error(response, url)
+    return response.json()
+
+
+@dataclass
+class CrawlStats:
+    """單次 /users 完整抓取的統計，供調整分區數與並行數。"""
+
+    partitions: int
+    concurrency: int
+    pages: int = 0
+    users: int = 0
+    throttled: int = 0
+    wall_ms: float = 0.0
+    finished_at: datetime | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "partitions": self.partitions,
+            "concurrency": self.concurrency,
+            "pages": self.pages,
+            "users": self.users,
+            "throttled": self.throttled,
+            "wall_ms": round(self.wall_ms, 1),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
 
 
-async def fetch_employees_from_graph() -> list[dict[str, Any]]:
+_LAST_CRAWL: CrawlStats | None = None
+
+
+def last_crawl_stats() -> dict[str, Any] | None:
+    """最近一次完整抓取的統計，尚未抓取時為 None。"""
+
+    return _LAST_CRAWL.as_dict() if _LAST_CRAWL is not None else None
+
+
+def upn_partition_filters(count: int) -> list[str | None]:
+    """將 userPrincipalName 依首字元切成 count 個相鄰範圍的 $filter。
+
+    範圍兩端皆含（ge/le 為 Graph 預設支援的運算子），首尾範圍不設下限／上限，
+    因此任何 UPN 都至少落在一個分區；僅剛好等於邊界字元者會重複，由合併時去重。
+    """
+
+    alphabet = UPN_PARTITION_ALPHABET
+    count = min(count, len(alphabet))
+    if count <= 1:
+        return [None]
+    bounds = [alphabet[len(alphabet) * index // count] for index in range(1, count)]
+    filters: list[str | None] = [f"userPrincipalName le '{bounds[0]}'"]
+    filters.extend(
+        f"userPrincipalName ge '{low}' and userPrincipalName le '{high}'" for low, high in zip(bounds, bounds[1:])
+    )
+    filters.append(f"userPrincipalName ge '{bounds[-1]}'")
+    return filters
+
+
+async def crawl_graph_users(
+    client: httpx.AsyncClient | None = None,
+    partitions: int | None = None,
+    concurrency: int | None = None,
+) -> list[dict[str, Any]]:
+    """以多個 userPrincipalName 範圍分區並行抓取 /users（含停用帳號），合併後依 id 去重。
+
+    各分區各自依 @odata.nextLink 循序翻頁，同時進行中的請求數以 concurrency 為上限。
+    """
+
+    global _LAST_CRAWL
+    settings = get_settings()
+    filters = upn_partition_filters(partitions or settings.GRAPH_CRAWL_PARTITIONS)
+    stats = CrawlStats(partitions=len(filters), concurrency=concurrency or settings.GRAPH_CRAWL_CONCURRENCY)
+    semaphore = asyncio.Semaphore(stats.concurrency)
+    throttled_before = _THROTTLE.throttled
+    started = time.perf_counter()
+
+    access_token = await get_graph_access_token()
+    client = client or get_graph_client()
+
+    expand_manager = settings.ORG_CHART_ENABLED
+
+    async def crawl_partition(filter_expression: str | None) -> list[dict[str, Any]]:
+        headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+        params: dict[str, Any] = {"$select": SELECT_FIELDS, "$top": 999}
+        if expand_manager:
+            # 主管關係隨分頁一併展開，不需逐一呼叫 /users/{id}/manager
+            params["$expand"] = MANAGER_EXPAND
+        if filter_expression is not None:
+            # userPrincipalName 的 ge/le 屬於預設查詢即支援的篩選，不需 ConsistencyLevel 與 $count 等進階查詢參數，
+            # 因此可與 $expand=manager 並用，且不讀取 @odata.count
+            params["$filter"] = filter_expression
+        next_url: str | None = f"{GRAPH_BASE_URL}/users?{urlencode(params)}"
+        items: list[dict[str, Any]] = []
+        while next_url:
+            async with semaphore:
+                data = await _get_graph_page(client, next_url, headers)
+            stats.pages += 1
+            items.extend(data.get("value") or [])
+            next_url = data.get("@odata.nextLink")
+        return items
+
+    results = await asyncio.gather(*(crawl_partition(expression) for expression in filters))
+    users: dict[str, dict[str, Any]] = {}
+    for items in results:
+        for item in items:
+            users[item.get("id") or item.get("userPrincipalName") or ""] = item
+
+    stats.users = len(users)
+    stats.throttled = _THROTTLE.throttled - throttled_before
+    stats.wall_ms = (time.perf_counter() - started) * 1000
+    stats.finished_at = datetime.now(timezone.utc)
+    _LAST_CRAWL = stats
+    GRAPH_CRAWL_PAGES.observe(stats.pages, kind="full")
+    LOGGER.info(
+        "Graph crawl finished: %s users, %s pages over %s partitions (concurrency %s, throttled %s) in %.0f ms",
+        stats.users,
+        stats.pages,
+        stats.partitions,
+        stats.concurrency,
+        stats.throttled,
+        stats.wall_ms,
+    )
+    return list(users.values())
+
+
+async def fetch_employees_from_graph(client: httpx.AsyncClient | None = None) -> list[dict[str, Any]]:
     """呼叫 Microsoft Graph 取得使用者清單，並移除停用帳號。"""
 
+    users = await crawl_graph_users(client)
+    filtered_users = [item for item in users if item.get("accountEnabled", True)]
+    return filtered_users
+
+
+def _delta_select_fields() -> str:
+    # deltaLink 會保留 $select，之後每輪 delta 皆會回報主管異動
+    return f"{SELECT_FIELDS},manager" if get_settings().ORG_CHART_ENABLED else SELECT_FIELDS
+
+
+async def fetch_latest_delta_link(client: httpx.AsyncClient | None = None) -> str:
+    """以 $deltatoken=latest 取得代表「目前狀態」的 deltaLink，不需逐頁走完初次 delta。"""
+
+    params = {"$select": _delta_select_fields(), "$deltatoken": "latest"}
+    _, delta_link = await fetch_user_delta(f"{GRAPH_BASE_URL}/users/delta?{urlencode(params)}", client)
+    return delta_link
+
+
+async def fetch_user_delta(
+    delta_link: str | None = None,
+    client: httpx.AsyncClient | None = None,
+) -> tuple[list[dict[str, Any]], str]:
+    """以 users/delta 取得使用者變更，回傳 (變更清單, 下一輪使用的 deltaLink)。
+
+    未提供 delta_link 時為初次同步，回傳全部使用者（含停用帳號，由呼叫端判斷）。
+    delta token 失效時拋出 GraphResyncRequired。
+    """
+
     access_token = await get_graph_access_token()
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Accept": "application/json",
+        "Prefer": "odata.maxpagesize=999",
     }
-    params = {"$select": SELECT_FIELDS, "$top": 999}
-    url = f"{GRAPH_BASE_URL}/users?{urlencode(params)}"
-    users: list[dict[str, Any]] = []
+    next_url: str | None = delta_link or f"{GRAPH_BASE_URL}/users/delta?{urlencode({'$select': _delta_select_fields()})}"
+    changes: list[dict[str, Any]] = []
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        next_url: str | None = url
-        while next_url:
-            data = await _get_graph_page(client, next_url, headers)
-            items = data.get("value") or []
-            users.extend(items)
-            next_url = data.get("@odata.nextLink")
+    client = client or get_graph_client()
+    pages = 0
+    while next_url:
+        data = await _get_graph_page(client, next_url, headers)
+        pages += 1
+        changes.extend(data.get("value") or [])
+        next_url = data.get("@odata.nextLink")
+        new_delta_link = data.get("@odata.deltaLink")
+        if new_delta_link:
+            GRAPH_CRAWL_PAGES.observe(pages, kind="delta")
+            return changes, new_delta_link
 
-    filtered_users = [item for item in users if item.get("accountEnabled", True)]
-    return filtered_users
+    LOGGER.error("Graph delta response ended without @odata.deltaLink")
+    raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Graph delta response incomplete")
+
+
+def _normalize_etag(value: str | None) -> str | None:
+    return value.removeprefix("W/").strip('"') if value else None
+
+
+async def fetch_user_photo_etag(user_id: str, client: httpx.AsyncClient | None = None) -> str | None:
+    """取得使用者大頭貼的 mediaEtag（僅中繼資料，不下載影像）；沒有大頭貼時回傳 None。"""
+
+    url = f"{GRAPH_BASE_URL}/users/{quote(user_id, safe='')}/photo"
+    headers = {"Authorization": f"Bearer {await get_graph_access_token()}", "Accept": "application/json"}
+    response = await _send_graph_request(client or get_graph_client(), url, headers)
+    if response.status_code == status.HTTP_404_NOT_FOUND:
+        return None
+    _raise_for_graph_error(response, url)
+    return _normalize_etag(response.json().get("@odata.mediaEtag")) or ""
+
+
+async def fetch_user_photo(user_id: str, client: httpx.AsyncClient | None = None) -> tuple[bytes, str | None] | None:
+    """下載使用者大頭貼原圖，回傳 (影像內容, ETag)；沒有大頭貼時回傳 None。"""
+
+    url = f"{GRAPH_BASE_URL}/users/{quote(user_id, safe='')}/photo/$value"
+    headers = {"Authorization": f"Bearer {await get_graph_access_token()}"}
+    response = await _send_graph_request(client or get_graph_client(), url, headers)
+    if response.status_code == status.HTTP_404_NOT_FOUND:
+        return None
+    _raise_for_graph_error(response, url)
+    return response.content, _normalize_etag(response.headers.get("ETag"))
 
 
-async def check_graph_health() -> dict[str, str]:
+async def check_graph_health(client: httpx.AsyncClient | None = None) -> dict[str, str]:
     """簡易呼叫 Graph 以驗證服務可用性。"""
 
     try:
         token = await get_graph_access_token()
         headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
         test_url = f"{GRAPH_BASE_URL}/organization?$top=1"
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            await _get_graph_page(client, test_url, headers)
+        await _get_graph_page(client or get_graph_client(), test_url, headers, timeout=10.0, max_retries=0)
         return {"graph": "ok"}
     except HTTPException as exc:
         LOGGER.error("Graph health failed: %s", exc)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+"""背景健康探測：固定間隔檢查資料來源，/health 直接回傳最近一次結果。"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+LOGGER = logging.getLogger(__name__)
+
+HealthCheck = Callable[[], Awaitable[dict[str, str]]]
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    """單次探測結果；status 為資料來源回報的狀態（例如 {"graph": "ok"}）。"""
+
+    status: dict[str, str]
+    checked_at: datetime
+    latency_ms: float
+
+    @property
+    def ok(self) -> bool:
+        return all(value == "ok" for value in self.status.values())
+
+
+class HealthProber:
+    """於背景依固定間隔執行健康檢查，避免探針請求直接打到上游服務。"""
+
+    def __init__(self, check: HealthCheck, interval_seconds: float, timeout_seconds: float = 15.0) -> None:
+        self._check = check
+        self._interval_seconds = interval_seconds
+        self._timeout_seconds = timeout_seconds
+        self._latest: ProbeResult | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def latest(self) -> ProbeResult | None:
+        """最近一次探測結果，尚未完成首次探測時為 None。"""
+
+        return self._latest
+
+    async def probe_once(self) -> ProbeResult:
+        """立即執行一次探測並更新結果。"""
+
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(self._check(), timeout=self._timeout_seconds)
+        except asyncio.TimeoutError:
+            status = {"probe": "failed: timeout"}
+        except Exception as exc:
+            LOGGER.error("Health probe failed: %s", exc)
+            status = {"probe": f"failed: {type(exc).__name__}"}
+        result = ProbeResult(
+            status=status,
+            checked_at=datetime.now(timezone.utc),
+            latency_ms=(time.perf_counter() - started) * 1000,
+        )
+        if self._latest is not None and self._latest.ok != result.ok:
+            LOGGER.warning("Health probe status changed: %s", status)
+        self._latest = result
+        return result
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self._interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        """提供 /health 使用的探測狀態與時間資訊。"""
+
+        result = self._latest
+        if result is None:
+            return {"health_checked_at": None, "health_check_latency_ms": None}
+        return {
+            **result.status,
+            "health_checked_at": result.checked_at.isoformat(),
+            "health_check_latency_ms": round(result.latency_ms, 1),
+        }
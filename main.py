@@ -2,57 +2,346 @@ from __future__ import annotations
 
 """FastAPI 入口點，提供通訊錄樹狀 API 與健康檢查。"""
 
+import asyncio
 import logging
+import math
+import time
 import traceback
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from pydantic import TypeAdapter
+from starlette.background import BackgroundTask
 from starlette.middleware.sessions import SessionMiddleware
 
+from admission import AdmissionController
+from change_log import ChangeLog
 from config import get_settings
-from graph_service import check_graph_health, fetch_employees_from_graph
-from models import EmployeePublic, TreeNode, build_tree_from_employees, find_node_by_key
+from directory_cache import DirectoryCache, DirectorySnapshot
+from directory_export import MEDIA_TYPES, ExportFormat, stream_tree
+from directory_source import create_directory_source
+from graph_service import POOL_STATS, close_graph_client, last_crawl_stats, open_graph_client
+from health_probe import HealthProber
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    HTTP_REQUEST_SECONDS,
+    HTTP_RESPONSE_BYTES,
+    REGISTRY,
+    begin_request,
+    stage,
+    summarize_stages,
+    timed,
+)
+from models import (
+    Breadcrumb,
+    MemberPage,
+    ResolveRequest,
+    ResolveResponse,
+    ResolveResult,
+    SearchPage,
+    SearchResult,
+    TreeChangeSet,
+    TreeNode,
+    TruncatedTreeNode,
+    paginate_members,
+    truncate_tree,
+)
+from photo_cache import DEFAULT_PHOTO_SIZE, PHOTO_SIZES, PhotoCache, PhotoDiskStore, thumbnail_etag
+from response_cache import RenderedBody, RenderedResponseCache, rendered_response
+from session_store import ServerSessionMiddleware, create_session_backend
+from shared_snapshot import SharedSnapshotCoordinator, snapshot_bodies
+from static_assets import StaticAssets
+from snapshot_store import SnapshotStore
+from wire_format import (
+    MEDIA_TYPES as WIRE_MEDIA_TYPES,
+    WireFormat,
+    check_wire_format,
+    encode_members,
+    encode_tree,
+    is_default,
+    parse_fields,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
 LOGGER = logging.getLogger("contacts")
 
 SETTINGS = get_settings()
-app = FastAPI()
-app.add_middleware(SessionMiddleware, secret_key=SETTINGS.SECRET_KEY)
-
-
-async def fetch_active_employees() -> list[EmployeePublic]:
-    """以 Microsoft Graph 為主資料來源取得在職員工。"""
-
-    raw_users = await fetch_employees_from_graph()
-    employees: list[EmployeePublic] = []
-    for user in raw_users:
-        company_id = SETTINGS.COMPANY_ID or "KH"
-        employee_id = user.get("id") or user.get("userPrincipalName") or ""
-        email = user.get("mail") or user.get("userPrincipalName")
-        campus = user.get("companyName") or user.get("officeLocation")
-        dept_value = user.get("department")
-        job_title = user.get("jobTitle")
-        business_phones = user.get("businessPhones") or []
-
-        employees.append(
-            EmployeePublic(
-                company_id=company_id,
-                employee_id=employee_id,
-                name=user.get("displayName") or email or employee_id,
-                email=email,
-                campus=campus,
-                dept_id=dept_value,
-                dept_name=dept_value,
-                title=job_title,
-                job=job_title,
-                phone_no=business_phones[0] if business_phones else None,
-                mobile_phone=user.get("mobilePhone"),
-                status="在職",
-            )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """建立共用的 Graph HTTP 連線池、載入本機快照並啟動背景同步與健康探測，關閉時依序釋放。"""
+
+    # 量測或本機模擬時可預先於 app.state.graph_transport 指定替代的 transport
+    app.state.graph_client = await open_graph_client(getattr(app.state, "graph_transport", None))
+    # Session 後端於啟動時才建立，import main 不會建立或寫入 SQLite 檔
+    app.state.session_backend = await asyncio.to_thread(create_session_backend, SETTINGS)
+    await asyncio.to_thread(STATIC_ASSETS.build)
+    if SHARED_SNAPSHOT is not None:
+        await SHARED_SNAPSHOT.start(DIRECTORY_CACHE)
+    if SNAPSHOT_STORE is not None:
+        stored = await asyncio.to_thread(SNAPSHOT_STORE.load)
+        if stored is not None:
+            DIRECTORY_CACHE.seed(stored.employees, version=stored.version)
+    DIRECTORY_CACHE.warm_up()
+    HEALTH_PROBER.start()
+    try:
+        yield
+    finally:
+        await HEALTH_PROBER.stop()
+        if SHARED_SNAPSHOT is not None:
+            await SHARED_SNAPSHOT.stop()
+        await DIRECTORY_SOURCE.close()
+        await close_graph_client()
+
+
+app = FastAPI(lifespan=lifespan)
+if SETTINGS.SESSION_BACKEND != "cookie":
+    # Cookie 只帶 Session ID，內容由需要的路由以 load_session 相依載入
+    app.add_middleware(
+        ServerSessionMiddleware,
+        get_backend=lambda: getattr(app.state, "session_backend", None),
+        max_age=SETTINGS.SESSION_MAX_AGE_SECONDS,
+    )
+else:
+    app.add_middleware(SessionMiddleware, secret_key=SETTINGS.SECRET_KEY, max_age=SETTINGS.SESSION_MAX_AGE_SECONDS)
+
+
+DIRECTORY_SOURCE = create_directory_source(SETTINGS)
+SNAPSHOT_STORE = SnapshotStore(SETTINGS.SNAPSHOT_STORE_PATH) if SETTINGS.SNAPSHOT_STORE_PATH else None
+RESPONSE_CACHE = RenderedResponseCache(max_entries=SETTINGS.RESPONSE_CACHE_MAX_ENTRIES)
+# fields= 組合與格式可任意搭配，另以小容量快取保存，避免擠掉共用的預先序列化內容
+VARIANT_RESPONSE_CACHE = RenderedResponseCache(max_entries=SETTINGS.RESPONSE_CACHE_MAX_VARIANTS)
+CHANGE_LOG = ChangeLog(max_versions=SETTINGS.CHANGE_LOG_MAX_VERSIONS, max_changes=SETTINGS.CHANGE_LOG_MAX_CHANGES)
+# 共用快照發布時一併預先序列化的回應：完整樹與前端首屏使用的第一層
+# 與 static/contacts.js 請求的 fields= 相同，讓前端首次載入即命中預先序列化的內容
+CONTACTS_PAGE_FIELDS = parse_fields("name,email,campus,dept_name,title,job,phone_no,mobile_phone,ext")
+SHARED_BODY_KEYS = [("tree", None, None), ("tree", None, 1), ("tree", None, None, CONTACTS_PAGE_FIELDS, "json")]
+
+
+def adopt_shared_bodies(version: int, bodies: dict[Hashable, RenderedBody]) -> None:
+    """將共用快照中預先序列化的回應（指向映射記憶體）放入本 worker 的回應快取。"""
+
+    for key, body in bodies.items():
+        RESPONSE_CACHE.put(version, key, body)
+
+
+if SETTINGS.SHARED_SNAPSHOT_DIR:
+    # 同步排程改由 leader 負責，各 worker 的快取不再自行依 TTL 更新
+    SHARED_SNAPSHOT: SharedSnapshotCoordinator | None = SharedSnapshotCoordinator(
+        SETTINGS.SHARED_SNAPSHOT_DIR,
+        DIRECTORY_SOURCE.load,
+        refresh_interval_seconds=SETTINGS.DIRECTORY_CACHE_TTL_SECONDS,
+        poll_seconds=SETTINGS.SHARED_SNAPSHOT_POLL_SECONDS,
+        on_bodies=adopt_shared_bodies,
+    )
+    DIRECTORY_CACHE = DirectoryCache(
+        SHARED_SNAPSHOT.load,
+        ttl_seconds=math.inf,
+        change_log=CHANGE_LOG,
+        org_chart_enabled=SETTINGS.ORG_CHART_ENABLED,
+    )
+else:
+    SHARED_SNAPSHOT = None
+    DIRECTORY_CACHE = DirectoryCache(
+        DIRECTORY_SOURCE.load,
+        ttl_seconds=SETTINGS.DIRECTORY_CACHE_TTL_SECONDS,
+        change_log=CHANGE_LOG,
+        org_chart_enabled=SETTINGS.ORG_CHART_ENABLED,
+    )
+
+
+async def persist_snapshot(snapshot: DirectorySnapshot) -> None:
+    """每次同步成功後將快照寫入磁碟，供重新啟動或 Graph 中斷時使用；共用模式下僅由 leader 寫入。"""
+
+    if SNAPSHOT_STORE is None or (SHARED_SNAPSHOT is not None and not SHARED_SNAPSHOT.is_leader):
+        return
+    await asyncio.to_thread(SNAPSHOT_STORE.save, snapshot.version, snapshot.source, snapshot.employees)
+
+
+async def publish_shared_snapshot(snapshot: DirectorySnapshot) -> None:
+    """leader 同步成功後預先序列化常用回應，連同員工資料發布給其他 worker。"""
+
+    if SHARED_SNAPSHOT is None or not SHARED_SNAPSHOT.is_leader:
+        return
+    bodies = await asyncio.to_thread(
+        snapshot_bodies, SHARED_BODY_KEYS, lambda key: render_tree_key(snapshot, key)
+    )
+    adopt_shared_bodies(snapshot.version, bodies)
+    await asyncio.to_thread(SHARED_SNAPSHOT.publish, snapshot, bodies)
+
+
+DIRECTORY_CACHE.add_listener(persist_snapshot)
+DIRECTORY_CACHE.add_listener(publish_shared_snapshot)
+HEALTH_PROBER = HealthProber(DIRECTORY_SOURCE.check_health, interval_seconds=SETTINGS.HEALTH_PROBE_INTERVAL_SECONDS)
+REGISTRY.gauge_callback(
+    "contacts_snapshot_age_seconds",
+    "Age of the directory snapshot being served",
+    lambda: DIRECTORY_CACHE.snapshot.age_seconds if DIRECTORY_CACHE.snapshot else None,
+)
+REGISTRY.gauge_callback(
+    "contacts_snapshot_version",
+    "Version of the directory snapshot being served",
+    lambda: DIRECTORY_CACHE.snapshot.version if DIRECTORY_CACHE.snapshot else None,
+)
+REGISTRY.gauge_callback(
+    "contacts_snapshot_employees",
+    "Active employees in the directory snapshot",
+    lambda: len(DIRECTORY_CACHE.snapshot.employees) if DIRECTORY_CACHE.snapshot else None,
+)
+# 准入控制依路由成本分組：樹狀結構類回應大且冷快取時需等待同步，查詢類回應小而量多
+TREE_ADMISSION = AdmissionController(
+    "tree",
+    max_concurrent=SETTINGS.ADMISSION_TREE_CONCURRENCY,
+    max_queue=SETTINGS.ADMISSION_TREE_QUEUE,
+    max_wait_seconds=SETTINGS.ADMISSION_MAX_WAIT_SECONDS,
+    enabled=SETTINGS.ADMISSION_ENABLED,
+)
+LOOKUP_ADMISSION = AdmissionController(
+    "lookup",
+    max_concurrent=SETTINGS.ADMISSION_LOOKUP_CONCURRENCY,
+    max_queue=SETTINGS.ADMISSION_LOOKUP_QUEUE,
+    max_wait_seconds=SETTINGS.ADMISSION_MAX_WAIT_SECONDS,
+    enabled=SETTINGS.ADMISSION_ENABLED,
+)
+PHOTO_ADMISSION = AdmissionController(
+    "photo",
+    max_concurrent=SETTINGS.ADMISSION_PHOTO_CONCURRENCY,
+    max_queue=SETTINGS.ADMISSION_PHOTO_QUEUE,
+    max_wait_seconds=SETTINGS.ADMISSION_MAX_WAIT_SECONDS,
+    enabled=SETTINGS.ADMISSION_ENABLED,
+)
+ADMISSION_GROUPS = (TREE_ADMISSION, LOOKUP_ADMISSION, PHOTO_ADMISSION)
+PHOTO_CACHE = PhotoCache(
+    PhotoDiskStore(SETTINGS.PHOTO_CACHE_PATH, SETTINGS.PHOTO_DISK_CACHE_BYTES) if SETTINGS.PHOTO_CACHE_PATH else None,
+    memory_max_bytes=SETTINGS.PHOTO_MEMORY_CACHE_BYTES,
+    revalidate_seconds=SETTINGS.PHOTO_REVALIDATE_SECONDS,
+    negative_ttl_seconds=SETTINGS.PHOTO_NEGATIVE_TTL_SECONDS,
+    fetch_concurrency=SETTINGS.PHOTO_FETCH_CONCURRENCY,
+)
+STATIC_ASSETS = StaticAssets("static")
+STATIC_FILES = StaticFiles(directory="static")
+TREE_LIST_ADAPTER = TypeAdapter(list[TreeNode])
+TREE_NODE_ADAPTER = TypeAdapter(TreeNode)
+TRUNCATED_LIST_ADAPTER = TypeAdapter(list[TruncatedTreeNode])
+TRUNCATED_NODE_ADAPTER = TypeAdapter(TruncatedTreeNode)
+RESOLVE_RESPONSE_ADAPTER = TypeAdapter(ResolveResponse)
+# 沒有照片的 404 讓瀏覽器快取的秒數
+PHOTO_MISSING_MAX_AGE_SECONDS = 3600
+
+
+@timed("serialize")
+def render_tree(
+    snapshot: DirectorySnapshot,
+    root_key: str | None,
+    depth: int | None,
+    org_chart: bool = False,
+    fields: tuple[str, ...] | None = None,
+    wire_format: WireFormat = "json",
+) -> bytes:
+    """將整棵樹（或組織圖）或指定子樹序列化為 bytes；找不到子樹時為空物件。
+
+    指定 fields 或非預設格式時改由 wire_format 投影／編碼，否則直接以 Pydantic 輸出完整 JSON。
+    """
+
+    if org_chart and snapshot.org_chart is not None:
+        tree, index = snapshot.org_chart.tree, snapshot.org_chart.index
+    else:
+        tree, index = snapshot.tree, snapshot.index
+
+    if root_key is None:
+        nodes = tree
+        if depth is not None:
+            nodes = [truncate_tree(node, depth, index) for node in nodes]
+        if not is_default(fields, wire_format):
+            return encode_tree(nodes, fields, wire_format)
+        list_adapter = TREE_LIST_ADAPTER if depth is None else TRUNCATED_LIST_ADAPTER
+        return list_adapter.dump_json(nodes)
+
+    subtree = index.get(root_key)
+    if subtree is not None and depth is not None:
+        subtree = truncate_tree(subtree, depth, index)
+    if not is_default(fields, wire_format):
+        return encode_tree(subtree, fields, wire_format)
+    if subtree is None:
+        return b"{}"
+    node_adapter = TREE_NODE_ADAPTER if depth is None else TRUNCATED_NODE_ADAPTER
+    return node_adapter.dump_json(subtree)
+
+
+def clamp_depth(snapshot: DirectorySnapshot, depth: int | None, org_chart: bool = False) -> int | None:
+    """將 depth 限制在樹的實際高度內；更深的 depth 輸出相同，不應各自產生快取項目。"""
+
+    if depth is None:
+        return None
+    if org_chart and snapshot.org_chart is not None:
+        return min(depth, snapshot.org_chart.index.height)
+    return min(depth, snapshot.index.height)
+
+
+def tree_cache_key(
+    kind: str,
+    root_key: str | None,
+    depth: int | None,
+    fields: tuple[str, ...] | None,
+    wire_format: WireFormat,
+) -> tuple[Any, ...]:
+    """回應快取與共用快照使用的 key；完整 JSON 維持 (kind, root_key, depth)，其餘附加欄位與格式。
+
+    depth 需先以 clamp_depth 限制。
+    """
+
+    if is_default(fields, wire_format):
+        return (kind, root_key, depth)
+    return (kind, root_key, depth, fields, wire_format)
+
+
+def response_cache_for(key: tuple[Any, ...]) -> RenderedResponseCache:
+    """完整 JSON 與共用快照的 key 使用主要快取，其餘 fields= / format= 變體使用容量較小的變體快取。"""
+
+    if len(key) == 3 or key in SHARED_BODY_KEYS:
+        return RESPONSE_CACHE
+    return VARIANT_RESPONSE_CACHE
+
+
+def render_tree_key(snapshot: DirectorySnapshot, key: tuple[Any, ...]) -> bytes:
+    """依 tree_cache_key 產生的 key 序列化對應內容。"""
+
+    kind, root_key, depth, *variant = key
+    fields, wire_format = variant or (None, "json")
+    return render_tree(snapshot, root_key, depth, kind == "orgchart", fields, wire_format)
+
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    """記錄各路由的延遲與回應大小；超過門檻的請求連同各階段耗時寫入日誌。"""
+
+    stages = begin_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=response.status_code)
+    content_length = response.headers.get("content-length")
+    if content_length is not None:
+        encoding = response.headers.get("content-encoding", "identity")
+        HTTP_RESPONSE_BYTES.observe(int(content_length), route=route, encoding=encoding)
+
+    threshold_ms = SETTINGS.SLOW_REQUEST_THRESHOLD_MS
+    if threshold_ms > 0 and elapsed * 1000 >= threshold_ms:
+        LOGGER.warning(
+            "Slow request %s %s -> %s in %.0f ms: %s",
+            request.method,
+            request.url.path,
+            response.status_code,
+            elapsed * 1000,
+            summarize_stages(stages),
         )
-    return employees
+    return response
 
 
 @app.get("/")
@@ -63,22 +352,89 @@ async def root() -> dict[str, str]:
 
 
 @app.get("/health")
-async def health() -> dict[str, str]:
-    """健康檢查，聚焦 Graph 連線狀態。"""
+async def health() -> dict[str, Any]:
+    """健康檢查，聚焦資料來源連線狀態與通訊錄快照新鮮度。
+
+    資料來源狀態取自背景探測的最近一次結果，不會在請求當下呼叫上游服務。
+    """
+
+    probe = HEALTH_PROBER.latest
+    if probe is None:
+        status_value = "starting"
+    else:
+        status_value = "ok" if probe.ok else "degraded"
+    return {
+        "status": status_value,
+        "directory_source": DIRECTORY_SOURCE.name,
+        **HEALTH_PROBER.stats(),
+        **DIRECTORY_CACHE.stats(),
+        "graph_connections": POOL_STATS.snapshot(),
+        "graph_crawl": last_crawl_stats(),
+        "response_cache": RESPONSE_CACHE.stats(),
+        "variant_response_cache": VARIANT_RESPONSE_CACHE.stats(),
+        "change_log": CHANGE_LOG.stats(),
+        "org_chart": _org_chart_stats(),
+        "photo_cache": PHOTO_CACHE.stats(),
+        "admission": {controller.name: controller.stats() for controller in ADMISSION_GROUPS},
+        "shared_snapshot": SHARED_SNAPSHOT.stats() if SHARED_SNAPSHOT is not None else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus 指標：各階段耗時、Graph 請求、快取命中、快照新鮮度與回應大小。"""
+
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/livez")
+async def livez() -> dict[str, str]:
+    """存活檢查：行程可回應即為正常，不檢查任何相依服務。"""
+
+    return {"status": "ok"}
+
 
-    graph_status = await check_graph_health()
-    status_value = "ok" if graph_status.get("graph") == "ok" else "degraded"
-    return {"status": status_value, **graph_status}
+@app.get("/readyz")
+async def readyz(response: Response) -> dict[str, Any]:
+    """就緒檢查：已有可服務的通訊錄快照（含磁碟備援）即就緒，不依賴上游即時連線。"""
 
+    snapshot = DIRECTORY_CACHE.snapshot
+    if snapshot is None:
+        # 啟動載入失敗時，依退避間隔再次於背景嘗試
+        DIRECTORY_CACHE.warm_up()
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "not_ready", "snapshot_version": None}
+    return {"status": "ready", "snapshot_version": snapshot.version, "snapshot_source": snapshot.source}
 
-@app.get("/contacts/tree")
-async def get_contacts_tree() -> list[TreeNode]:
-    """回傳完整的公司通訊錄樹狀結構。"""
+
+@app.get("/contacts/tree", response_model=list[TreeNode] | list[TruncatedTreeNode], dependencies=[Depends(TREE_ADMISSION)])
+async def get_contacts_tree(
+    request: Request,
+    depth: int | None = Query(default=None, ge=0, description="只回傳幾層子節點，未指定時回傳完整樹"),
+    fields: str | None = Query(default=None, description="只回傳員工資料的指定欄位（逗號分隔），例如 name,email,ext"),
+    wire_format: WireFormat = Query(
+        default="json",
+        alias="format",
+        description="json（預設）、compact（重複字串以字串表編碼的精簡 JSON）或 msgpack（compact 的 MessagePack 版本）",
+    ),
+) -> Response:
+    """回傳公司通訊錄樹狀結構，可用 depth 限制層數以延遲載入，fields / format 縮減員工資料。
+
+    內容依快照版本預先序列化與壓縮，支援 If-None-Match 回 304。
+    """
 
     try:
-        employees = await fetch_active_employees()
-        tree = build_tree_from_employees(employees)
-        return tree
+        selected = parse_fields(fields)
+        check_wire_format(wire_format)
+        snapshot = await DIRECTORY_CACHE.get_snapshot()
+        key = tree_cache_key("tree", None, clamp_depth(snapshot, depth), selected, wire_format)
+        body = await response_cache_for(key).get_or_render(
+            snapshot.version, key, lambda: render_tree_key(snapshot, key)
+        )
+        response = rendered_response(request, body, WIRE_MEDIA_TYPES[wire_format])
+        # 前端保存此版本號，之後以 /contacts/tree/changes?since= 取得增量
+        response.headers["X-Snapshot-Version"] = str(snapshot.version)
+        return response
     except HTTPException:
         raise
     except Exception as exc:  # pragma: no cover - 以日誌協助偵錯
@@ -87,15 +443,42 @@ async def get_contacts_tree() -> list[TreeNode]:
         raise HTTPException(status_code=500, detail="載入通訊錄資料時發生錯誤") from exc
 
 
-@app.get("/contacts/tree/{root_key}")
-async def get_contacts_subtree(root_key: str) -> TreeNode | dict:
+@app.get("/contacts/tree/changes", response_model_exclude_none=True, dependencies=[Depends(LOOKUP_ADMISSION)])
+async def get_contacts_tree_changes(
+    since: int = Query(ge=0, description="用戶端目前的快照版本（取自 X-Snapshot-Version 標頭）"),
+) -> TreeChangeSet:
+    """回傳自 since 版本以來的員工節點變更；版本過舊或無法銜接時回傳 full_reload，需重新取得整棵樹。
+
+    多 worker 部署需啟用 SHARED_SNAPSHOT_DIR，各 worker 的版本號才會一致。
+    """
+
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    return CHANGE_LOG.since(since, snapshot.version)
+
+
+@app.get("/contacts/tree/{root_key}", response_model=TreeNode | TruncatedTreeNode | dict, dependencies=[Depends(TREE_ADMISSION)])
+async def get_contacts_subtree(
+    request: Request,
+    root_key: str,
+    depth: int | None = Query(default=None, ge=0, description="只回傳幾層子節點，未指定時回傳完整子樹"),
+    fields: str | None = Query(default=None, description="只回傳員工資料的指定欄位（逗號分隔），例如 name,email,ext"),
+    wire_format: WireFormat = Query(
+        default="json",
+        alias="format",
+        description="json（預設）、compact（重複字串以字串表編碼的精簡 JSON）或 msgpack（compact 的 MessagePack 版本）",
+    ),
+) -> Response:
     """取得指定節點子樹，找不到時回傳空物件。"""
 
     try:
-        employees = await fetch_active_employees()
-        tree = build_tree_from_employees(employees)
-        subtree = find_node_by_key(tree, root_key)
-        return subtree or {}
+        selected = parse_fields(fields)
+        check_wire_format(wire_format)
+        snapshot = await DIRECTORY_CACHE.get_snapshot()
+        key = tree_cache_key("tree", root_key, clamp_depth(snapshot, depth), selected, wire_format)
+        body = await response_cache_for(key).get_or_render(
+            snapshot.version, key, lambda: render_tree_key(snapshot, key)
+        )
+        return rendered_response(request, body, WIRE_MEDIA_TYPES[wire_format])
     except HTTPException:
         raise
     except Exception as exc:  # pragma: no cover
@@ -104,18 +487,229 @@ async def get_contacts_subtree(root_key: str) -> TreeNode | dict:
         raise HTTPException(status_code=500, detail="載入通訊錄子樹時發生錯誤") from exc
 
 
+@app.get("/contacts/tree/{root_key}/ancestors", dependencies=[Depends(LOOKUP_ADMISSION)])
+async def get_node_ancestors(root_key: str) -> list[Breadcrumb]:
+    """取得指定節點的上層路徑（麵包屑），找不到時回傳空清單。"""
+
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    return [_breadcrumb(node) for node in snapshot.index.ancestors(root_key)]
+
+
+@app.get("/contacts/employees/{employee_id}/path", dependencies=[Depends(LOOKUP_ADMISSION)])
+async def get_employee_path(employee_id: str) -> list[Breadcrumb]:
+    """取得公司 → 校區 → 部門 → 員工的完整路徑，找不到時回傳空清單。"""
+
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    return [_breadcrumb(node) for node in snapshot.index.path(f"emp:{employee_id}")]
+
+
+@app.get("/contacts/group/{dept_key}/members", response_model=MemberPage, dependencies=[Depends(LOOKUP_ADMISSION)])
+async def get_group_members(
+    dept_key: str,
+    offset: int = Query(default=0, ge=0, description="起始位置"),
+    limit: int = Query(default=50, ge=1, le=500, description="每頁筆數"),
+    fields: str | None = Query(default=None, description="只回傳員工資料的指定欄位（逗號分隔），例如 name,email,ext"),
+    wire_format: WireFormat = Query(
+        default="json",
+        alias="format",
+        description="json（預設）、compact（重複字串以字串表編碼的精簡 JSON）或 msgpack（compact 的 MessagePack 版本）",
+    ),
+) -> MemberPage | Response:
+    """分頁取得部門成員，找不到節點時回傳空頁；fields / format 與 /contacts/tree 相同。"""
+
+    selected = parse_fields(fields)
+    check_wire_format(wire_format)
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    node = snapshot.index.get(dept_key)
+    if node is None:
+        page = MemberPage(total=0, offset=offset, limit=limit, items=[])
+    else:
+        page = paginate_members(node, offset, limit)
+    if is_default(selected, wire_format):
+        return page
+    return Response(content=encode_members(page, selected, wire_format), media_type=WIRE_MEDIA_TYPES[wire_format])
+
+
+@app.get("/contacts/orgchart", response_model=list[TreeNode] | list[TruncatedTreeNode], dependencies=[Depends(TREE_ADMISSION)])
+async def get_org_chart(
+    request: Request,
+    depth: int | None = Query(default=None, ge=0, description="只回傳幾層部屬，未指定時回傳完整組織圖"),
+) -> Response:
+    """依主管關係回傳組織圖；每個節點的 descendant_count 即為所有部屬人數（需搭配 depth 取得）。"""
+
+    snapshot = await _org_chart_snapshot()
+    depth = clamp_depth(snapshot, depth, org_chart=True)
+    body = await RESPONSE_CACHE.get_or_render(
+        snapshot.version,
+        ("orgchart", None, depth),
+        lambda: render_tree(snapshot, None, depth, org_chart=True),
+    )
+    return rendered_response(request, body)
+
+
+@app.get("/contacts/orgchart/{employee_id}", response_model=TreeNode | TruncatedTreeNode | dict, dependencies=[Depends(TREE_ADMISSION)])
+async def get_org_chart_subtree(
+    request: Request,
+    employee_id: str,
+    depth: int | None = Query(default=None, ge=0, description="只回傳幾層部屬，未指定時回傳所有部屬"),
+) -> Response:
+    """取得指定員工與其部屬，找不到時回傳空物件。"""
+
+    snapshot = await _org_chart_snapshot()
+    root_key = f"emp:{employee_id}"
+    depth = clamp_depth(snapshot, depth, org_chart=True)
+    body = await RESPONSE_CACHE.get_or_render(
+        snapshot.version,
+        ("orgchart", root_key, depth),
+        lambda: render_tree(snapshot, root_key, depth, org_chart=True),
+    )
+    return rendered_response(request, body)
+
+
+@app.get("/contacts/orgchart/{employee_id}/chain", dependencies=[Depends(LOOKUP_ADMISSION)])
+async def get_management_chain(employee_id: str) -> list[Breadcrumb]:
+    """取得由公司、最高主管到直屬主管的管理鏈（不含本人），找不到時回傳空清單。"""
+
+    snapshot = await _org_chart_snapshot()
+    return [_breadcrumb(node) for node in snapshot.org_chart.index.ancestors(f"emp:{employee_id}")]  # type: ignore[union-attr]
+
+
+async def _org_chart_snapshot() -> DirectorySnapshot:
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    if snapshot.org_chart is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Org chart is not enabled")
+    return snapshot
+
+
+def _org_chart_stats() -> dict[str, int] | None:
+    snapshot = DIRECTORY_CACHE.snapshot
+    if snapshot is None or snapshot.org_chart is None:
+        return None
+    return snapshot.org_chart.stats()
+
+
+@app.get("/contacts/export")
+async def export_contacts(
+    format: ExportFormat = Query(default="ndjson", description="匯出格式：ndjson 或 csv"),
+) -> StreamingResponse:
+    """以串流匯出整棵通訊錄樹（深度優先），記憶體用量不隨租戶大小成長。
+
+    匯出期間固定使用同一份快照，快照版本附於 X-Snapshot-Version 標頭。
+    准入名額持有到串流送完為止；串流未開始即中斷時由背景工作釋放。
+    """
+
+    slot = await TREE_ADMISSION.acquire_slot()
+    try:
+        snapshot = await DIRECTORY_CACHE.get_snapshot()
+    except BaseException:
+        slot.release()
+        raise
+    headers = {
+        "X-Snapshot-Version": str(snapshot.version),
+        "Content-Disposition": f'attachment; filename="contacts-v{snapshot.version}.{format}"',
+    }
+    return StreamingResponse(
+        slot.hold(stream_tree(snapshot.tree, format)),
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+        background=BackgroundTask(slot.release),
+    )
+
+
+@app.get("/contacts/search", dependencies=[Depends(LOOKUP_ADMISSION)])
+async def search_contacts(
+    q: str = Query(min_length=1, max_length=100, description="關鍵字：姓名、英文名、Email、部門、職稱、電話或分機"),
+    offset: int = Query(default=0, ge=0, description="起始位置"),
+    limit: int = Query(default=20, ge=1, le=100, description="每頁筆數"),
+) -> SearchPage:
+    """搜尋通訊錄，依相關程度排序並分頁。"""
+
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    total, hits = snapshot.search.search(q, limit=limit, offset=offset)
+    items = [SearchResult(score=hit.score, employee=hit.employee) for hit in hits]
+    return SearchPage(total=total, offset=offset, limit=limit, items=items)
+
+
+@app.post("/contacts/resolve", response_model=ResolveResponse, dependencies=[Depends(LOOKUP_ADMISSION)])
+async def resolve_contacts(payload: ResolveRequest) -> Response:
+    """批次將 Email、UPN、員工編號、分機、電話或姓名解析為通訊錄員工，逐筆回報唯一、多筆或找不到。
+
+    以快照附帶的雜湊索引查詢，不需取得整棵樹；結果直接序列化以省去回應模型的二次驗證。
+    """
+
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    with stage("resolve"):
+        results: list[ResolveResult] = []
+        counts = {"resolved": 0, "ambiguous": 0, "not_found": 0}
+        for identifier in payload.identifiers:
+            kind, employees = snapshot.resolver.lookup(identifier)
+            status_value = "not_found" if not employees else "resolved" if len(employees) == 1 else "ambiguous"
+            counts[status_value] += 1
+            results.append(ResolveResult(input=identifier, status=status_value, matched_by=kind, employees=employees))
+        body = ResolveResponse(version=snapshot.version, results=results, **counts)
+    return Response(content=RESOLVE_RESPONSE_ADAPTER.dump_json(body), media_type="application/json")
+
+
+@app.get("/contacts/{employee_id}/photo", response_class=Response, dependencies=[Depends(PHOTO_ADMISSION)])
+async def get_employee_photo(
+    request: Request,
+    employee_id: str,
+    size: int = Query(default=DEFAULT_PHOTO_SIZE, ge=1, le=1024, description="縮圖邊長（像素），取不小於此值的最接近尺寸"),
+) -> Response:
+    """以應用程式 Token 代理員工大頭貼，回傳裁切為正方形的 JPEG 縮圖。
+
+    縮圖快取於伺服器端並於背景以 Graph 的 ETag 重新驗證；瀏覽器端可長期快取並以 If-None-Match 取得 304。
+    """
+
+    snapshot = await DIRECTORY_CACHE.get_snapshot()
+    if snapshot.index.get(f"emp:{employee_id}") is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Employee not found")
+    with stage("photo"):
+        entry = await PHOTO_CACHE.get(employee_id)
+    if entry.missing:
+        # 沒有照片時讓瀏覽器短暫快取 404，避免清單捲動時重複請求
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Photo not found",
+            headers={"Cache-Control": f"private, max-age={PHOTO_MISSING_MAX_AGE_SECONDS}"},
+        )
+    chosen = next((candidate for candidate in PHOTO_SIZES if candidate >= size), PHOTO_SIZES[-1])
+    data = entry.thumbnails.get(chosen) or next(iter(entry.thumbnails.values()))
+    body = RenderedBody(identity=data, gzip=None, br=None, etag=thumbnail_etag(data))
+    cache_control = f"private, max-age={SETTINGS.PHOTO_BROWSER_MAX_AGE_SECONDS}"
+    return rendered_response(request, body, "image/jpeg", cache_control)
+
+
+def _breadcrumb(node: TreeNode) -> Breadcrumb:
+    return Breadcrumb(key=node.key, label=node.label, node_type=node.node_type)
+
+
 @app.get("/contacts")
-async def contacts_page() -> FileResponse:
-    """回傳通訊錄前端頁面。"""
+async def contacts_page(request: Request) -> Response:
+    """回傳通訊錄前端頁面；頁面中的 CSS 與 JS 已改寫為帶雜湊的網址，頁面本身以 ETag 驗證。"""
 
-    return FileResponse("./static/contacts.html")
+    return _static_response(request, "contacts.html")
 
 
 @app.get("/optimized-manifest.xml")
-async def optimized_manifest() -> FileResponse:
+async def optimized_manifest(request: Request) -> Response:
     """回傳 Outlook Add-in manifest 檔案。"""
 
-    return FileResponse("./static/optimized-manifest.xml")
+    return _static_response(request, "optimized-manifest.xml")
+
+
+@app.api_route("/static/{asset_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_asset(request: Request, asset_path: str) -> Response:
+    """回傳預先壓縮的靜態檔；啟動後才新增的檔案交由 StaticFiles 直接讀取。"""
+
+    response = STATIC_ASSETS.response(request, asset_path)
+    if response is None:
+        return await STATIC_FILES.get_response(asset_path, request.scope)
+    return response
 
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+def _static_response(request: Request, name: str) -> Response:
+    response = STATIC_ASSETS.response(request, name)
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return response
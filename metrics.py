@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+"""輕量的 Prometheus 指標：計數器、直方圖與各處理階段計時，以 text exposition 格式輸出。"""
+
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Sequence, TypeVar
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+FuncT = TypeVar("FuncT", bound=Callable[..., Any])
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不減的計數器。"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """累積分桶的直方圖，附 _sum 與 _count。"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets))
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 各桶計數（非累積）、+Inf 桶、總和
+                state = self._values[key] = [0.0] * (len(self._buckets) + 2)
+            for index, bound in enumerate(self._buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            else:
+                state[len(self._buckets)] += 1
+            state[-1] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines: list[str] = []
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip((*self._buckets, math.inf), state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """可增可減的量測值，例如目前排隊中的請求數。"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class GaugeCallback(_Metric):
+    """於輸出時才呼叫 callback 取得目前值的量測值；回傳 None 時略過。"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float | None]) -> None:
+        super().__init__(name, documentation)
+        self._callback = callback
+
+    def samples(self) -> list[str]:
+        value = self._callback()
+        return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    """收集所有指標並輸出 Prometheus 文字格式。"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge_callback(self, name: str, documentation: str, callback: Callable[[], float | None]) -> GaugeCallback:
+        return self.register(GaugeCallback(name, documentation, callback))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "contacts_stage_duration_seconds",
+    "Time spent in each processing stage",
+    ["stage"],
+)
+GRAPH_REQUESTS = REGISTRY.counter(
+    "contacts_graph_requests_total",
+    "Microsoft Graph and Entra requests by endpoint and HTTP status",
+    ["endpoint", "status"],
+)
+GRAPH_CRAWL_PAGES = REGISTRY.histogram(
+    "contacts_graph_crawl_pages",
+    "Graph pages fetched per directory crawl",
+    ["kind"],
+    buckets=PAGE_BUCKETS,
+)
+CACHE_EVENTS = REGISTRY.counter(
+    "contacts_cache_events_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "contacts_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+HTTP_RESPONSE_BYTES = REGISTRY.histogram(
+    "contacts_http_response_size_bytes",
+    "HTTP response body size by route and content encoding",
+    ["route", "encoding"],
+    buckets=BYTES_BUCKETS,
+)
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "contacts_admission_in_flight",
+    "Requests currently admitted per admission group",
+    ["group"],
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "contacts_admission_queue_depth",
+    "Requests waiting for an admission slot per admission group",
+    ["group"],
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "contacts_admission_wait_seconds",
+    "Time requests spent waiting for an admission slot",
+    ["group"],
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "contacts_admission_rejections_total",
+    "Requests rejected by admission control by group and reason",
+    ["group", "reason"],
+)
+
+# 目前請求所經過的處理階段 (名稱, 秒數)；未在請求範圍內時為 None
+_REQUEST_STAGES: ContextVar[list[tuple[str, float]] | None] = ContextVar("contacts_request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """計時一個處理階段，計入直方圖並附加到目前請求的階段明細。"""
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = _REQUEST_STAGES.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+def timed(name: str) -> Callable[[FuncT], FuncT]:
+    """以 stage() 計時整個函式，支援一般函式與協程。"""
+
+    def decorator(func: FuncT) -> FuncT:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with stage(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def begin_request() -> list[tuple[str, float]]:
+    """開始收集目前請求的階段明細並回傳該清單。"""
+
+    stages: list[tuple[str, float]] = []
+    _REQUEST_STAGES.set(stages)
+    return stages
+
+
+def summarize_stages(stages: list[tuple[str, float]]) -> str:
+    """將階段明細彙整為「名稱=總毫秒×次數」字串，依耗時排序。"""
+
+    totals: dict[str, list[float]] = {}
+    for name, elapsed in stages:
+        total = totals.setdefault(name, [0.0, 0])
+        total[0] += elapsed
+        total[1] += 1
+    ordered = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+    return " ".join(f"{name}={total * 1000:.1f}ms×{int(count)}" for name, (total, count) in ordered) or "-"
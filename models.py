@@ -2,11 +2,16 @@ from __future__ import annotations
 
 """核心資料模型與樹狀結構工具。"""
 
-from typing import Literal, Optional
+import gc
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Literal, Optional, TypeVar
 
 from pydantic import BaseModel, Field
 
 from config import get_settings
+from metrics import timed
 
 
 class EmployeePublic(BaseModel):
@@ -17,6 +22,7 @@ class EmployeePublic(BaseModel):
     name: str = Field(description="員工姓名")
     ename: Optional[str] = Field(default=None, description="英文姓名")
     email: Optional[str] = Field(default=None, description="電子郵件")
+    upn: Optional[str] = Field(default=None, description="登入帳號（userPrincipalName）")
     campus: Optional[str] = Field(default=None, description="校區名稱")
     dept_id: Optional[str] = Field(default=None, description="部門代碼")
     dept_name: Optional[str] = Field(default=None, description="部門名稱")
@@ -26,6 +32,10 @@ class EmployeePublic(BaseModel):
     mobile_phone: Optional[str] = Field(default=None, description="手機號碼")
     ext: Optional[str] = Field(default=None, description="分機")
     status: Optional[str] = Field(default=None, description="狀態")
+    # 僅供組成組織圖並隨快照保存，不輸出到 API 回應
+    manager_id: Optional[str] = Field(
+        default=None, exclude=True, description="直屬主管的員工編號，僅 Graph 來源且啟用組織圖時提供"
+    )
 
 
 class TreeNode(BaseModel):
@@ -46,56 +56,537 @@ class TreeNode(BaseModel):
 TreeNode.model_rebuild()
 
 
+class TruncatedTreeNode(BaseModel):
+    """深度查詢的樹狀節點：只保留指定層數，並附上前端延遲載入所需的子節點與數量資訊。"""
+
+    key: str = Field(description="節點唯一識別值")
+    label: str = Field(description="節點顯示文字")
+    node_type: Literal["company", "campus", "dept", "employee"]
+    children: list["TruncatedTreeNode"] = Field(default_factory=list, description="子節點清單，超過深度時為空")
+    data: Optional[EmployeePublic] = Field(default=None, description="員工資料，僅員工節點使用")
+    has_children: bool = Field(description="是否有子節點")
+    member_count: int = Field(description="底下員工總數")
+    descendant_count: int = Field(description="底下節點總數")
+
+
+TruncatedTreeNode.model_rebuild()
+
+
+class MemberPage(BaseModel):
+    """部門成員分頁結果。"""
+
+    total: int = Field(description="成員總數")
+    offset: int = Field(description="本頁起始位置")
+    limit: int = Field(description="每頁筆數上限")
+    items: list[EmployeePublic] = Field(default_factory=list, description="本頁成員")
+
+
+class SearchResult(BaseModel):
+    """搜尋命中的員工與相關分數。"""
+
+    score: float = Field(description="相關分數，越高越相關")
+    employee: EmployeePublic
+
+
+class SearchPage(BaseModel):
+    """搜尋結果分頁。"""
+
+    total: int = Field(description="命中總數")
+    offset: int = Field(description="本頁起始位置")
+    limit: int = Field(description="每頁筆數上限")
+    items: list[SearchResult] = Field(default_factory=list, description="本頁結果")
+
+
+class Breadcrumb(BaseModel):
+    """麵包屑節點，僅含顯示所需欄位。"""
+
+    key: str = Field(description="節點唯一識別值")
+    label: str = Field(description="節點顯示文字")
+    node_type: Literal["company", "campus", "dept", "employee"]
+
+
+class TreeChange(BaseModel):
+    """員工節點層級的單筆變更。
+
+    - add / move：parents 為公司 → 校區 → 部門路徑，前端依序補上不存在的節點後加入 data。
+    - update：同部門內的欄位異動，fields 只含變動欄位，label 僅於顯示文字改變時提供。
+    - remove / move：移除後變空的部門與校區由前端一併移除，與伺服器端樹狀結構一致。
+    """
+
+    op: Literal["add", "remove", "move", "update"]
+    key: str = Field(description="員工節點 key")
+    parents: Optional[list[Breadcrumb]] = Field(default=None, description="新的上層路徑，僅 add / move 提供")
+    data: Optional[EmployeePublic] = Field(default=None, description="完整員工資料，僅 add / move 提供")
+    fields: Optional[dict[str, Any]] = Field(default=None, description="變動欄位的新值，僅 update 提供")
+    label: Optional[str] = Field(default=None, description="新的節點顯示文字")
+
+
+class TreeChangeSet(BaseModel):
+    """自指定版本以來的變更；full_reload 為 True 時版本已過舊，需重新取得整棵樹。"""
+
+    since: int = Field(description="用戶端目前的快照版本")
+    version: int = Field(description="伺服器目前的快照版本")
+    full_reload: bool = Field(default=False, description="是否需要重新取得整棵樹")
+    changes: list[TreeChange] = Field(default_factory=list, description="依序套用的變更")
+
+
+class ResolveRequest(BaseModel):
+    """批次解析收件者的請求。"""
+
+    identifiers: list[str] = Field(
+        min_length=1,
+        max_length=5000,
+        description="Email、UPN、員工編號、分機、電話或姓名；可含「顯示名稱 <address>」格式",
+    )
+
+
+class ResolveResult(BaseModel):
+    """單一識別值的解析結果；ambiguous 時 employees 列出所有候選。"""
+
+    input: str = Field(description="原始識別值")
+    status: Literal["resolved", "ambiguous", "not_found"]
+    matched_by: Optional[Literal["email", "upn", "employee_id", "ext", "phone", "name"]] = Field(
+        default=None, description="命中的識別值類型"
+    )
+    employees: list[EmployeePublic] = Field(default_factory=list, description="命中的員工")
+
+
+class ResolveResponse(BaseModel):
+    """批次解析結果，順序與請求相同。"""
+
+    version: int = Field(description="解析所用的快照版本")
+    resolved: int = Field(description="唯一命中的數量")
+    ambiguous: int = Field(description="命中多位員工的數量")
+    not_found: int = Field(description="找不到的數量")
+    results: list[ResolveResult] = Field(default_factory=list, description="逐筆結果")
+
+
+# (舊資料, 新資料)：舊資料為 None 表示新增，新資料為 None 表示移除
+EmployeeChange = tuple[Optional[EmployeePublic], Optional[EmployeePublic]]
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _trusted_instance(model: type[ModelT], defaults: dict[str, Any], values: dict[str, Any]) -> ModelT:
+    """以程式組出、型別已知正確的欄位值直接建立模型，略過 pydantic 驗證。
+
+    model_construct 在 pydantic v2 反而比驗證慢，故直接設定實例狀態；序列化結果與驗證建立者相同。
+    defaults 依欄位宣告順序提供預設值，確保輸出欄位順序不變。
+    """
+
+    instance = model.__new__(model)
+    object.__setattr__(instance, "__dict__", {**defaults, **values})
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """大量建立無循環參照的物件時暫停分代 GC，避免反覆掃描持續成長的堆積。"""
+
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+_EMPLOYEE_DEFAULTS = {name: info.default for name, info in EmployeePublic.model_fields.items()}
+# 對外輸出的員工欄位（不含 manager_id 等內部欄位），供投影、匯出與異動比對使用
+PUBLIC_EMPLOYEE_FIELDS: tuple[str, ...] = tuple(
+    name for name, info in EmployeePublic.model_fields.items() if not info.exclude
+)
+_TREE_NODE_DEFAULTS = {name: info.default for name, info in TreeNode.model_fields.items()}
+
+
+def _interned(value: Optional[str]) -> Optional[str]:
+    # 校區、部門、職稱在數萬筆員工間大量重複，共用同一字串物件以節省記憶體
+    return sys.intern(value) if value else value
+
+
+def employee_from_graph_user(user: dict[str, Any]) -> EmployeePublic:
+    """將 Graph 使用者物件對應為 EmployeePublic。
+
+    欄位皆由程式組出且型別固定，略過逐筆驗證。
+    """
+
+    settings = get_settings()
+    company_id = settings.COMPANY_ID or "KH"
+    employee_id = user.get("id") or user.get("userPrincipalName") or ""
+    email = user.get("mail") or user.get("userPrincipalName")
+    campus = _interned(user.get("companyName") or user.get("officeLocation"))
+    dept_value = _interned(user.get("department"))
+    job_title = _interned(user.get("jobTitle"))
+    business_phones = user.get("businessPhones") or []
+
+    return _trusted_instance(
+        EmployeePublic,
+        _EMPLOYEE_DEFAULTS,
+        {
+            "company_id": company_id,
+            "employee_id": employee_id,
+            "name": user.get("displayName") or email or employee_id,
+            "email": email,
+            "upn": user.get("userPrincipalName"),
+            "campus": campus,
+            "dept_id": dept_value,
+            "dept_name": dept_value,
+            "title": job_title,
+            "job": job_title,
+            "phone_no": business_phones[0] if business_phones else None,
+            "mobile_phone": user.get("mobilePhone"),
+            "status": "在職",
+            "manager_id": _manager_id(user),
+        },
+    )
+
+
+def _manager_id(user: dict[str, Any]) -> Optional[str]:
+    """取出 $expand=manager 或 users/delta 的 manager@delta 所帶的主管 id；後者較新，優先採用。"""
+
+    delta = user.get("manager@delta")
+    if delta:
+        entry = delta[0]
+        return None if "@removed" in entry else entry.get("id")
+    manager = user.get("manager")
+    return manager.get("id") if isinstance(manager, dict) else None
+
+
+@timed("map_employees")
+def employees_from_graph_users(users: Iterable[dict[str, Any]]) -> list[EmployeePublic]:
+    """批次對應 Graph 使用者，僅保留啟用中的帳號。"""
+
+    with _gc_paused():
+        return [employee_from_graph_user(user) for user in users if user.get("accountEnabled", True)]
+
+
+@timed("map_employees")
+def employees_from_address_rows(rows: Iterable[dict[str, Any]]) -> list[EmployeePublic]:
+    """將 addresslist 階層查詢的人員列（name、parent、mail、campus）對應為 EmployeePublic。
+
+    上層單位（parent）作為部門，根節點下第一層單位作為校區。
+    """
+
+    settings = get_settings()
+    company_id = settings.COMPANY_ID or "KH"
+    status_value = settings.DB_ACTIVE_STATUS or None
+    with _gc_paused():
+        return [
+            _trusted_instance(
+                EmployeePublic,
+                _EMPLOYEE_DEFAULTS,
+                {
+                    "company_id": company_id,
+                    "employee_id": row["mail"] or row["name"],
+                    "name": row["name"],
+                    "email": row["mail"] or None,
+                    "campus": _interned(row["campus"]),
+                    "dept_id": _interned(row["parent"]),
+                    "dept_name": _interned(row["parent"]),
+                    "status": status_value,
+                },
+            )
+            for row in rows
+        ]
+
+
+def employees_from_records(records: Iterable[dict[str, Any]]) -> list[EmployeePublic]:
+    """由本服務自行序列化的員工資料（例如磁碟快照）還原 EmployeePublic，略過驗證。"""
+
+    with _gc_paused():
+        return [_trusted_instance(EmployeePublic, _EMPLOYEE_DEFAULTS, record) for record in records]
+
+
+def _campus_value(employee: EmployeePublic) -> str:
+    return (employee.campus or "Unknown").strip() or "Unknown"
+
+
+def _dept_value(employee: EmployeePublic) -> str:
+    return employee.dept_id or employee.dept_name or "Unknown"
+
+
+def _trusted_node(key: str, label: str, node_type: str, data: Optional[EmployeePublic] = None) -> TreeNode:
+    values: dict[str, Any] = {"key": key, "label": label, "node_type": node_type, "children": []}
+    if data is not None:
+        values["data"] = data
+    return _trusted_instance(TreeNode, _TREE_NODE_DEFAULTS, values)
+
+
+def _new_campus_node(campus_value: str) -> TreeNode:
+    return _trusted_node(f"campus:{campus_value}", campus_value, "campus")
+
+
+def _new_dept_node(campus_value: str, employee: EmployeePublic) -> TreeNode:
+    dept_value = _dept_value(employee)
+    return _trusted_node(f"dept:{campus_value}:{dept_value}", employee.dept_name or dept_value, "dept")
+
+
+def _new_employee_node(employee: EmployeePublic) -> TreeNode:
+    return _trusted_node(f"emp:{employee.employee_id}", _employee_label(employee), "employee", employee)
+
+
+@timed("build_tree")
 def build_tree_from_employees(employees: list[EmployeePublic]) -> list[TreeNode]:
     """組成公司 → 校區 → 部門 → 人員的樹狀結構。"""
 
     settings = get_settings()
     company_label = settings.COMPANY_NAME or "公司"
     company_key = f"company:{settings.COMPANY_ID or 'company'}"
-    company_node = TreeNode(
-        key=company_key,
-        label=company_label,
-        node_type="company",
-        children=[],
-    )
+    company_node = _trusted_node(company_key, company_label, "company")
 
     campus_nodes: dict[str, TreeNode] = {}
     dept_nodes: dict[tuple[str, str], TreeNode] = {}
 
+    with _gc_paused():
+        for employee in employees:
+            campus_value = _campus_value(employee)
+            campus_key = f"campus:{campus_value}"
+            if campus_key not in campus_nodes:
+                campus_nodes[campus_key] = _new_campus_node(campus_value)
+                company_node.children.append(campus_nodes[campus_key])
+
+            dept_key = (campus_key, _dept_value(employee))
+            if dept_key not in dept_nodes:
+                dept_nodes[dept_key] = _new_dept_node(campus_value, employee)
+                campus_nodes[campus_key].children.append(dept_nodes[dept_key])
+
+            dept_nodes[dept_key].children.append(_new_employee_node(employee))
+
+    return [company_node]
+
+
+@dataclass
+class OrgChart:
+    """依主管關係組成的組織圖與其索引；orphans 為主管不在通訊錄中者，cycles 為被打斷的循環數。"""
+
+    tree: list[TreeNode]
+    index: TreeIndex
+    roots: int = 0
+    orphans: int = 0
+    cycles: int = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"roots": self.roots, "orphans": self.orphans, "cycles": self.cycles}
+
+
+@timed("build_org_chart")
+def build_org_chart(employees: list[EmployeePublic]) -> OrgChart:
+    """依 manager_id 組成公司 → 最高主管 → 部屬的組織圖，時間複雜度為 O(n)。
+
+    主管不在清單中（離職、停用或外部帳號）者與沒有主管者同列為最上層；
+    主管關係形成循環時，以循環中員工編號最小者作為最上層，打斷該循環。
+    """
+
+    by_id = {employee.employee_id: employee for employee in employees}
+    parents: dict[str, Optional[str]] = {}
+    orphans = 0
     for employee in employees:
-        campus_value = (employee.campus or "Unknown").strip() or "Unknown"
+        manager_id = employee.manager_id
+        if manager_id is None or manager_id == employee.employee_id:
+            parents[employee.employee_id] = None
+        elif manager_id in by_id:
+            parents[employee.employee_id] = manager_id
+        else:
+            parents[employee.employee_id] = None
+            orphans += 1
+
+    # 每位員工至多一位主管，沿主管鏈走訪並標記狀態；每個節點只會進入路徑一次
+    cycles = 0
+    state: dict[str, int] = {}  # 1：目前路徑上，2：已確認可到達最上層
+    for start in parents:
+        path: list[str] = []
+        current: Optional[str] = start
+        while current is not None and current not in state:
+            state[current] = 1
+            path.append(current)
+            current = parents[current]
+        if current is not None and state[current] == 1:
+            cycle = path[path.index(current) :]
+            parents[min(cycle)] = None
+            cycles += 1
+        for employee_id in path:
+            state[employee_id] = 2
+
+    settings = get_settings()
+    company_node = _trusted_node(
+        f"company:{settings.COMPANY_ID or 'company'}", settings.COMPANY_NAME or "公司", "company"
+    )
+    with _gc_paused():
+        nodes = {employee.employee_id: _new_employee_node(employee) for employee in employees}
+        for employee in employees:
+            parent_id = parents[employee.employee_id]
+            parent = company_node if parent_id is None else nodes[parent_id]
+            parent.children.append(nodes[employee.employee_id])
+
+    tree = [company_node]
+    return OrgChart(
+        tree=tree,
+        index=build_tree_index(tree),
+        roots=len(company_node.children),
+        orphans=orphans,
+        cycles=cycles,
+    )
+
+
+class _TreePatcher:
+    """以 copy-on-write 方式修補樹：僅複製受影響的校區與部門節點，其餘分支與舊樹共用。"""
+
+    def __init__(self, company_node: TreeNode) -> None:
+        self._company = company_node
+        self._campuses = list(company_node.children)
+        self._campus_pos = {node.key: index for index, node in enumerate(self._campuses)}
+        self._copied: dict[str, TreeNode] = {}
+
+    def _campus(self, campus_value: str, create: bool) -> TreeNode | None:
         campus_key = f"campus:{campus_value}"
-        if campus_key not in campus_nodes:
-            campus_nodes[campus_key] = TreeNode(
-                key=campus_key,
-                label=campus_value,
-                node_type="campus",
-                children=[],
-            )
-            company_node.children.append(campus_nodes[campus_key])
-
-        dept_value = employee.dept_id or employee.dept_name or "Unknown"
-        dept_key = (campus_key, dept_value)
-        if dept_key not in dept_nodes:
-            dept_label = employee.dept_name or dept_value
-            dept_nodes[dept_key] = TreeNode(
-                key=f"dept:{campus_value}:{dept_value}",
-                label=dept_label,
-                node_type="dept",
-                children=[],
-            )
-            campus_nodes[campus_key].children.append(dept_nodes[dept_key])
+        if campus_key in self._copied:
+            return self._copied[campus_key]
+        index = self._campus_pos.get(campus_key)
+        if index is None:
+            if not create:
+                return None
+            node = _new_campus_node(campus_value)
+            self._campus_pos[campus_key] = len(self._campuses)
+            self._campuses.append(node)
+        else:
+            original = self._campuses[index]
+            node = original.model_copy(update={"children": list(original.children)})
+            self._campuses[index] = node
+        self._copied[campus_key] = node
+        return node
 
-        employee_node = TreeNode(
-            key=f"emp:{employee.employee_id}",
-            label=employee.name or employee.email or employee.employee_id,
-            node_type="employee",
-            children=[],
-            data=employee,
-        )
-        dept_nodes[dept_key].children.append(employee_node)
+    def _dept(self, employee: EmployeePublic, create: bool) -> TreeNode | None:
+        campus_value = _campus_value(employee)
+        campus = self._campus(campus_value, create)
+        if campus is None:
+            return None
+        dept_key = f"dept:{campus_value}:{_dept_value(employee)}"
+        if dept_key in self._copied:
+            return self._copied[dept_key]
+        for index, original in enumerate(campus.children):
+            if original.key == dept_key:
+                node = original.model_copy(update={"children": list(original.children)})
+                campus.children[index] = node
+                break
+        else:
+            if not create:
+                return None
+            node = _new_dept_node(campus_value, employee)
+            campus.children.append(node)
+        self._copied[dept_key] = node
+        return node
 
-    return [company_node]
+    def apply(self, old: EmployeePublic | None, new: EmployeePublic | None) -> None:
+        old_index: int | None = None
+        old_dept: TreeNode | None = None
+        if old is not None:
+            old_dept = self._dept(old, create=False)
+            emp_key = f"emp:{old.employee_id}"
+            if old_dept is not None:
+                old_index = next(
+                    (index for index, node in enumerate(old_dept.children) if node.key == emp_key),
+                    None,
+                )
+        if new is None:
+            if old_dept is not None and old_index is not None:
+                old_dept.children.pop(old_index)
+            return
+
+        new_dept = self._dept(new, create=True)
+        if new_dept is old_dept and old_index is not None:
+            # 同部門內更新：原位替換以維持排序
+            new_dept.children[old_index] = _new_employee_node(new)
+            return
+        if old_dept is not None and old_index is not None:
+            old_dept.children.pop(old_index)
+        new_dept.children.append(_new_employee_node(new))  # type: ignore[union-attr]
+
+    def result(self) -> list[TreeNode]:
+        # 移除修補後變空的部門與校區
+        for node in self._copied.values():
+            if node.node_type == "campus":
+                node.children[:] = [dept for dept in node.children if dept.children]
+        campuses = [campus for campus in self._campuses if campus.children]
+        return [self._company.model_copy(update={"children": campuses})]
+
+
+@timed("patch_tree")
+def patch_tree(tree: list[TreeNode], changes: list[EmployeeChange]) -> list[TreeNode]:
+    """依 (舊資料, 新資料) 變更清單修補 build_tree_from_employees 產生的樹，回傳新樹且不修改原樹。
+
+    舊資料為 None 表示新增，新資料為 None 表示移除。
+    """
+
+    if not tree:
+        return build_tree_from_employees([new for _, new in changes if new is not None])
+    patcher = _TreePatcher(tree[0])
+    for old, new in changes:
+        patcher.apply(old, new)
+    return patcher.result()
+
+
+def diff_employees(old: list[EmployeePublic], new: list[EmployeePublic]) -> list[EmployeeChange]:
+    """比對兩份員工清單（以 employee_id 對應），產生與增量同步相同格式的變更清單。"""
+
+    previous = {employee.employee_id: employee for employee in old}
+    changes: list[EmployeeChange] = []
+    for employee in new:
+        before = previous.pop(employee.employee_id, None)
+        if before is None or before != employee:
+            changes.append((before, employee))
+    changes.extend((employee, None) for employee in previous.values())
+    return changes
+
+
+def employee_parents(employee: EmployeePublic) -> list[Breadcrumb]:
+    """員工節點在樹中的上層路徑（公司 → 校區 → 部門），與 build_tree_from_employees 的 key 規則一致。"""
+
+    settings = get_settings()
+    campus_value = _campus_value(employee)
+    dept_value = _dept_value(employee)
+    company_key = f"company:{settings.COMPANY_ID or 'company'}"
+    return [
+        Breadcrumb(key=company_key, label=settings.COMPANY_NAME or "公司", node_type="company"),
+        Breadcrumb(key=f"campus:{campus_value}", label=campus_value, node_type="campus"),
+        Breadcrumb(key=f"dept:{campus_value}:{dept_value}", label=employee.dept_name or dept_value, node_type="dept"),
+    ]
+
+
+def _employee_label(employee: EmployeePublic) -> str:
+    return employee.name or employee.email or employee.employee_id
+
+
+def describe_tree_changes(changes: Iterable[EmployeeChange]) -> list[TreeChange]:
+    """將 (舊資料, 新資料) 變更轉為前端可直接套用的節點層級變更。"""
+
+    described: list[TreeChange] = []
+    for old, new in changes:
+        if new is None:
+            if old is not None:
+                described.append(TreeChange(op="remove", key=f"emp:{old.employee_id}"))
+            continue
+        key = f"emp:{new.employee_id}"
+        if old is None:
+            described.append(TreeChange(op="add", key=key, parents=employee_parents(new), data=new))
+            continue
+        parents = employee_parents(new)
+        if parents[-1].key != employee_parents(old)[-1].key:
+            described.append(TreeChange(op="move", key=key, parents=parents, data=new))
+            continue
+        fields = {
+            name: getattr(new, name) for name in PUBLIC_EMPLOYEE_FIELDS if getattr(old, name) != getattr(new, name)
+        }
+        if fields:
+            label = _employee_label(new)
+            described.append(
+                TreeChange(op="update", key=key, fields=fields, label=label if label != _employee_label(old) else None)
+            )
+    return described
 
 
 def find_node_by_key(nodes: list[TreeNode], key: str) -> TreeNode | None:
@@ -108,3 +599,88 @@ def find_node_by_key(nodes: list[TreeNode], key: str) -> TreeNode | None:
         if found:
             return found
     return None
+
+
+@dataclass
+class TreeIndex:
+    """樹狀結構的 key → 節點索引，附父節點指標、深度與後代數量。"""
+
+    nodes: dict[str, TreeNode] = field(default_factory=dict)
+    parents: dict[str, Optional[str]] = field(default_factory=dict)
+    depths: dict[str, int] = field(default_factory=dict)
+    descendant_counts: dict[str, int] = field(default_factory=dict)
+    employee_counts: dict[str, int] = field(default_factory=dict)
+    height: int = 0
+
+    def get(self, key: str) -> TreeNode | None:
+        """以 O(1) 取得節點。"""
+
+        return self.nodes.get(key)
+
+    def path(self, key: str) -> list[TreeNode]:
+        """由根節點到指定節點（含）的路徑，長度受樹深度限制；找不到時回傳空清單。"""
+
+        if key not in self.nodes:
+            return []
+        chain: list[TreeNode] = []
+        current: Optional[str] = key
+        while current is not None:
+            chain.append(self.nodes[current])
+            current = self.parents.get(current)
+        chain.reverse()
+        return chain
+
+    def ancestors(self, key: str) -> list[TreeNode]:
+        """由根節點到指定節點父層的路徑（不含自身）。"""
+
+        return self.path(key)[:-1]
+
+
+@timed("build_index")
+def build_tree_index(nodes: list[TreeNode]) -> TreeIndex:
+    """走訪一次整棵樹建立索引，之後的子樹與路徑查詢皆不需再遞迴搜尋。"""
+
+    index = TreeIndex()
+    order: list[str] = []
+    stack: list[tuple[TreeNode, Optional[str], int]] = [(node, None, 0) for node in reversed(nodes)]
+    while stack:
+        node, parent_key, depth = stack.pop()
+        index.nodes[node.key] = node
+        index.parents[node.key] = parent_key
+        index.depths[node.key] = depth
+        order.append(node.key)
+        for child in reversed(node.children):
+            stack.append((child, node.key, depth + 1))
+
+    # 反向（後序）累加後代數量
+    for key in reversed(order):
+        node = index.nodes[key]
+        index.descendant_counts[key] = sum(1 + index.descendant_counts[child.key] for child in node.children)
+        own = 1 if node.node_type == "employee" else 0
+        index.employee_counts[key] = own + sum(index.employee_counts[child.key] for child in node.children)
+    index.height = max(index.depths.values(), default=0)
+    return index
+
+
+def truncate_tree(node: TreeNode, depth: int, index: TreeIndex) -> TruncatedTreeNode:
+    """複製節點並只保留 depth 層子節點；每個節點附上 has_children 與成員／後代數量供前端延遲載入。"""
+
+    children = [truncate_tree(child, depth - 1, index) for child in node.children] if depth > 0 else []
+    values = {
+        "key": node.key,
+        "label": node.label,
+        "node_type": node.node_type,
+        "children": children,
+        "data": node.data,
+        "has_children": bool(node.children),
+        "member_count": index.employee_counts.get(node.key, 0),
+        "descendant_count": index.descendant_counts.get(node.key, 0),
+    }
+    return _trusted_instance(TruncatedTreeNode, values, values)
+
+
+def paginate_members(node: TreeNode, offset: int, limit: int) -> MemberPage:
+    """取出節點底下的直屬員工並分頁。"""
+
+    members = [child.data for child in node.children if child.node_type == "employee" and child.data is not None]
+    return MemberPage(total=len(members), offset=offset, limit=limit, items=members[offset : offset + limit])
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+"""員工大頭貼代理：以應用程式 Token 向 Graph 取得照片，縮圖後快取於記憶體與本機 SQLite。
+
+- 每位員工只下載一次原圖並產生所有尺寸的縮圖。
+- 超過重新驗證間隔後先回傳舊縮圖，並於背景以 mediaEtag 比對，未變更時不重新下載。
+- 沒有照片也會快取（負面快取），避免重複查詢。
+- 未快取的照片同時向 Graph 取得的數量有上限，避免觸發節流。
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from graph_service import fetch_user_photo, fetch_user_photo_etag
+from metrics import CACHE_EVENTS, stage
+
+try:  # Pillow 未安裝時直接回傳原圖
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - 依部署環境而定
+    Image = None
+    ImageOps = None
+
+LOGGER = logging.getLogger(__name__)
+
+PHOTO_SIZES = (48, 96, 240)
+DEFAULT_PHOTO_SIZE = 96
+JPEG_QUALITY = 85
+# 磁碟快取每寫入多少次檢查一次總大小
+PRUNE_EVERY_SAVES = 50
+
+PhotoFetcher = Callable[[str], Awaitable["tuple[bytes, str | None] | None"]]
+EtagFetcher = Callable[[str], Awaitable["str | None"]]
+
+
+@dataclass
+class PhotoEntry:
+    """單一員工的快取內容；thumbnails 為空表示沒有照片。"""
+
+    etag: str | None
+    checked_at: float
+    thumbnails: dict[int, bytes] = field(default_factory=dict)
+
+    @property
+    def missing(self) -> bool:
+        return not self.thumbnails
+
+    @property
+    def size(self) -> int:
+        return sum(len(data) for data in self.thumbnails.values())
+
+
+def make_thumbnails(image_bytes: bytes, sizes: tuple[int, ...] = PHOTO_SIZES) -> dict[int, bytes]:
+    """將原圖裁切為正方形並縮成各尺寸 JPEG（CPU 密集，請於執行緒中呼叫）。"""
+
+    if Image is None:
+        return {size: image_bytes for size in sizes}
+    with Image.open(io.BytesIO(image_bytes)) as source:
+        source = ImageOps.exif_transpose(source).convert("RGB")
+        thumbnails: dict[int, bytes] = {}
+        for size in sizes:
+            thumbnail = ImageOps.fit(source, (size, size), method=Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=size > 96)
+            thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+def thumbnail_etag(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+class PhotoDiskStore:
+    """縮圖的本機 SQLite 快取；總大小超過上限時依最後使用時間淘汰。"""
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS photos (employee_id TEXT PRIMARY KEY, etag TEXT, checked_at REAL, "
+            "accessed_at REAL, bytes INTEGER)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS thumbnails (employee_id TEXT, size INTEGER, data BLOB, "
+            "PRIMARY KEY (employee_id, size))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS photos_accessed ON photos (accessed_at)")
+        self._lock = threading.Lock()
+        self._saves = 0
+
+    def load(self, employee_id: str) -> PhotoEntry | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag, checked_at FROM photos WHERE employee_id = ?", (employee_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            thumbnails = dict(
+                self._connection.execute(
+                    "SELECT size, data FROM thumbnails WHERE employee_id = ?", (employee_id,)
+                ).fetchall()
+            )
+            self._connection.execute(
+                "UPDATE photos SET accessed_at = ? WHERE employee_id = ?", (time.time(), employee_id)
+            )
+        return PhotoEntry(etag=row[0], checked_at=row[1], thumbnails=thumbnails)
+
+    def save(self, employee_id: str, entry: PhotoEntry, thumbnails_changed: bool = True) -> None:
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?)",
+                    (employee_id, entry.etag, entry.checked_at, time.time(), entry.size),
+                )
+                if thumbnails_changed:
+                    connection.execute("DELETE FROM thumbnails WHERE employee_id = ?", (employee_id,))
+                    connection.executemany(
+                        "INSERT INTO thumbnails VALUES (?, ?, ?)",
+                        [(employee_id, size, data) for size, data in entry.thumbnails.items()],
+                    )
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+            self._saves += 1
+            prune = self._saves % PRUNE_EVERY_SAVES == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """刪除最久未使用的照片直到總大小低於上限，回傳刪除筆數。"""
+
+        with self._lock:
+            connection = self._connection
+            total = connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM photos").fetchone()[0]
+            if total <= self._max_bytes:
+                return 0
+            removed: list[str] = []
+            for employee_id, size in connection.execute(
+                "SELECT employee_id, bytes FROM photos ORDER BY accessed_at"
+            ).fetchall():
+                if total <= self._max_bytes:
+                    break
+                removed.append(employee_id)
+                total -= size
+            connection.executemany("DELETE FROM photos WHERE employee_id = ?", [(item,) for item in removed])
+            connection.executemany("DELETE FROM thumbnails WHERE employee_id = ?", [(item,) for item in removed])
+        return len(removed)
+
+
+class PhotoCache:
+    """記憶體 LRU（依位元組數限制）＋選用的磁碟快取，並以單一飛行與並行上限向 Graph 取得照片。"""
+
+    def __init__(
+        self,
+        disk: PhotoDiskStore | None,
+        memory_max_bytes: int,
+        revalidate_seconds: float,
+        negative_ttl_seconds: float,
+        fetch_concurrency: int,
+        fetch_photo: PhotoFetcher = fetch_user_photo,
+        fetch_etag: EtagFetcher = fetch_user_photo_etag,
+    ) -> None:
+        self._disk = disk
+        self._memory_max_bytes = memory_max_bytes
+        self._revalidate_seconds = revalidate_seconds
+        self._negative_ttl_seconds = negative_ttl_seconds
+        self._semaphore = asyncio.Semaphore(fetch_concurrency)
+        self._fetch_photo = fetch_photo
+        self._fetch_etag = fetch_etag
+        self._memory: OrderedDict[str, PhotoEntry] = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight: dict[str, asyncio.Task[PhotoEntry]] = {}
+        self.graph_fetches = 0
+        self.revalidated = 0
+
+    async def get(self, employee_id: str) -> PhotoEntry:
+        """取得員工照片快取；過期時先回傳舊內容並於背景重新驗證，完全沒有快取時等待下載。"""
+
+        entry = self._memory.get(employee_id)
+        if entry is not None:
+            self._memory.move_to_end(employee_id)
+            CACHE_EVENTS.inc(cache="photo", result="hit")
+        elif self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.load, employee_id)
+            if entry is not None:
+                CACHE_EVENTS.inc(cache="photo", result="disk")
+                self._remember(employee_id, entry)
+
+        if entry is None:
+            CACHE_EVENTS.inc(cache="photo", result="miss")
+            return await asyncio.shield(self._ensure_fetch(employee_id, None))
+        if self._is_stale(entry):
+            self._ensure_fetch(employee_id, entry)
+        return entry
+
+    def _is_stale(self, entry: PhotoEntry) -> bool:
+        ttl = self._negative_ttl_seconds if entry.missing else self._revalidate_seconds
+        return time.time() - entry.checked_at >= ttl
+
+    def _ensure_fetch(self, employee_id: str, current: PhotoEntry | None) -> asyncio.Task[PhotoEntry]:
+        task = self._inflight.get(employee_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch(employee_id, current))
+            self._inflight[employee_id] = task
+            task.add_done_callback(lambda done: self._on_fetch_done(employee_id, done))
+        return task
+
+    def _on_fetch_done(self, employee_id: str, task: asyncio.Task[PhotoEntry]) -> None:
+        if self._inflight.get(employee_id) is task:
+            del self._inflight[employee_id]
+        if not task.cancelled() and task.exception() is not None:
+            error = task.exception()
+            LOGGER.warning("Photo fetch for %s failed: %s", employee_id, getattr(error, "detail", error))
+
+    async def _fetch(self, employee_id: str, current: PhotoEntry | None) -> PhotoEntry:
+        media_etag: str | None = None
+        async with self._semaphore:
+            if current is not None and current.etag:
+                # 只取中繼資料比對 mediaEtag，未變更時沿用現有縮圖
+                media_etag = await self._fetch_etag(employee_id)
+                if media_etag is None:
+                    entry = PhotoEntry(etag=None, checked_at=time.time())
+                    await self._store(employee_id, entry)
+                    return entry
+                if media_etag == current.etag:
+                    self.revalidated += 1
+                    entry = PhotoEntry(etag=current.etag, checked_at=time.time(), thumbnails=current.thumbnails)
+                    await self._store(employee_id, entry, thumbnails_changed=False)
+                    return entry
+            self.graph_fetches += 1
+            photo = await self._fetch_photo(employee_id)
+        if photo is None:
+            entry = PhotoEntry(etag=None, checked_at=time.time())
+        else:
+            image_bytes, etag = photo
+            with stage("thumbnail"):
+                thumbnails = await asyncio.to_thread(make_thumbnails, image_bytes)
+            # $value 回應的 ETag 不一定與 mediaEtag 相同，已取得 mediaEtag 時以其為準
+            entry = PhotoEntry(etag=media_etag or etag, checked_at=time.time(), thumbnails=thumbnails)
+        await self._store(employee_id, entry)
+        return entry
+
+    async def _store(self, employee_id: str, entry: PhotoEntry, thumbnails_changed: bool = True) -> None:
+        self._remember(employee_id, entry)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.save, employee_id, entry, thumbnails_changed)
+
+    def _remember(self, employee_id: str, entry: PhotoEntry) -> None:
+        previous = self._memory.pop(employee_id, None)
+        if previous is not None:
+            self._memory_bytes -= previous.size
+        self._memory[employee_id] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self._memory_max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "graph_fetches": self.graph_fetches,
+            "revalidated": self.revalidated,
+            "inflight": len(self._inflight),
+        }
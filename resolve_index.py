@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+"""收件者解析用的雜湊索引：Email、UPN、員工編號、分機、電話與姓名完全比對。"""
+
+import re
+from typing import Iterable, Literal, Optional
+
+from metrics import timed
+from models import EmployeeChange, EmployeePublic
+
+NON_DIGIT_PATTERN = re.compile(r"\D+")
+# Outlook 收件者欄位常見的「顯示名稱 <address>」格式
+ANGLE_ADDRESS_PATTERN = re.compile(r"<([^<>]+)>\s*$")
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+# 電話與分機至少需有幾位數字才比對，避免單一數字誤中
+MIN_PHONE_DIGITS = 2
+
+MatchKind = Literal["email", "upn", "employee_id", "ext", "phone", "name"]
+# 依序嘗試，第一個有結果的類型即為解析結果
+MATCH_ORDER: tuple[MatchKind, ...] = ("email", "upn", "employee_id", "ext", "phone", "name")
+
+
+def _digits(value: Optional[str]) -> str:
+    return NON_DIGIT_PATTERN.sub("", value) if value else ""
+
+
+def _index_keys(employee: EmployeePublic) -> list[tuple[MatchKind, str]]:
+    keys: list[tuple[MatchKind, str]] = [("employee_id", employee.employee_id.casefold())]
+    if employee.email:
+        keys.append(("email", employee.email.casefold()))
+    if employee.upn:
+        keys.append(("upn", employee.upn.casefold()))
+    ext = _digits(employee.ext)
+    if len(ext) >= MIN_PHONE_DIGITS:
+        keys.append(("ext", ext))
+    for phone in (employee.phone_no, employee.mobile_phone):
+        digits = _digits(phone)
+        if len(digits) >= MIN_PHONE_DIGITS:
+            keys.append(("phone", digits))
+    for name in (employee.name, employee.ename):
+        if name:
+            keys.append(("name", " ".join(name.casefold().split())))
+    return keys
+
+
+def normalize_identifier(identifier: str) -> str:
+    """去除「名稱 <address>」外層與 mailto:，並統一大小寫與空白。"""
+
+    text = identifier.strip()
+    if text.endswith(">"):
+        match = ANGLE_ADDRESS_PATTERN.search(text)
+        if match:
+            text = match.group(1).strip()
+    text = " ".join(text.casefold().split())
+    return text[7:] if text.startswith("mailto:") else text
+
+
+class ResolveIndex:
+    """每種識別值各一個 key → 員工編號清單的雜湊表，支援依快照變更增量更新。"""
+
+    def __init__(self) -> None:
+        self._tables: dict[MatchKind, dict[str, list[str]]] = {kind: {} for kind in MATCH_ORDER}
+        self._keys: dict[str, list[tuple[MatchKind, str]]] = {}
+        self._employees: dict[str, EmployeePublic] = {}
+
+    @classmethod
+    @timed("resolve_index")
+    def build(cls, employees: Iterable[EmployeePublic]) -> "ResolveIndex":
+        """由員工清單完整建立索引。"""
+
+        index = cls()
+        for employee in employees:
+            index._add(employee)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._employees)
+
+    @timed("resolve_index")
+    def apply(self, changes: Iterable[EmployeeChange]) -> None:
+        """套用 (舊資料, 新資料) 變更，只更新受影響員工的索引鍵。"""
+
+        for old, new in changes:
+            if old is not None:
+                self._remove(old.employee_id)
+            if new is not None:
+                self._add(new)
+
+    def _add(self, employee: EmployeePublic) -> None:
+        employee_id = employee.employee_id
+        if employee_id in self._employees:
+            self._remove(employee_id)
+        keys = _index_keys(employee)
+        self._employees[employee_id] = employee
+        self._keys[employee_id] = keys
+        for kind, key in keys:
+            matches = self._tables[kind].setdefault(key, [])
+            if employee_id not in matches:
+                matches.append(employee_id)
+
+    def _remove(self, employee_id: str) -> None:
+        keys = self._keys.pop(employee_id, None)
+        self._employees.pop(employee_id, None)
+        if not keys:
+            return
+        for kind, key in keys:
+            matches = self._tables[kind].get(key)
+            if matches is None:
+                continue
+            if employee_id in matches:
+                matches.remove(employee_id)
+            if not matches:
+                del self._tables[kind][key]
+
+    def lookup(self, identifier: str) -> tuple[MatchKind | None, list[EmployeePublic]]:
+        """依 MATCH_ORDER 解析單一識別值，回傳 (命中類型, 候選員工)；找不到時為 (None, [])。
+
+        含 @ 者只比對 Email、UPN 與員工編號；不含字母者才比對分機與電話，其餘比對姓名。
+        """
+
+        text = normalize_identifier(identifier)
+        if not text:
+            return None, []
+        tables = self._tables
+        if "@" in text:
+            candidates: list[tuple[MatchKind, str]] = [("email", text), ("upn", text), ("employee_id", text)]
+        elif LETTER_PATTERN.search(text) is None:
+            digits = _digits(text)
+            candidates = [("employee_id", text)]
+            if len(digits) >= MIN_PHONE_DIGITS:
+                candidates += [("ext", digits), ("phone", digits)]
+        else:
+            candidates = [("employee_id", text), ("name", text)]
+        for kind, key in candidates:
+            matches = tables[kind].get(key)
+            if matches:
+                employees = self._employees
+                return kind, [employees[employee_id] for employee_id in matches]
+        return None, []
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+"""預先序列化的回應快取：每個快照版本只序列化與壓縮一次，並支援 ETag / 304 與內容協商。"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Union
+
+from fastapi import Request, Response, status
+
+from metrics import CACHE_EVENTS, timed
+
+try:  # brotli 為選用套件，未安裝時僅提供 gzip
+    import brotli
+except ImportError:  # pragma: no cover - 依部署環境而定
+    brotli = None
+
+LOGGER = logging.getLogger(__name__)
+
+# 過小的內容壓縮效益有限，直接回傳原始內容
+MIN_COMPRESS_BYTES = 512
+
+# 內容可為 bytes，或指向共用記憶體映射檔的 memoryview（零複製）
+Buffer = Union[bytes, memoryview]
+
+
+@dataclass(frozen=True)
+class RenderedBody:
+    """同一份 JSON 的原始與壓縮版本，以及對應的強 ETag。"""
+
+    identity: Buffer
+    gzip: Buffer | None
+    br: Buffer | None
+    etag: str
+
+    @classmethod
+    @timed("compress")
+    def render(
+        cls,
+        payload: bytes,
+        compress: bool = True,
+        gzip_level: int = 6,
+        br_quality: int = 5,
+    ) -> "RenderedBody":
+        """計算 ETag 並產生壓縮版本；只在啟動時處理一次的內容（例如靜態檔）可使用較高壓縮等級。"""
+
+        digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        gzip_body: bytes | None = None
+        br_body: bytes | None = None
+        if compress and len(payload) >= MIN_COMPRESS_BYTES:
+            gzip_body = gzip.compress(payload, compresslevel=gzip_level, mtime=0)
+            if brotli is not None:
+                br_body = brotli.compress(payload, quality=br_quality)
+        return cls(identity=payload, gzip=gzip_body, br=br_body, etag=digest)
+
+    def variant(self, encoding: str) -> Buffer | None:
+        if encoding == "br":
+            return self.br
+        if encoding == "gzip":
+            return self.gzip
+        return self.identity
+
+    @property
+    def size(self) -> int:
+        return len(self.identity) + len(self.gzip or b"") + len(self.br or b"")
+
+
+def _render_body(render: Callable[[], bytes]) -> RenderedBody:
+    return RenderedBody.render(render())
+
+
+class RenderedResponseCache:
+    """以快照版本為範圍的 LRU；版本更新時整批淘汰舊內容。
+
+    仍在使用舊快照的請求只即時產生內容而不寫入快取，避免淘汰新版本已預先放入的內容。
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._version: int | None = None
+        self._entries: OrderedDict[Hashable, RenderedBody] = OrderedDict()
+        self._pending: dict[Hashable, asyncio.Future[RenderedBody]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_render(self, version: int, key: Hashable, render: Callable[[], bytes]) -> RenderedBody:
+        """取得指定版本的預先序列化內容，不存在時於工作執行緒呼叫 render 產生。
+
+        序列化與壓縮屬 CPU 密集工作，移出事件迴圈以免阻塞其他請求；同一內容同時只產生一次。
+        """
+
+        if self._version is not None and version < self._version:
+            self.misses += 1
+            return await asyncio.to_thread(_render_body, render)
+        self._switch_version(version)
+        body = self._entries.get(key)
+        if body is not None:
+            self.hits += 1
+            CACHE_EVENTS.inc(cache="response", result="hit")
+            self._entries.move_to_end(key)
+            return body
+
+        pending_key = (version, key)
+        task = self._pending.get(pending_key)
+        if task is None:
+            self.misses += 1
+            CACHE_EVENTS.inc(cache="response", result="miss")
+            task = asyncio.ensure_future(asyncio.to_thread(_render_body, render))
+            self._pending[pending_key] = task
+            task.add_done_callback(lambda done: self._on_rendered(version, key, pending_key, done))
+        else:
+            CACHE_EVENTS.inc(cache="response", result="wait")
+        return await asyncio.shield(task)
+
+    def _on_rendered(
+        self, version: int, key: Hashable, pending_key: Hashable, task: asyncio.Future[RenderedBody]
+    ) -> None:
+        self._pending.pop(pending_key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        # 產生期間版本可能已更新，此時結果不寫入快取
+        if version == self._version:
+            self._store(key, task.result())
+
+    def put(self, version: int, key: Hashable, body: RenderedBody) -> None:
+        """預先放入指定版本的內容（例如由共用快照映射而來）；版本較舊時忽略。"""
+
+        if self._version is not None and version < self._version:
+            return
+        self._switch_version(version)
+        self._store(key, body)
+
+    def _switch_version(self, version: int) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _store(self, key: Hashable, body: RenderedBody) -> None:
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": sum(body.size for body in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _accepted_encodings(header: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, body: RenderedBody) -> str:
+    """依 Accept-Encoding 選出已預先壓縮的版本：br 優先，其次 gzip，否則原始內容。"""
+
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best = "identity"
+    best_quality = 0.0
+    for encoding in ("br", "gzip"):
+        if body.variant(encoding) is None:
+            continue
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        candidate = candidate.removeprefix("W/").strip('"')
+        # 壓縮版本的 ETag 帶有 -gzip / -br 後綴，比對時視為同一份內容
+        if candidate.split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def rendered_response(
+    request: Request,
+    body: RenderedBody,
+    media_type: str = "application/json",
+    cache_control: str = "no-cache",
+) -> Response:
+    """回傳預先序列化的內容；If-None-Match 命中時回 304。"""
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""), body)
+    etag = f'"{body.etag}"' if encoding == "identity" else f'"{body.etag}-{encoding}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, body.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body.variant(encoding), media_type=media_type, headers=headers)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+"""通訊錄搜尋用的倒排索引：拉丁字詞前綴比對、中文字元 n-gram 比對。"""
+
+import bisect
+import heapq
+import re
+from collections import OrderedDict
+from typing import Iterable, NamedTuple
+
+from metrics import CACHE_EVENTS, timed
+from models import EmployeeChange, EmployeePublic
+
+LATIN_PATTERN = re.compile(r"[0-9a-z\u00c0-\u024f]+")
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+NON_DIGIT_PATTERN = re.compile(r"\D+")
+
+# 欄位權重：姓名命中優先於部門、職稱
+FIELD_WEIGHTS: dict[str, float] = {
+    "name": 10.0,
+    "ename": 8.0,
+    "email": 6.0,
+    "ext": 6.0,
+    "phone_no": 5.0,
+    "dept_name": 3.0,
+    "title": 2.0,
+}
+PHONE_FIELDS = {"phone_no", "ext"}
+PREFIX_MATCH_FACTOR = 0.6
+CJK_RUN_BONUS = 0.5
+# 查詢結果快取：同一關鍵字翻頁或重複查詢時直接取用排序結果
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_MIN_DEPTH = 100
+
+
+def _cjk_grams(run: str) -> list[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i : i + 2] for i in range(len(run) - 1)]
+
+
+def _document_terms(employee: EmployeePublic) -> dict[str, float]:
+    """計算單一員工的索引字詞與權重（同一字詞取最高權重）。"""
+
+    terms: dict[str, float] = {}
+
+    def add(term: str, weight: float) -> None:
+        if weight > terms.get(term, 0.0):
+            terms[term] = weight
+
+    for field_name, weight in FIELD_WEIGHTS.items():
+        value = getattr(employee, field_name)
+        if not value:
+            continue
+        text = value.casefold()
+        for token in LATIN_PATTERN.findall(text):
+            add(token, weight)
+        for run in CJK_PATTERN.findall(text):
+            for char in run:
+                add(char, weight)
+            for gram in _cjk_grams(run):
+                add(gram, weight)
+            add(run, weight)
+        if field_name in PHONE_FIELDS:
+            digits = NON_DIGIT_PATTERN.sub("", text)
+            if digits:
+                add(digits, weight)
+    return terms
+
+
+class SearchHit(NamedTuple):
+    """查詢命中結果。"""
+
+    employee: EmployeePublic
+    score: float
+
+
+class SearchIndex:
+    """員工倒排索引，支援依快照變更增量更新。
+
+    拉丁字詞保存在排序後的字彙表中，以二分搜尋完成前綴比對；
+    中文以單字與雙字 n-gram 建索引，查詢時要求所有 n-gram 皆命中。
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[str, dict[str, float]] = {}
+        self._vocabulary: list[str] = []
+        self._doc_terms: dict[str, dict[str, float]] = {}
+        self._employees: dict[str, EmployeePublic] = {}
+        self._results: OrderedDict[str, tuple[int, list[tuple[float, str]]]] = OrderedDict()
+
+    @classmethod
+    @timed("search_index")
+    def build(cls, employees: Iterable[EmployeePublic]) -> "SearchIndex":
+        """由員工清單完整建立索引。"""
+
+        index = cls()
+        for employee in employees:
+            employee_id = employee.employee_id
+            terms = _document_terms(employee)
+            index._employees[employee_id] = employee
+            index._doc_terms[employee_id] = terms
+            for term, weight in terms.items():
+                index._postings.setdefault(term, {})[employee_id] = weight
+        index._vocabulary = sorted(index._postings)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._employees)
+
+    @timed("search_index")
+    def apply(self, changes: Iterable[EmployeeChange]) -> None:
+        """套用 (舊資料, 新資料) 變更，只更新受影響員工的字詞。"""
+
+        self._results.clear()
+        for old, new in changes:
+            if old is not None:
+                self._remove(old.employee_id)
+            if new is not None:
+                self._add(new)
+
+    def _add(self, employee: EmployeePublic) -> None:
+        employee_id = employee.employee_id
+        if employee_id in self._employees:
+            self._remove(employee_id)
+        terms = _document_terms(employee)
+        self._employees[employee_id] = employee
+        self._doc_terms[employee_id] = terms
+        for term, weight in terms.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                bisect.insort(self._vocabulary, term)
+            posting[employee_id] = weight
+
+    def _remove(self, employee_id: str) -> None:
+        terms = self._doc_terms.pop(employee_id, None)
+        self._employees.pop(employee_id, None)
+        if not terms:
+            return
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(employee_id, None)
+            if not posting:
+                del self._postings[term]
+                position = bisect.bisect_left(self._vocabulary, term)
+                if position < len(self._vocabulary) and self._vocabulary[position] == term:
+                    del self._vocabulary[position]
+
+    def _prefix_scores(self, prefix: str) -> dict[str, float]:
+        scores: dict[str, float] = {}
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        vocabulary = self._vocabulary
+        while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+            term = vocabulary[position]
+            factor = 1.0 if term == prefix else PREFIX_MATCH_FACTOR
+            for employee_id, weight in self._postings[term].items():
+                score = weight * factor
+                if score > scores.get(employee_id, 0.0):
+                    scores[employee_id] = score
+            position += 1
+        return scores
+
+    def _clauses(self, query: str) -> tuple[list[dict[str, float]], list[dict[str, float]]]:
+        """將查詢拆成 (必要子句, 加分子句)；必要子句須全部命中，加分子句只影響排序。"""
+
+        text = query.casefold()
+        required: list[dict[str, float]] = []
+        bonus: list[dict[str, float]] = []
+        for token in LATIN_PATTERN.findall(text):
+            required.append(self._prefix_scores(token))
+        for run in CJK_PATTERN.findall(text):
+            for gram in _cjk_grams(run):
+                required.append(self._postings.get(gram, {}))
+            if len(run) > 2 and run in self._postings:
+                # 完整詞命中時加分，讓全名相符者排在前面
+                whole = self._postings[run]
+                bonus.append({employee_id: weight * CJK_RUN_BONUS for employee_id, weight in whole.items()})
+        return required, bonus
+
+    @timed("search")
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> tuple[int, list[SearchHit]]:
+        """回傳 (命中總數, 依分數排序的該頁結果)。"""
+
+        key = " ".join(query.casefold().split())
+        depth = offset + limit
+        cached = self._results.get(key)
+        if cached is None or len(cached[1]) < min(depth, cached[0]):
+            CACHE_EVENTS.inc(cache="search", result="miss")
+            cached = self._rank(key, max(depth, RESULT_CACHE_MIN_DEPTH))
+            self._results[key] = cached
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        else:
+            CACHE_EVENTS.inc(cache="search", result="hit")
+            self._results.move_to_end(key)
+
+        total, ranked = cached
+        hits = [SearchHit(self._employees[employee_id], round(score, 3)) for score, employee_id in ranked[offset:depth]]
+        return total, hits
+
+    def _rank(self, query: str, depth: int) -> tuple[int, list[tuple[float, str]]]:
+        """計算命中總數與前 depth 名的 (分數, 員工編號)。"""
+
+        required, bonus = self._clauses(query)
+        if not required:
+            return 0, []
+        # 由最小的子句開始求交集，縮小候選集合
+        required.sort(key=len)
+        candidates = set(required[0])
+        for clause in required[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(clause)
+        if not candidates:
+            return 0, []
+
+        clauses = required + bonus
+        scored = ((sum(clause.get(employee_id, 0.0) for clause in clauses), employee_id) for employee_id in candidates)
+        employees = self._employees
+        top = heapq.nsmallest(depth, scored, key=lambda item: (-item[0], employees[item[1]].name, item[1]))
+        return len(candidates), top
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+"""伺服器端 Session：Cookie 只保存不透明的 Session ID，內容存放於記憶體或本機 SQLite。
+
+取代 Starlette 以簽章 Cookie 保存整份 Session 的作法，避免 OAuth token 與使用者資料
+讓 Cookie 膨脹到數 KB 並隨每個請求（含靜態檔）傳送與驗證。
+Session 內容只在需要的路由才載入：以 load_session 相依於工作執行緒預先讀取，未使用 Session 的路由不需任何查詢。
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator, MutableMapping, Protocol
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import CACHE_EVENTS, stage
+
+if TYPE_CHECKING:
+    from config import Settings
+
+LOGGER = logging.getLogger(__name__)
+
+# secrets.token_urlsafe(32) 產生 43 個字元；格式不符的 Cookie（例如舊版簽章 Cookie）直接視為無 Session
+SESSION_ID_BYTES = 32
+MAX_SESSION_ID_LENGTH = 64
+# SQLite 每寫入多少次順便清除一次過期 Session
+PURGE_EVERY_SAVES = 200
+
+
+class SessionBackend(Protocol):
+    """Session 儲存後端；方法皆為同步 I/O，請於工作執行緒中呼叫。"""
+
+    name: str
+
+    def load(self, session_id: str) -> dict[str, Any] | None:
+        """讀取未過期的 Session 內容，不存在時回傳 None。"""
+
+    def save(self, session_id: str, data: dict[str, Any], max_age_seconds: float) -> None:
+        """寫入 Session 內容並重設到期時間。"""
+
+    def delete(self, session_id: str) -> None:
+        """刪除 Session。"""
+
+
+class MemorySessionBackend:
+    """行程內 LRU + TTL 的 Session 儲存；重新啟動即清空，且不跨 worker 共用。"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.time():
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            # 回傳複本，未呼叫 save 前的修改不影響已保存的內容
+            return json.loads(json.dumps(data))
+
+    def save(self, session_id: str, data: dict[str, Any], max_age_seconds: float) -> None:
+        snapshot = json.loads(json.dumps(data))
+        with self._lock:
+            self._entries[session_id] = (time.time() + max_age_seconds, snapshot)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+class SqliteSessionBackend:
+    """本機 SQLite 檔的 Session 儲存；同一台主機的多個 worker 可共用，重新啟動後仍保留登入狀態。"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, expires_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._saves = 0
+        self.purge_expired()
+
+    def load(self, session_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM sessions WHERE id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save(self, session_id: str, data: dict[str, Any], max_age_seconds: float) -> None:
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (id, expires_at, data) VALUES (?, ?, ?)",
+                (session_id, time.time() + max_age_seconds, payload),
+            )
+            self._saves += 1
+            purge = self._saves % PURGE_EVERY_SAVES == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._connection.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+
+class LazySession(MutableMapping[str, Any]):
+    """由 load_session 相依載入內容的 Session；只有直接設定或刪除鍵值才視為已修改。
+
+    未先載入即存取會拋出 RuntimeError，避免在事件迴圈中同步讀取後端。
+    修改巢狀結構（例如 session["auth"]["user"] = ...）需重新指定頂層鍵值才會保存。
+    """
+
+    def __init__(self, backend: SessionBackend, session_id: str | None) -> None:
+        self._backend = backend
+        self.session_id = session_id
+        self._data: dict[str, Any] | None = None
+        self.modified = False
+        self.rotated_from: str | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    async def load(self) -> None:
+        """於工作執行緒讀取 Session 內容，之後的存取不再觸及後端。"""
+
+        if self._data is None:
+            data = None
+            if self.session_id is not None:
+                with stage("session_load"):
+                    data = await asyncio.to_thread(self._backend.load, self.session_id)
+                CACHE_EVENTS.inc(cache="session", result="hit" if data is not None else "miss")
+            self._data = data or {}
+
+    def _load(self) -> dict[str, Any]:
+        if self._data is None:
+            raise RuntimeError("Server-side session is not loaded; add Depends(load_session) to the route")
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self._load()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key: str) -> None:
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def clear(self) -> None:
+        self._load().clear()
+        self.modified = True
+
+    def rotate(self) -> None:
+        """更換 Session ID 並保留內容（登入成功時呼叫，防止 Session 固定攻擊）。"""
+
+        self._load()
+        if self.session_id is not None and self.rotated_from is None:
+            self.rotated_from = self.session_id
+        self.session_id = None
+        self.modified = True
+
+
+async def load_session(request: HTTPConnection) -> None:
+    """FastAPI 相依：於工作執行緒預先載入伺服器端 Session，路由中存取 request.session 不會阻塞事件迴圈。"""
+
+    session = request.session
+    if isinstance(session, LazySession):
+        await session.load()
+
+
+def rotate_session(request: HTTPConnection) -> None:
+    """若使用伺服器端 Session 則更換 Session ID；簽章 Cookie Session 不需處理。"""
+
+    session = request.session
+    if isinstance(session, LazySession):
+        session.rotate()
+
+
+class ServerSessionMiddleware:
+    """以 Cookie 中的 Session ID 對應伺服器端內容的 ASGI middleware，介面與 Starlette SessionMiddleware 相同。
+
+    後端由 get_backend 於每個請求取得，可在應用程式啟動（lifespan）時才建立；
+    尚未建立時（例如未執行 lifespan 的測試用戶端）請求不帶 Session 直接放行。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        get_backend: Callable[[], SessionBackend | None],
+        session_cookie: str = "session",
+        max_age: int = 14 * 24 * 60 * 60,
+        path: str = "/",
+        same_site: str = "lax",
+        https_only: bool = False,
+    ) -> None:
+        self.app = app
+        self.get_backend = get_backend
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        backend = self.get_backend() if scope["type"] in ("http", "websocket") else None
+        if backend is None:
+            await self.app(scope, receive, send)
+            return
+
+        session_id = HTTPConnection(scope).cookies.get(self.session_cookie)
+        if session_id is not None and not (0 < len(session_id) <= MAX_SESSION_ID_LENGTH):
+            session_id = None
+        session = LazySession(backend, session_id)
+        scope["session"] = session
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and session.modified:
+                cookie = await self._persist(backend, session, initial_id=session_id)
+                if cookie is not None:
+                    MutableHeaders(scope=message).append("Set-Cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _persist(self, backend: SessionBackend, session: LazySession, initial_id: str | None) -> str | None:
+        """保存已修改的 Session，回傳需要設定的 Set-Cookie 值；內容未變且 ID 未變時不重設 Cookie。"""
+
+        if session.rotated_from is not None:
+            await asyncio.to_thread(backend.delete, session.rotated_from)
+        if not session:
+            if session.session_id is not None:
+                await asyncio.to_thread(backend.delete, session.session_id)
+            if initial_id is None:
+                return None
+            return self._cookie("null", expires="expires=Thu, 01 Jan 1970 00:00:00 GMT; ")
+
+        if session.session_id is None:
+            session.session_id = secrets.token_urlsafe(SESSION_ID_BYTES)
+        await asyncio.to_thread(backend.save, session.session_id, dict(session), self.max_age)
+        return self._cookie(session.session_id, expires=f"Max-Age={self.max_age}; ")
+
+    def _cookie(self, value: str, expires: str) -> str:
+        return f"{self.session_cookie}={value}; path={self.path}; {expires}{self.security_flags}"
+
+
+def create_session_backend(settings: Settings) -> SessionBackend | None:
+    """依設定建立 Session 後端；設定為 cookie 時回傳 None，沿用簽章 Cookie Session。"""
+
+    if settings.SESSION_BACKEND == "memory":
+        return MemorySessionBackend(settings.SESSION_MEMORY_MAX_ENTRIES)
+    if settings.SESSION_BACKEND == "sqlite":
+        return SqliteSessionBackend(settings.SESSION_STORE_PATH)
+    return None
@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+"""多個 uvicorn worker 共用通訊錄快照。
+
+取得檔案鎖的 worker 為唯一的同步者（leader），依固定間隔向資料來源同步，
+將員工資料與預先序列化的回應寫入新的資料檔，再遞增記憶體映射控制檔中的版本號；
+其他 worker（follower）輪詢版本號，變更時以 mmap 映射新資料檔，回應內容直接引用映射記憶體。
+leader 結束後檔案鎖隨之釋放，由下一個取得鎖的 worker 接手同步。
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Iterable
+
+from fastapi import HTTPException, status
+
+from directory_cache import REFRESH_RETRY_SECONDS, DirectoryLoad, DirectoryLoader, DirectorySnapshot
+from models import EmployeePublic
+from response_cache import RenderedBody
+from snapshot_store import STORED_EMPLOYEE_FIELDS, decode_employees, encode_employees
+
+if TYPE_CHECKING:
+    from directory_cache import DirectoryCache
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+LOGGER = logging.getLogger(__name__)
+
+DATA_MAGIC = b"CTSNAP01"
+CONTROL_MAGIC = b"CTCTL001"
+# 資料檔開頭：magic、標頭 JSON 長度；之後依序為標頭 JSON 與各區段內容
+DATA_HEADER = struct.Struct("<8sI")
+# 控制檔：magic、目前版本號（8 位元組對齊，單次寫入）
+CONTROL = struct.Struct("<8sQ")
+# 保留最近幾個版本的資料檔，讓仍映射舊版本的 worker 可完成進行中的請求
+KEEP_DATA_FILES = 3
+# 首次等待 leader 發布快照的上限秒數
+FIRST_SNAPSHOT_WAIT_SECONDS = 120.0
+
+BodyKey = tuple[Any, ...]
+BodiesListener = Callable[[int, dict[Hashable, RenderedBody]], None]
+
+
+def _body_key(value: list[Any]) -> BodyKey:
+    # JSON 將 key 中的 tuple（例如 fields）存為陣列，讀回時還原以便作為字典鍵
+    return tuple(_body_key(item) if isinstance(item, list) else item for item in value)
+
+
+@dataclass(frozen=True)
+class SharedSnapshot:
+    """由資料檔映射而來的快照；bodies 內容為指向映射記憶體的 memoryview。"""
+
+    version: int
+    source: str
+    published_at: float
+    employees: list[EmployeePublic]
+    bodies: dict[Hashable, RenderedBody]
+
+
+def _try_lock(fd: int) -> bool:
+    """以非阻塞方式取得整個行程期間持有的排他鎖。"""
+
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:  # pragma: no cover - Windows
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class SharedSnapshotCoordinator:
+    """協調 leader 選舉、快照發布與 follower 的版本追蹤。"""
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        source_load: DirectoryLoader,
+        refresh_interval_seconds: float,
+        poll_seconds: float = 1.0,
+        on_bodies: BodiesListener | None = None,
+    ) -> None:
+        self._directory = Path(directory)
+        self._source_load = source_load
+        self._refresh_interval_seconds = refresh_interval_seconds
+        self._poll_seconds = poll_seconds
+        self._on_bodies = on_bodies
+        self._lock_fd: int | None = None
+        self._control: mmap.mmap | None = None
+        self._control_writable = False
+        self._mapped: mmap.mmap | None = None
+        self._published_at = 0.0
+        self._next_refresh_at = 0.0
+        self._cache: DirectoryCache | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None
+
+    def _data_path(self, version: int) -> Path:
+        return self._directory / f"snapshot-{version:012d}.bin"
+
+    # ---- leader 選舉 ----
+
+    def try_become_leader(self) -> bool:
+        """嘗試取得 leader 檔案鎖；已是 leader 時直接回傳 True。"""
+
+        if self._lock_fd is not None:
+            return True
+        self._directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._directory / "leader.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        if not _try_lock(fd):
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        LOGGER.info("Worker %s elected as shared directory snapshot refresher", os.getpid())
+        return True
+
+    # ---- 控制檔 ----
+
+    def _control_map(self, writable: bool) -> mmap.mmap | None:
+        if self._control is not None and (not writable or self._control_writable):
+            return self._control
+        path = self._directory / "current"
+        try:
+            if writable:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if os.fstat(fd).st_size < CONTROL.size:
+                        os.ftruncate(fd, CONTROL.size)
+                    control = mmap.mmap(fd, CONTROL.size, access=mmap.ACCESS_WRITE)
+                finally:
+                    os.close(fd)
+            else:
+                with open(path, "rb") as file:
+                    control = mmap.mmap(file.fileno(), CONTROL.size, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        if self._control is not None:
+            self._control.close()
+        self._control = control
+        self._control_writable = writable
+        return control
+
+    def current_version(self) -> int:
+        """目前已發布的版本號，尚未發布時為 0；只讀取映射記憶體，不需系統呼叫。"""
+
+        control = self._control_map(writable=False)
+        if control is None:
+            return 0
+        magic, version = CONTROL.unpack_from(control, 0)
+        return version if magic == CONTROL_MAGIC else 0
+
+    # ---- 發布與讀取 ----
+
+    def publish(self, snapshot: DirectorySnapshot, bodies: dict[Hashable, RenderedBody]) -> None:
+        """寫入新版本資料檔並更新控制檔版本號（同步 I/O，請於執行緒中呼叫）。"""
+
+        started = time.perf_counter()
+        sections: list[bytes] = []
+        offset = 0
+
+        def add(chunk: bytes | memoryview | None) -> list[int] | None:
+            nonlocal offset
+            if chunk is None:
+                return None
+            sections.append(bytes(chunk))
+            location = [offset, len(chunk)]
+            offset += len(chunk)
+            return location
+
+        published_at = time.time()
+        header = {
+            "version": snapshot.version,
+            "source": snapshot.source,
+            "published_at": published_at,
+            "fields": STORED_EMPLOYEE_FIELDS,
+            "employees": add(encode_employees(snapshot.employees)),
+            "bodies": [
+                {
+                    "key": list(key),  # type: ignore[arg-type]
+                    "etag": body.etag,
+                    "identity": add(body.identity),
+                    "gzip": add(body.gzip),
+                    "br": add(body.br),
+                }
+                for key, body in bodies.items()
+            ],
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+        path = self._data_path(snapshot.version)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "wb") as file:
+            file.write(DATA_HEADER.pack(DATA_MAGIC, len(header_bytes)))
+            file.write(header_bytes)
+            for chunk in sections:
+                file.write(chunk)
+        os.replace(temp_path, path)
+
+        control = self._control_map(writable=True)
+        if control is not None:
+            CONTROL.pack_into(control, 0, CONTROL_MAGIC, snapshot.version)
+        self._published_at = published_at
+        self._remove_old_files(snapshot.version)
+        LOGGER.info(
+            "Shared directory snapshot v%s published (%s bytes, %.0f ms)",
+            snapshot.version,
+            DATA_HEADER.size + len(header_bytes) + offset,
+            (time.perf_counter() - started) * 1000,
+        )
+
+    def _remove_old_files(self, current: int) -> None:
+        paths = sorted(self._directory.glob("snapshot-*.bin"))
+        for path in paths[:-KEEP_DATA_FILES]:
+            if path != self._data_path(current):
+                try:
+                    path.unlink()
+                except OSError:
+                    # Windows 上仍被映射的檔案無法刪除，留待下次清理
+                    pass
+
+    def read_current(self) -> SharedSnapshot | None:
+        """映射目前版本的資料檔（同步 I/O，請於執行緒中呼叫）；尚未發布或檔案已被替換時回傳 None。"""
+
+        version = self.current_version()
+        if not version:
+            return None
+        try:
+            with open(self._data_path(version), "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        magic, header_length = DATA_HEADER.unpack_from(mapped, 0)
+        if magic != DATA_MAGIC:
+            LOGGER.warning("Shared directory snapshot v%s has unexpected format", version)
+            return None
+        base = DATA_HEADER.size + header_length
+        header = json.loads(mapped[DATA_HEADER.size : base])
+        view = memoryview(mapped)
+
+        def section(location: list[int] | None) -> memoryview | None:
+            if location is None:
+                return None
+            start = base + location[0]
+            return view[start : start + location[1]]
+
+        employees = decode_employees(header["fields"], section(header["employees"]))  # type: ignore[arg-type]
+        bodies: dict[Hashable, RenderedBody] = {
+            _body_key(item["key"]): RenderedBody(
+                identity=section(item["identity"]),  # type: ignore[arg-type]
+                gzip=section(item["gzip"]),
+                br=section(item["br"]),
+                etag=item["etag"],
+            )
+            for item in header["bodies"]
+        }
+        # 舊映射仍可能被進行中的回應引用，交由參照計數自然釋放
+        self._mapped = mapped
+        self._published_at = header["published_at"]
+        return SharedSnapshot(
+            version=header["version"],
+            source=header["source"],
+            published_at=header["published_at"],
+            employees=employees,
+            bodies=bodies,
+        )
+
+    # ---- DirectoryCache 整合 ----
+
+    async def load(self) -> DirectoryLoad:
+        """DirectoryCache 的載入函式：leader 向資料來源同步，follower 讀取已發布的共用快照。"""
+
+        deadline = time.monotonic() + FIRST_SNAPSHOT_WAIT_SECONDS
+        while True:
+            if self.is_leader:
+                return await self._source_load()
+            shared = await asyncio.to_thread(self.read_current)
+            if shared is not None:
+                if self._on_bodies is not None:
+                    self._on_bodies(shared.version, shared.bodies)
+                return DirectoryLoad(employees=shared.employees, source=shared.source, version=shared.version)
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Shared directory snapshot not yet published",
+                )
+            # 等待期間 leader 可能已結束，由本 worker 接手
+            self.try_become_leader()
+            await asyncio.sleep(self._poll_seconds)
+
+    async def start(self, cache: DirectoryCache) -> None:
+        """開始協調：先沿用已發布的共用快照暖機，之後於背景執行 leader 同步或 follower 輪詢。"""
+
+        self._cache = cache
+        self.try_become_leader()
+        if self.current_version():
+            shared = await asyncio.to_thread(self.read_current)
+            if shared is not None:
+                if self._on_bodies is not None:
+                    self._on_bodies(shared.version, shared.bodies)
+                cache.seed(shared.employees, shared.version, source=shared.source)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                LOGGER.error("Shared directory snapshot coordination failed: %s", exc)
+            await asyncio.sleep(self._poll_seconds)
+
+    async def _tick(self) -> None:
+        cache = self._cache
+        if cache is None:
+            return
+        if self.try_become_leader():
+            # 同步時間由 leader 自行排程，與哪個 worker 收到請求無關
+            if time.time() < max(self._next_refresh_at, self._published_at + self._refresh_interval_seconds):
+                return
+            try:
+                await cache.refresh()
+                self._next_refresh_at = time.time() + self._refresh_interval_seconds
+            except Exception:
+                self._next_refresh_at = time.time() + min(REFRESH_RETRY_SECONDS, self._refresh_interval_seconds)
+                raise
+            return
+        snapshot = cache.snapshot
+        version = self.current_version()
+        if version and (snapshot is None or snapshot.version != version):
+            await cache.refresh()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "role": "leader" if self.is_leader else "follower",
+            "published_version": self.current_version() or None,
+            "published_age_seconds": round(time.time() - self._published_at, 1) if self._published_at else None,
+        }
+
+
+def snapshot_bodies(keys: Iterable[BodyKey], render: Callable[[BodyKey], bytes]) -> dict[Hashable, RenderedBody]:
+    """為 leader 發布預先序列化並壓縮指定 key 的回應內容。"""
+
+    return {key: RenderedBody.render(render(key)) for key in keys}
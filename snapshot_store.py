@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+"""將最新的通訊錄快照保存於本機 SQLite 檔，供重新啟動時快速暖機與 Graph 中斷時備援。"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from metrics import timed
+from models import EmployeePublic, employees_from_records
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+# 保存全部模型欄位（含 manager_id 等不對外輸出的內部欄位），與 wire_format 的公開欄位不同
+STORED_EMPLOYEE_FIELDS = list(EmployeePublic.model_fields)
+
+
+def encode_employees(employees: list[EmployeePublic]) -> bytes:
+    """將員工資料編碼為欄位陣列 JSON 並以 zlib 壓縮；欄位順序同 STORED_EMPLOYEE_FIELDS。"""
+
+    rows = [[getattr(employee, field) for field in STORED_EMPLOYEE_FIELDS] for employee in employees]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_employees(fields: list[str], payload: bytes | memoryview) -> list[EmployeePublic]:
+    """還原 encode_employees 的結果；只保留目前模型仍存在的欄位，欄位增減後舊資料仍可讀。"""
+
+    rows = json.loads(zlib.decompress(payload))
+    known = [(position, name) for position, name in enumerate(fields) if name in EmployeePublic.model_fields]
+    return employees_from_records({name: values[position] for position, name in known} for values in rows)
+
+
+@dataclass(frozen=True)
+class StoredSnapshot:
+    """由磁碟載入的快照內容。"""
+
+    version: int
+    source: str
+    saved_at: datetime
+    employees: list[EmployeePublic]
+
+
+class SnapshotStore:
+    """單檔 SQLite 快照；員工資料以欄位陣列 JSON 壓縮後存成單一 BLOB，載入只需一次讀取。
+
+    寫入時先寫暫存檔再以 os.replace 原子替換，避免讀到寫一半的檔案。
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._path = Path(path)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @timed("snapshot_save")
+    def save(self, version: int, source: str, employees: list[EmployeePublic]) -> None:
+        """原子性寫入快照（同步 I/O，請於執行緒中呼叫）。"""
+
+        started = time.perf_counter()
+        payload = encode_employees(employees)
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        temp_path.unlink(missing_ok=True)
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.execute(
+                "CREATE TABLE snapshot (schema_version INTEGER, version INTEGER, source TEXT, "
+                "saved_at TEXT, fields TEXT, employees BLOB)"
+            )
+            connection.execute(
+                "INSERT INTO snapshot VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    SCHEMA_VERSION,
+                    version,
+                    source,
+                    datetime.now(timezone.utc).isoformat(),
+                    json.dumps(STORED_EMPLOYEE_FIELDS),
+                    payload,
+                ),
+            )
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temp_path, self._path)
+        LOGGER.info(
+            "Directory snapshot v%s saved to %s (%s employees, %s bytes, %.0f ms)",
+            version,
+            self._path,
+            len(employees),
+            len(payload),
+            (time.perf_counter() - started) * 1000,
+        )
+
+    @timed("snapshot_load")
+    def load(self) -> StoredSnapshot | None:
+        """讀取快照；檔案不存在或格式不符時回傳 None（同步 I/O，請於執行緒中呼叫）。"""
+
+        if not self._path.exists():
+            return None
+        started = time.perf_counter()
+        try:
+            connection = sqlite3.connect(f"file:{self._path}?mode=ro", uri=True)
+            try:
+                row = connection.execute(
+                    "SELECT schema_version, version, source, saved_at, fields, employees FROM snapshot"
+                ).fetchone()
+            finally:
+                connection.close()
+        except sqlite3.Error as exc:
+            LOGGER.warning("Directory snapshot at %s unreadable: %s", self._path, exc)
+            return None
+        if row is None or row[0] != SCHEMA_VERSION:
+            return None
+
+        _, version, source, saved_at, fields_json, payload = row
+        employees = decode_employees(json.loads(fields_json), payload)
+        LOGGER.info(
+            "Directory snapshot v%s loaded from %s (%s employees, %.0f ms)",
+            version,
+            self._path,
+            len(employees),
+            (time.perf_counter() - started) * 1000,
+        )
+        return StoredSnapshot(
+            version=version,
+            source=source,
+            saved_at=datetime.fromisoformat(saved_at),
+            employees=employees,
+        )
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+"""以 SQL Server（或本機 SQLite）的 addresslist 階層表作為通訊錄資料來源。"""
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.engine import URL, make_url
+
+from config import Settings
+from directory_cache import DirectoryLoad
+from models import EmployeePublic, employees_from_address_rows
+
+LOGGER = logging.getLogger(__name__)
+
+# 防止資料中的循環參照造成無窮遞迴；SQL Server 預設 MAXRECURSION 為 100
+MAX_HIERARCHY_DEPTH = 32
+
+# 一次以遞迴 CTE 取回整個階層：根節點（parent 為 NULL）為公司、第一層為校區，
+# 第二層以下沒有子節點的列視為人員，其上層單位即為部門。
+# 語法同時相容 SQL Server 與 SQLite（SQLite 的 RECURSIVE 關鍵字可省略）。
+HIERARCHY_QUERY = text(
+    """
+    WITH hierarchy (name, parent, mail, depth, campus) AS (
+        SELECT a.name, a.parent, a.mail, 0, CAST(NULL AS NVARCHAR(255))
+        FROM addresslist AS a
+        WHERE a.parent IS NULL
+        UNION ALL
+        SELECT c.name, c.parent, c.mail, h.depth + 1,
+               CAST(CASE WHEN h.depth = 0 THEN c.name ELSE h.campus END AS NVARCHAR(255))
+        FROM addresslist AS c
+        JOIN hierarchy AS h ON c.parent = h.name
+        WHERE h.depth < :max_depth
+    )
+    SELECT h.name, h.parent, h.mail, h.campus
+    FROM hierarchy AS h
+    WHERE h.depth >= 2
+      AND NOT EXISTS (SELECT 1 FROM addresslist AS c WHERE c.parent = h.name)
+    ORDER BY h.campus, h.parent, h.name
+    """
+)
+
+
+def create_directory_engine(settings: Settings) -> Engine:
+    """依設定建立具連線池的 Engine；DB_URL 優先，否則以 DB_* 組出 SQL Server 連線。"""
+
+    if settings.DB_URL:
+        url = make_url(settings.DB_URL)
+    else:
+        url = URL.create(
+            "mssql+pymssql",
+            username=settings.DB_USERNAME or None,
+            password=settings.DB_PASSWORD or None,
+            host=settings.DB_SERVER or None,
+            database=settings.DB_NAME or None,
+        )
+
+    options: dict[str, Any] = {"pool_pre_ping": True, "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS}
+    if url.get_backend_name() != "sqlite":
+        options.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_POOL_MAX_OVERFLOW)
+    return create_engine(url, **options)
+
+
+class SqlDirectorySource:
+    """以單一階層查詢載入在職人員，再交由既有流程組成公司 → 校區 → 部門 → 人員樹。
+
+    SQLAlchemy 同步 Engine 的查詢於執行緒中進行，不阻塞事件迴圈；連線由連線池重複使用。
+    """
+
+    name = "sql"
+
+    def __init__(self, engine: Engine) -> None:
+        self._engine = engine
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "SqlDirectorySource":
+        return cls(create_directory_engine(settings))
+
+    def _fetch_rows(self) -> list[dict[str, Any]]:
+        with self._engine.connect() as connection:
+            result = connection.execute(HIERARCHY_QUERY, {"max_depth": MAX_HIERARCHY_DEPTH})
+            return [dict(row) for row in result.mappings()]
+
+    def _fetch_employees(self) -> list[EmployeePublic]:
+        return employees_from_address_rows(self._fetch_rows())
+
+    async def load(self) -> DirectoryLoad:
+        started = time.perf_counter()
+        employees = await asyncio.to_thread(self._fetch_employees)
+        LOGGER.info(
+            "Loaded %s employees from %s in %.0f ms",
+            len(employees),
+            self._engine.url.render_as_string(hide_password=True),
+            (time.perf_counter() - started) * 1000,
+        )
+        return DirectoryLoad(employees=employees, source=self.name)
+
+    def _ping(self) -> None:
+        with self._engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    async def check_health(self) -> dict[str, str]:
+        """以 SELECT 1 驗證資料庫連線。"""
+
+        try:
+            await asyncio.to_thread(self._ping)
+            return {"database": "ok"}
+        except Exception as exc:
+            LOGGER.error("Database health failed: %s", exc)
+            return {"database": f"failed: {type(exc).__name__}"}
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._engine.dispose)
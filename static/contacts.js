@@ -0,0 +1,114 @@
+// 保留樹狀節點快取，方便依 key 取得員工資料
+const state = {
+  employeeMap: new Map(),
+  activeKey: null,
+};
+
+// 建立單一節點的 <li>
+function createNodeElement(node) {
+  const li = document.createElement('li');
+  const label = document.createElement('div');
+  label.textContent = node.label;
+  label.className = `node-label ${node.node_type}`;
+
+  if (node.node_type === 'employee') {
+    label.dataset.key = node.key;
+    label.addEventListener('click', () => {
+      highlightEmployee(node.key);
+      showEmployeeDetail(node);
+    });
+    state.employeeMap.set(node.key, node);
+  }
+
+  li.appendChild(label);
+
+  if (node.children && node.children.length > 0) {
+    const ul = document.createElement('ul');
+    ul.className = 'tree';
+    node.children.forEach((child) => ul.appendChild(createNodeElement(child)));
+    li.appendChild(ul);
+  }
+
+  return li;
+}
+
+// 渲染整棵樹
+function renderTree(data) {
+  const root = document.getElementById('tree-root');
+  root.innerHTML = '';
+  state.employeeMap.clear();
+
+  (data || []).forEach((node) => {
+    // 只展示公司節點的子節點
+    if (node.node_type === 'company') {
+      (node.children || []).forEach((child) => root.appendChild(createNodeElement(child)));
+    } else {
+      root.appendChild(createNodeElement(node));
+    }
+  });
+}
+
+// 高亮當前選取的員工
+function highlightEmployee(key) {
+  if (state.activeKey) {
+    document.querySelectorAll(`[data-key="${state.activeKey}"]`).forEach((el) => el.classList.remove('active'));
+  }
+  document.querySelectorAll(`[data-key="${key}"]`).forEach((el) => el.classList.add('active'));
+  state.activeKey = key;
+}
+
+// 顯示員工詳細資訊
+function showEmployeeDetail(node) {
+  if (!node || node.node_type !== 'employee') return;
+  const data = node.data || {};
+  const panel = document.getElementById('detail-panel');
+  const placeholder = document.getElementById('detail-placeholder');
+  if (placeholder) placeholder.remove();
+
+  const phone = data.phone_no ? `${data.phone_no}${data.ext ? ` #${data.ext}` : ''}` : '-';
+  const mobile = data.mobile_phone || '-';
+  const dept = data.dept_name || '-';
+  const title = data.title || data.job || '-';
+  const campus = data.campus || '-';
+
+  panel.innerHTML = `
+    <h2>${data.name || node.label}</h2>
+    <div class="muted">${[dept !== '-' ? dept : null, title !== '-' ? title : null, campus !== '-' ? campus : null].filter(Boolean).join(' ｜ ') || '-'}</div>
+    <div class="detail-row"><strong>部門</strong><span>${dept}</span></div>
+    <div class="detail-row"><strong>職稱</strong><span>${title}</span></div>
+    <div class="detail-row"><strong>校區/組織</strong><span>${campus}</span></div>
+    <div class="detail-row"><strong>Email</strong>${data.email ? `<a href="mailto:${data.email}">${data.email}</a>` : '<span class="muted">無資料</span>'}</div>
+    <div class="detail-row"><strong>分機</strong><span>${phone}</span></div>
+    <div class="detail-row"><strong>手機</strong><span>${mobile}</span></div>
+  `;
+}
+
+// 顯示錯誤訊息（繁體中文）
+function showError(message, detail) {
+  const errorEl = document.getElementById('error');
+  errorEl.textContent = message;
+  errorEl.style.display = 'block';
+  if (detail) console.error(detail);
+}
+
+// 初始化：向後端取得樹狀資料
+async function init() {
+  const statusEl = document.getElementById('status');
+  statusEl.textContent = '正在向伺服器讀取通訊錄...';
+  try {
+    // 只取詳細面板用到的欄位，與後端 CONTACTS_PAGE_FIELDS 一致
+    const resp = await fetch('/contacts/tree?fields=name,email,campus,dept_name,title,job,phone_no,mobile_phone,ext');
+    if (!resp.ok) {
+      const errText = await resp.text();
+      throw new Error(`載入失敗 (${resp.status}): ${errText}`);
+    }
+    const data = await resp.json();
+    renderTree(data);
+    statusEl.textContent = '資料載入完成';
+  } catch (err) {
+    statusEl.textContent = '讀取失敗';
+    showError('無法載入通訊錄資料，請稍後再試或聯絡系統管理員。', err);
+  }
+}
+
+document.addEventListener('DOMContentLoaded', init);
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+"""靜態資源處理：啟動時計算內容雜湊、預先壓縮，並改寫 HTML 引用為帶雜湊的網址。
+
+帶雜湊的網址內容永不改變，可設為 immutable 長期快取；原始檔名與 HTML 入口則以 ETag 驗證，
+Outlook 工作窗格重新開啟時只需一次 304 即可沿用快取中的 CSS 與 JS。
+"""
+
+import logging
+import mimetypes
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import Request, Response
+
+from response_cache import RenderedBody, rendered_response
+
+LOGGER = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+FINGERPRINT_LENGTH = 10
+# 只在啟動時壓縮一次，使用最高壓縮等級
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+COMPRESSIBLE_TYPES = frozenset({"application/javascript", "application/json", "application/xml", "image/svg+xml"})
+# HTML 中 src/href 指向 /static/ 的引用
+STATIC_REFERENCE = re.compile(r"""(?P<attr>\b(?:src|href)\s*=\s*["'])(?:\./|/)?static/(?P<name>[^"'?#]+)""")
+
+mimetypes.add_type("text/javascript", ".js")
+
+
+@dataclass(frozen=True)
+class StaticAsset:
+    """單一靜態檔的預先處理結果。"""
+
+    name: str
+    url: str
+    media_type: str
+    body: RenderedBody
+
+
+def _fingerprinted_name(name: str, etag: str) -> str:
+    path = Path(name)
+    return str(path.with_name(f"{path.stem}.{etag[:FINGERPRINT_LENGTH]}{path.suffix}").as_posix())
+
+
+def _is_compressible(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+class StaticAssets:
+    """static 目錄的記憶體內資源表；檔案皆很小，於啟動時全部載入。"""
+
+    def __init__(self, directory: str | Path, prefix: str = "/static") -> None:
+        self._directory = Path(directory)
+        self._prefix = prefix.rstrip("/")
+        self._assets: dict[str, StaticAsset] = {}
+        self._fingerprinted: dict[str, StaticAsset] = {}
+        self._built = False
+
+    def build(self) -> None:
+        """讀取並處理所有靜態檔：先處理非 HTML 檔取得雜湊網址，再改寫 HTML 的引用。"""
+
+        started = time.perf_counter()
+        assets: dict[str, StaticAsset] = {}
+        files = sorted(path for path in self._directory.rglob("*") if path.is_file())
+        pages = [path for path in files if path.suffix == ".html"]
+        for path in (*[path for path in files if path.suffix != ".html"], *pages):
+            name = path.relative_to(self._directory).as_posix()
+            payload = path.read_bytes()
+            if path.suffix == ".html":
+                payload = self._rewrite_references(payload.decode("utf-8"), assets).encode("utf-8")
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            body = RenderedBody.render(
+                payload,
+                compress=_is_compressible(media_type),
+                gzip_level=GZIP_LEVEL,
+                br_quality=BROTLI_QUALITY,
+            )
+            fingerprinted = _fingerprinted_name(name, body.etag)
+            assets[name] = StaticAsset(name, f"{self._prefix}/{fingerprinted}", media_type, body)
+
+        self._assets = assets
+        self._fingerprinted = {asset.url[len(self._prefix) + 1 :]: asset for asset in assets.values()}
+        self._built = True
+        LOGGER.info(
+            "Static assets prepared: %s files, %s bytes raw, %s bytes br (%.0f ms)",
+            len(assets),
+            sum(len(asset.body.identity) for asset in assets.values()),
+            sum(len(asset.body.br or asset.body.identity) for asset in assets.values()),
+            (time.perf_counter() - started) * 1000,
+        )
+
+    def _rewrite_references(self, html: str, assets: dict[str, StaticAsset]) -> str:
+        def replace(match: re.Match[str]) -> str:
+            asset = assets.get(match.group("name"))
+            if asset is None:
+                return match.group(0)
+            return f"{match.group('attr')}{asset.url}"
+
+        return STATIC_REFERENCE.sub(replace, html)
+
+    def url_for(self, name: str) -> str:
+        """取得靜態檔的帶雜湊網址；不存在時回傳原始網址。"""
+
+        self._ensure_built()
+        asset = self._assets.get(name)
+        return asset.url if asset is not None else f"{self._prefix}/{name}"
+
+    def response(self, request: Request, name: str) -> Response | None:
+        """依 Accept-Encoding 回傳預先壓縮的版本；帶雜湊的網址設為 immutable，找不到時回傳 None。"""
+
+        self._ensure_built()
+        asset = self._fingerprinted.get(name)
+        if asset is not None:
+            return rendered_response(request, asset.body, asset.media_type, IMMUTABLE_CACHE_CONTROL)
+        asset = self._assets.get(name)
+        if asset is not None:
+            return rendered_response(request, asset.body, asset.media_type, REVALIDATE_CACHE_CONTROL)
+        return None
+
+    def _ensure_built(self) -> None:
+        # 未經 lifespan 啟動時（例如測試腳本）於第一次使用時處理
+        if not self._built:
+            self.build()
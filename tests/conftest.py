@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+"""測試共用設定：以假租戶設定載入模組，並可匯入 benchmarks 中的 Graph 模擬器。"""
+
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+# get_settings() 會快取第一次讀到的設定，需於匯入任何專案模組前設定
+os.environ.setdefault("AZURE_CLIENT_ID", "test-client")
+os.environ.setdefault("AZURE_CLIENT_SECRET", "test-secret")
+os.environ.setdefault("AZURE_TENANT_ID", "test-tenant")
+os.environ.setdefault("COMPANY_ID", "KH")
+os.environ.setdefault("GRAPH_CRAWL_PARTITIONS", "4")
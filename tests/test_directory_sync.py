@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+"""以 FakeGraph 驗證 GraphDeltaSync 的完整同步、增量套用與 delta token 失效後的重新同步。"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import pytest
+
+import graph_service
+from directory_cache import DirectoryLoad
+from directory_sync import GraphDeltaSync
+from fake_graph import FakeGraph
+from models import EmployeePublic, TreeNode, build_tree_from_employees
+
+
+def _user(number: int, **fields: Any) -> dict[str, Any]:
+    user: dict[str, Any] = {
+        "id": f"user-{number}",
+        "displayName": f"員工{number}",
+        "mail": f"user{number}@example.com",
+        "userPrincipalName": f"user{number}@example.com",
+        "department": "資訊中心",
+        "jobTitle": "工程師",
+        "officeLocation": None,
+        "companyName": "總公司",
+        "accountEnabled": True,
+        "mobilePhone": None,
+        "businessPhones": [],
+    }
+    user.update(fields)
+    return user
+
+
+def _run(graph: FakeGraph, scenario: Callable[[GraphDeltaSync], Awaitable[None]]) -> None:
+    async def main() -> None:
+        await graph_service.open_graph_client(graph.transport())
+        try:
+            await scenario(GraphDeltaSync())
+        finally:
+            await graph_service.close_graph_client()
+
+    asyncio.run(main())
+
+
+def _by_id(load: DirectoryLoad) -> dict[str, EmployeePublic]:
+    return {employee.employee_id: employee for employee in load.employees}
+
+
+def _tree_json(tree: list[TreeNode] | None) -> list[dict[str, Any]]:
+    # 修補時新節點附加於同層末端，順序可能與重新建立不同，比對前依 key 排序
+    def normalize(node: TreeNode) -> dict[str, Any]:
+        item = node.model_dump(exclude={"children"})
+        item["children"] = sorted((normalize(child) for child in node.children), key=lambda child: child["key"])
+        return item
+
+    return [normalize(node) for node in tree or []]
+
+
+def _assert_tree_matches(load: DirectoryLoad) -> None:
+    # 增量修補的樹必須與由同一批員工重新建立的樹內容相同
+    assert _tree_json(load.tree) == _tree_json(build_tree_from_employees(load.employees))
+
+
+def _change_ids(load: DirectoryLoad) -> list[tuple[str | None, str | None]]:
+    assert load.changes is not None
+    return [
+        (old.employee_id if old else None, new.employee_id if new else None) for old, new in load.changes
+    ]
+
+
+@pytest.fixture
+def graph() -> FakeGraph:
+    return FakeGraph(
+        [
+            _user(1),
+            _user(2, department="教務處"),
+            _user(3, accountEnabled=False),
+            _user(4, companyName="青山校區", department="教務處"),
+        ],
+        page_size=2,
+    )
+
+
+def test_full_sync_keeps_only_enabled_users(graph: FakeGraph) -> None:
+    async def scenario(sync: GraphDeltaSync) -> None:
+        load = await sync.sync()
+        assert set(_by_id(load)) == {"user-1", "user-2", "user-4"}
+        assert load.changes is None
+        assert sync.delta_link is not None
+        _assert_tree_matches(load)
+
+    _run(graph, scenario)
+
+
+def test_delta_applies_adds_partial_updates_and_removals(graph: FakeGraph) -> None:
+    async def scenario(sync: GraphDeltaSync) -> None:
+        await sync.sync()
+
+        graph.queue_change(_user(5, companyName="青山校區", department="學務處"))
+        # delta 只帶變更欄位，其餘欄位需沿用先前保存的使用者資料
+        graph.queue_change({"id": "user-1", "jobTitle": "主任"})
+        graph.queue_change({"id": "user-2", "@removed": {"reason": "deleted"}})
+        load = await sync.sync()
+
+        employees = _by_id(load)
+        assert set(employees) == {"user-1", "user-4", "user-5"}
+        assert employees["user-1"].title == "主任"
+        assert employees["user-1"].name == "員工1"
+        assert employees["user-1"].email == "user1@example.com"
+        assert employees["user-1"].dept_name == "資訊中心"
+        assert employees["user-5"].campus == "青山校區"
+        assert sorted(_change_ids(load), key=str) == sorted(
+            [("user-1", "user-1"), ("user-2", None), (None, "user-5")], key=str
+        )
+        _assert_tree_matches(load)
+
+    _run(graph, scenario)
+
+
+def test_delta_account_enabled_toggles_membership(graph: FakeGraph) -> None:
+    async def scenario(sync: GraphDeltaSync) -> None:
+        await sync.sync()
+
+        graph.queue_change({"id": "user-1", "accountEnabled": False})
+        graph.queue_change({"id": "user-3", "accountEnabled": True})
+        load = await sync.sync()
+
+        employees = _by_id(load)
+        assert set(employees) == {"user-2", "user-3", "user-4"}
+        # 重新啟用的帳號需以完整同步時保存的資料建立員工
+        assert employees["user-3"].name == "員工3"
+        assert sorted(_change_ids(load), key=str) == sorted([("user-1", None), (None, "user-3")], key=str)
+        _assert_tree_matches(load)
+
+        graph.queue_change({"id": "user-1", "accountEnabled": True})
+        load = await sync.sync()
+        assert "user-1" in _by_id(load)
+        assert _change_ids(load) == [(None, "user-1")]
+        _assert_tree_matches(load)
+
+    _run(graph, scenario)
+
+
+def test_delta_without_changes_keeps_tree(graph: FakeGraph) -> None:
+    async def scenario(sync: GraphDeltaSync) -> None:
+        first = await sync.sync()
+        load = await sync.sync()
+        assert load.changes == []
+        assert load.tree is first.tree
+
+    _run(graph, scenario)
+
+
+def test_expired_delta_token_triggers_full_resync(graph: FakeGraph) -> None:
+    async def scenario(sync: GraphDeltaSync) -> None:
+        await sync.sync()
+        stale_link = sync.delta_link
+
+        graph.expire_delta_tokens()
+        # token 失效期間的變更只會出現在重新完整抓取的 /users 結果中
+        graph.users["user-2"]["jobTitle"] = "組長"
+        graph.users["user-6"] = _user(6)
+        graph.queue_change({"id": "user-4", "@removed": {"reason": "deleted"}})
+        load = await sync.sync()
+
+        employees = _by_id(load)
+        assert set(employees) == {"user-1", "user-2", "user-6"}
+        assert employees["user-2"].title == "組長"
+        # 完整同步沒有可銜接的變更清單，由快取自行比對差異
+        assert load.changes is None
+        assert sync.delta_link not in (None, stale_link)
+        _assert_tree_matches(load)
+
+        graph.queue_change({"id": "user-6", "displayName": "新名字"})
+        load = await sync.sync()
+        assert _by_id(load)["user-6"].name == "新名字"
+        assert _change_ids(load) == [("user-6", "user-6")]
+
+    _run(graph, scenario)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+"""驗證伺服器端 Session 必須經 load_session 載入，以及後端尚未建立時 middleware 直接放行。"""
+
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, Request
+
+from session_store import LazySession, MemorySessionBackend, ServerSessionMiddleware, SessionBackend, load_session
+
+
+def _app(backend: SessionBackend | None) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ServerSessionMiddleware, get_backend=lambda: backend)
+
+    @app.get("/login", dependencies=[Depends(load_session)])
+    async def login(request: Request) -> dict[str, Any]:
+        request.session["user"] = "alice"
+        return {}
+
+    @app.get("/me", dependencies=[Depends(load_session)])
+    async def me(request: Request) -> dict[str, Any]:
+        return {"user": request.session.get("user")}
+
+    @app.get("/unloaded")
+    async def unloaded(request: Request) -> dict[str, Any]:
+        return {"user": request.session.get("user")}
+
+    @app.get("/plain")
+    async def plain(request: Request) -> dict[str, Any]:
+        return {"has_session": "session" in request.scope}
+
+    return app
+
+
+def _get(app: FastAPI, *paths: str) -> list[httpx.Response]:
+    async def main() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(path) for path in paths]
+
+    return asyncio.run(main())
+
+
+def test_session_round_trip_through_load_session() -> None:
+    backend = MemorySessionBackend(max_entries=10)
+    login, me = _get(_app(backend), "/login", "/me")
+
+    assert "session=" in login.headers["set-cookie"]
+    assert me.json() == {"user": "alice"}
+
+
+def test_access_without_load_session_fails_instead_of_blocking() -> None:
+    backend = MemorySessionBackend(max_entries=10)
+    _, unloaded = _get(_app(backend), "/login", "/unloaded")
+
+    assert unloaded.status_code == 500
+    with pytest.raises(RuntimeError, match="load_session"):
+        LazySession(backend, "some-id").get("user")
+
+
+def test_missing_backend_passes_requests_through() -> None:
+    (plain,) = _get(_app(None), "/plain")
+
+    assert plain.status_code == 200
+    assert plain.json() == {"has_session": False}
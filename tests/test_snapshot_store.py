@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+"""驗證本機快照的保存／載入，以及以磁碟快照暖機後 DirectoryCache 的過期、備援與重試退避。"""
+
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import directory_cache
+from directory_cache import DirectoryCache, DirectoryLoad
+from models import EmployeePublic
+from snapshot_store import STORED_EMPLOYEE_FIELDS, SnapshotStore, decode_employees, encode_employees
+
+
+def _employee(number: int, **fields: str | None) -> EmployeePublic:
+    values: dict[str, str | None] = {
+        "company_id": "KH",
+        "employee_id": f"e{number}",
+        "name": f"員工{number}",
+        "email": f"e{number}@example.com",
+        "campus": "總公司",
+        "dept_id": "資訊中心",
+        "dept_name": "資訊中心",
+        "title": "工程師",
+    }
+    values.update(fields)
+    return EmployeePublic(**values)
+
+
+EMPLOYEES = [_employee(1, manager_id="e2"), _employee(2, ext="123", mobile_phone=None), _employee(3, campus="青山校區")]
+
+
+def test_round_trip_keeps_every_field(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path / "nested" / "snapshot.sqlite3")
+    store.save(7, "graph", EMPLOYEES)
+
+    stored = store.load()
+
+    assert stored is not None
+    assert (stored.version, stored.source) == (7, "graph")
+    assert stored.employees == EMPLOYEES
+    # 內部欄位不對外輸出，但須隨快照保存，重新啟動後才能組出組織圖
+    assert stored.employees[0].manager_id == "e2"
+    assert "manager_id" in STORED_EMPLOYEE_FIELDS
+    assert not list(tmp_path.glob("nested/*.tmp"))
+
+
+def test_save_replaces_previous_snapshot(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path / "snapshot.sqlite3")
+    store.save(1, "graph", EMPLOYEES)
+    store.save(2, "graph", EMPLOYEES[:1])
+
+    stored = store.load()
+
+    assert stored is not None
+    assert stored.version == 2
+    assert stored.employees == EMPLOYEES[:1]
+
+
+def test_load_missing_or_incompatible_file(tmp_path: Path) -> None:
+    assert SnapshotStore(tmp_path / "missing.sqlite3").load() is None
+
+    garbage = tmp_path / "garbage.sqlite3"
+    garbage.write_bytes(b"not a database")
+    assert SnapshotStore(garbage).load() is None
+
+    store = SnapshotStore(tmp_path / "old.sqlite3")
+    store.save(3, "graph", EMPLOYEES)
+    with sqlite3.connect(store.path) as connection:
+        connection.execute("UPDATE snapshot SET schema_version = schema_version + 1")
+    assert store.load() is None
+
+
+def test_decode_tolerates_field_changes() -> None:
+    payload = encode_employees(EMPLOYEES)
+    # 舊版快照可能含已移除的欄位；缺少的欄位則以預設值補上
+    renamed = ["retired_field" if name == "ext" else name for name in STORED_EMPLOYEE_FIELDS]
+
+    employees = decode_employees(renamed, payload)
+
+    assert [employee.employee_id for employee in employees] == ["e1", "e2", "e3"]
+    assert employees[1].ext is None
+    assert employees[0].manager_id == "e2"
+
+
+class _Loader:
+    """可切換成功或失敗的資料來源，並記錄呼叫次數。"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.fail = True
+
+    async def __call__(self) -> DirectoryLoad:
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("graph unavailable")
+        return DirectoryLoad(employees=EMPLOYEES[:2])
+
+
+def test_disk_seed_is_stale_and_survives_outage(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(directory_cache, "REFRESH_RETRY_SECONDS", 0.2)
+    store = SnapshotStore(tmp_path / "snapshot.sqlite3")
+    store.save(7, "graph", EMPLOYEES)
+    stored = store.load()
+    assert stored is not None
+
+    async def scenario() -> None:
+        loader = _Loader()
+        cache = DirectoryCache(loader, ttl_seconds=3600)
+        seeded = cache.seed(stored.employees, version=stored.version)
+
+        assert seeded is not None
+        assert (seeded.version, seeded.source) == (7, "disk")
+        # 磁碟快照不論多新都視為過期，持續嘗試向主來源同步
+        assert cache.is_stale(seeded)
+        assert cache.seed(EMPLOYEES[:1], version=99) is None
+
+        # 來源中斷時仍回傳磁碟快照，並記錄錯誤
+        assert await cache.get_snapshot() is seeded
+        with pytest.raises(RuntimeError):
+            await cache.refresh()
+        assert loader.calls == 1
+        assert cache.stats()["snapshot_last_error"] == "graph unavailable"
+
+        # 退避期間內的請求不再重試
+        for _ in range(3):
+            assert await cache.get_snapshot() is seeded
+            await asyncio.sleep(0)
+        assert loader.calls == 1
+
+        # 退避結束後重試成功，改由主來源提供且版本號延續
+        loader.fail = False
+        await asyncio.sleep(0.25)
+        assert await cache.get_snapshot() is seeded
+        refreshed = await cache.refresh()
+        assert loader.calls == 2
+        assert (refreshed.version, refreshed.source) == (8, "graph")
+        assert not cache.is_stale(refreshed)
+        assert await cache.get_snapshot() is refreshed
+        assert cache.stats()["snapshot_last_error"] is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+"""以暫存 SQLite 資料庫驗證 SqlDirectorySource 的階層查詢、欄位對應與健康檢查。"""
+
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from config import Settings
+from directory_source import create_directory_source
+from models import EmployeePublic, build_tree_from_employees
+from sql_directory import SqlDirectorySource
+
+INIT_SCRIPT = Path(__file__).resolve().parent.parent / "db" / "init_address.sql"
+# SQLite 不支援的 SQL Server 批次指令
+TSQL_ONLY_PREFIXES = ("CREATE DATABASE", "USE ", "GO")
+
+NESTED_ROWS = [
+    ("康軒", None, "info@example.com"),
+    ("總公司", "康軒", "hq@example.com"),
+    ("資訊中心", "總公司", "it@example.com"),
+    ("王小明", "資訊中心", "ming@example.com"),
+    ("陳美玲", "資訊中心", ""),
+    ("網路組", "資訊中心", "net@example.com"),
+    ("林志豪", "網路組", "hao@example.com"),
+    ("青山校區", "康軒", "qs@example.com"),
+    ("教務處", "青山校區", "academic@example.com"),
+    ("張家豪", "教務處", "chang@example.com"),
+    # 第一層沒有子節點的單位是校區而非人員
+    ("籌備處", "康軒", "prep@example.com"),
+    # 不在根節點之下的資料不應被載入
+    ("孤兒", "不存在的單位", "orphan@example.com"),
+]
+
+
+def _load_init_script(path: Path) -> None:
+    lines = INIT_SCRIPT.read_text(encoding="utf-8").splitlines()
+    statements = [line for line in lines if not line.strip().upper().startswith(TSQL_ONLY_PREFIXES)]
+    with sqlite3.connect(path) as connection:
+        connection.executescript("\n".join(statements))
+
+
+def _create_nested(path: Path) -> None:
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE addresslist (name NVARCHAR(255) NOT NULL, parent NVARCHAR(255) NULL, mail NVARCHAR(255) NOT NULL)"
+        )
+        connection.executemany("INSERT INTO addresslist VALUES (?, ?, ?)", NESTED_ROWS)
+
+
+def _source(path: Path) -> SqlDirectorySource:
+    source = create_directory_source(Settings(DIRECTORY_SOURCE="sql", DB_URL=f"sqlite:///{path}"))
+    assert isinstance(source, SqlDirectorySource)
+    return source
+
+
+def _load(source: SqlDirectorySource) -> list[EmployeePublic]:
+    async def main() -> list[EmployeePublic]:
+        try:
+            load = await source.load()
+            assert load.source == "sql"
+            return load.employees
+        finally:
+            await source.close()
+
+    return asyncio.run(main())
+
+
+def _mapping(employees: list[EmployeePublic]) -> set[tuple[str | None, str | None, str, str | None]]:
+    return {(employee.campus, employee.dept_name, employee.name, employee.email) for employee in employees}
+
+
+def test_loads_init_address_script(tmp_path: Path) -> None:
+    path = tmp_path / "address.sqlite3"
+    _load_init_script(path)
+
+    employees = _load(_source(path))
+
+    assert _mapping(employees) == {
+        ("Engineering", "Engineering", "Alice Chen", "alice.chen@example.com"),
+        ("Engineering", "Engineering", "Bob Wu", "bob.wu@example.com"),
+    }
+    assert {employee.employee_id for employee in employees} == {"alice.chen@example.com", "bob.wu@example.com"}
+
+
+def test_maps_campus_department_and_person(tmp_path: Path) -> None:
+    path = tmp_path / "address.sqlite3"
+    _create_nested(path)
+
+    employees = _load(_source(path))
+
+    assert _mapping(employees) == {
+        ("總公司", "資訊中心", "王小明", "ming@example.com"),
+        ("總公司", "資訊中心", "陳美玲", None),
+        ("總公司", "網路組", "林志豪", "hao@example.com"),
+        ("青山校區", "教務處", "張家豪", "chang@example.com"),
+    }
+    # 沒有 mail 時以姓名作為員工編號
+    assert {employee.employee_id for employee in employees} >= {"ming@example.com", "陳美玲"}
+
+    tree = build_tree_from_employees(employees)
+    campuses = {campus.label: {dept.label for dept in campus.children} for campus in tree[0].children}
+    assert campuses == {"總公司": {"資訊中心", "網路組"}, "青山校區": {"教務處"}}
+
+
+def test_check_health(tmp_path: Path) -> None:
+    path = tmp_path / "address.sqlite3"
+    _create_nested(path)
+
+    async def main(source: SqlDirectorySource) -> dict[str, str]:
+        try:
+            return await source.check_health()
+        finally:
+            await source.close()
+
+    assert asyncio.run(main(_source(path))) == {"database": "ok"}
+
+
+def test_check_health_reports_failure(tmp_path: Path) -> None:
+    # 父目錄不存在，SQLite 無法開啟資料庫檔
+    source = _source(tmp_path / "missing" / "address.sqlite3")
+
+    async def main() -> dict[str, str]:
+        try:
+            return await source.check_health()
+        finally:
+            await source.close()
+
+    assert asyncio.run(main())["database"].startswith("failed:")
+
+
+def test_max_depth_stops_recursion(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # 只展開到校區層時不會有任何人員
+    monkeypatch.setattr("sql_directory.MAX_HIERARCHY_DEPTH", 1)
+    path = tmp_path / "address.sqlite3"
+    _create_nested(path)
+
+    assert _load(_source(path)) == []
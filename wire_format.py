@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+"""員工節點的精簡輸出：fields= 欄位投影，以及重複字串字典編碼的 compact 格式（可選 MessagePack）。
+
+compact 文件結構：
+- fields：員工資料列的欄位順序；dictionary：其中以字串表索引編碼的欄位。
+- strings：共用字串表，校區、部門、職稱等重複值只出現一次。
+- node_types：節點類型代碼對照。
+- 節點為陣列 [key, label, 類型代碼, children, 員工資料列, has_children, member_count, descendant_count]，
+  省略結尾的 null；沒有子節點時 children 為 null。
+"""
+
+import json
+from typing import Any, Iterable, Literal, Optional
+
+from fastapi import HTTPException, status
+
+from metrics import timed
+from models import PUBLIC_EMPLOYEE_FIELDS, EmployeePublic, MemberPage, TreeNode, TruncatedTreeNode
+
+try:  # msgpack 為選用套件，未安裝時不提供 format=msgpack
+    import msgpack
+except ImportError:  # pragma: no cover - 依部署環境而定
+    msgpack = None
+
+WireFormat = Literal["json", "compact", "msgpack"]
+
+EMPLOYEE_FIELDS: tuple[str, ...] = PUBLIC_EMPLOYEE_FIELDS
+# 各列相同或彼此重複（例如 dept_id / dept_name、title / job）的欄位，以字串表編碼
+DICTIONARY_FIELDS = frozenset({"company_id", "campus", "dept_id", "dept_name", "title", "job", "status"})
+NODE_TYPES = ("company", "campus", "dept", "employee")
+NODE_TYPE_CODES = {node_type: code for code, node_type in enumerate(NODE_TYPES)}
+NODE_COUNT_FIELDS = ("has_children", "member_count", "descendant_count")
+MEDIA_TYPES: dict[str, str] = {
+    "json": "application/json",
+    "compact": "application/json",
+    "msgpack": "application/msgpack",
+}
+
+
+def parse_fields(value: Optional[str]) -> tuple[str, ...] | None:
+    """解析以逗號分隔的 fields=，依 EmployeePublic 欄位順序回傳；未指定時為 None（完整資料），空白或未知欄位回 400。"""
+
+    if value is None:
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    if not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fields must name at least one of: {', '.join(EMPLOYEE_FIELDS)}",
+        )
+    unknown = requested.difference(EMPLOYEE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}; available: {', '.join(EMPLOYEE_FIELDS)}",
+        )
+    return tuple(name for name in EMPLOYEE_FIELDS if name in requested)
+
+
+def check_wire_format(wire_format: WireFormat) -> WireFormat:
+    """確認輸出格式可用；未安裝 msgpack 時 format=msgpack 回 406。"""
+
+    if wire_format == "msgpack" and msgpack is None:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="MessagePack encoding is not available")
+    return wire_format
+
+
+def is_default(fields: tuple[str, ...] | None, wire_format: WireFormat) -> bool:
+    """是否為未投影的完整 JSON，此時沿用 Pydantic 序列化。"""
+
+    return fields is None and wire_format == "json"
+
+
+def _dump(document: Any, wire_format: WireFormat) -> bytes:
+    if wire_format == "msgpack":
+        return msgpack.packb(document, use_bin_type=True)
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _project_employee(employee: EmployeePublic, fields: tuple[str, ...]) -> dict[str, Any]:
+    # 空值省略，前端以缺少欄位視同無資料
+    projected: dict[str, Any] = {}
+    for name in fields:
+        value = getattr(employee, name)
+        if value is not None:
+            projected[name] = value
+    return projected
+
+
+def _project_node(node: TreeNode | TruncatedTreeNode, fields: tuple[str, ...]) -> dict[str, Any]:
+    item: dict[str, Any] = {
+        "key": node.key,
+        "label": node.label,
+        "node_type": node.node_type,
+        "children": [_project_node(child, fields) for child in node.children],
+    }
+    if node.data is not None:
+        item["data"] = _project_employee(node.data, fields)
+    if isinstance(node, TruncatedTreeNode):
+        for name in NODE_COUNT_FIELDS:
+            item[name] = getattr(node, name)
+    return item
+
+
+class _CompactEncoder:
+    """建立 compact 文件：員工資料列為陣列，字典欄位以共用字串表的索引表示。"""
+
+    def __init__(self, fields: tuple[str, ...]) -> None:
+        self.fields = fields
+        self.strings: list[str] = []
+        self._string_ids: dict[str, int] = {}
+        self._columns = [(name, name in DICTIONARY_FIELDS) for name in fields]
+
+    def _string_id(self, value: str) -> int:
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def row(self, employee: EmployeePublic) -> list[Any]:
+        row: list[Any] = []
+        for name, encoded in self._columns:
+            value = getattr(employee, name)
+            row.append(self._string_id(value) if encoded and value is not None else value)
+        return row
+
+    def node(self, node: TreeNode | TruncatedTreeNode) -> list[Any]:
+        item: list[Any] = [
+            node.key,
+            node.label,
+            NODE_TYPE_CODES[node.node_type],
+            [self.node(child) for child in node.children] or None,
+            self.row(node.data) if node.data is not None else None,
+        ]
+        if isinstance(node, TruncatedTreeNode):
+            item.extend(getattr(node, name) for name in NODE_COUNT_FIELDS)
+        while item[-1] is None:
+            item.pop()
+        return item
+
+    def document(self, **content: Any) -> dict[str, Any]:
+        return {
+            "format": "compact",
+            "fields": list(self.fields),
+            "dictionary": [name for name, encoded in self._columns if encoded],
+            "strings": self.strings,
+            "node_types": list(NODE_TYPES),
+            **content,
+        }
+
+
+def encode_tree(
+    tree: list[TreeNode] | list[TruncatedTreeNode] | TreeNode | TruncatedTreeNode | None,
+    fields: tuple[str, ...] | None,
+    wire_format: WireFormat,
+) -> bytes:
+    """以投影或 compact 格式序列化整棵樹（清單）或單一子樹；None 表示找不到子樹，輸出空物件。"""
+
+    if tree is None:
+        return _dump({}, wire_format)
+    selected = fields if fields is not None else EMPLOYEE_FIELDS
+    nodes: Iterable[TreeNode | TruncatedTreeNode] = tree if isinstance(tree, list) else [tree]
+    if wire_format == "json":
+        projected = [_project_node(node, selected) for node in nodes]
+        return _dump(projected if isinstance(tree, list) else projected[0], wire_format)
+
+    encoder = _CompactEncoder(selected)
+    encoded = [encoder.node(node) for node in nodes]
+    return _dump(encoder.document(tree=encoded if isinstance(tree, list) else encoded[0]), wire_format)
+
+
+@timed("serialize")
+def encode_members(page: MemberPage, fields: tuple[str, ...] | None, wire_format: WireFormat) -> bytes:
+    """以投影或 compact 格式序列化部門成員分頁；compact 的 items 為員工資料列。"""
+
+    selected = fields if fields is not None else EMPLOYEE_FIELDS
+    paging = {"total": page.total, "offset": page.offset, "limit": page.limit}
+    if wire_format == "json":
+        return _dump({**paging, "items": [_project_employee(item, selected) for item in page.items]}, wire_format)
+    encoder = _CompactEncoder(selected)
+    items = [encoder.row(item) for item in page.items]
+    return _dump(encoder.document(**paging, items=items), wire_format)